@@ -4,9 +4,22 @@
 Analyze questions and determine their AWS SAA-C03 exam domains
 """
 
+import argparse
 import json
+import math
+import os
 import re
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from ingest_profile import NullProfiler, add_profile_argument, make_profiler
+from parse_cache import atomic_output
+from question_shards import DEFAULT_SHARD_SIZE, SHARD_DIR, write_shards
+from search_index import SEARCH_INDEX_NAME, write_index
+
 # AWS SAA-C03 Exam Domains
 DOMAINS = {
     'Design Secure Architectures': {
@@ -63,23 +76,154 @@ DOMAINS = {
     }
 }
 
+DEFAULT_DOMAIN = 'Design Secure Architectures'
+# A domain scoring at least this share of the primary domain's score is listed as secondary
+SECONDARY_RATIO = 0.5
+
+class KeywordMatcher:
+    """Count keyword hits for every domain in a single pass over the text.
+
+    All keywords are compiled once into one alternation wrapped in a
+    lookahead, so the regex engine visits each position of the text once and
+    reports the longest keyword starting there. Shorter keywords that are a
+    prefix of that match (e.g. 'vpc' inside 'vpc endpoint') are credited from
+    a precomputed table, which keeps the counts identical to running one
+    ``\\bkeyword\\b`` search per keyword.
+
+    The lookahead also finds matches that overlap an earlier match of the same
+    keyword ('active-active' twice in 'active-active-active'), where a
+    per-keyword search counts one. The few keywords that can overlap
+    themselves are recounted with their own search when they were credited
+    more than once (see overlap_excess).
+    """
+
+    def __init__(self, domains):
+        self.domain_names = list(domains)
+
+        # keyword -> {domain: multiplicity}; duplicates in a keyword list count twice
+        self.weights = weights = {}
+        for domain_name, domain_info in domains.items():
+            for keyword in domain_info['keywords']:
+                keyword = keyword.lower()
+                per_domain = weights.setdefault(keyword, {})
+                per_domain[domain_name] = per_domain.get(domain_name, 0) + 1
+
+        # Longest first, matching the greedy order of the trie alternation
+        keywords = sorted(weights, key=lambda kw: (-len(kw), kw))
+        self.pattern = re.compile(r'(?=\b(' + self._trie_alternation(keywords) + r')\b)')
+
+        # Longest match -> every keyword it implies, and their combined domain credits
+        self.implied = {}
+        self.credits = {}
+        for keyword in keywords:
+            self.implied[keyword] = [keyword] + [
+                other for other in keywords
+                if len(other) < len(keyword) and keyword.startswith(other) and
+                self._boundary_after(keyword, len(other))
+            ]
+            credit = {}
+            for implied in self.implied[keyword]:
+                for domain_name, count in weights[implied].items():
+                    credit[domain_name] = credit.get(domain_name, 0) + count
+            self.credits[keyword] = credit
+
+        # Keywords whose end can be the start of another occurrence ('active-active', 'edge'), with
+        # the texts two overlapping occurrences make ('active-active-active', 'edgedge')
+        self.overlapping = {}
+        for keyword in keywords:
+            overlaps = [keyword[:start] + keyword for start in range(1, len(keyword))
+                        if keyword.startswith(keyword[start:])]
+            if overlaps:
+                self.overlapping[keyword] = (re.compile(r'\b' + re.escape(keyword) + r'\b'), overlaps)
+        # Longest match -> the self-overlapping keywords it credits
+        self.overlap_credits = {}
+        for keyword in keywords:
+            credited = [implied for implied in self.implied[keyword] if implied in self.overlapping]
+            if credited:
+                self.overlap_credits[keyword] = credited
+
+    @staticmethod
+    def _trie_alternation(keywords):
+        """Alternation factored by common prefixes ('c(?:ost(?:-effective)?|dn)').
+
+        The regex engine then follows one branch per character instead of
+        trying every keyword at every position. Optional tails are greedy, so
+        the longest keyword that ends on a word boundary still wins.
+        """
+        trie = {}
+        for keyword in keywords:
+            node = trie
+            for char in keyword:
+                node = node.setdefault(char, {})
+            node[''] = {}
+
+        def build(node):
+            end = '' in node
+            branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+            if not branches:
+                return ''
+            body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+            if end:
+                return body + '?' if len(branches) == 1 and len(body) == 1 else '(?:' + body + ')?'
+            return body
+
+        return build(trie)
+
+    @staticmethod
+    def _boundary_after(keyword, end):
+        """Whether ``\\b`` holds between keyword[end - 1] and keyword[end]"""
+        before = keyword[end - 1].isalnum() or keyword[end - 1] == '_'
+        after = keyword[end].isalnum() or keyword[end] == '_'
+        return before != after
+
+    def overlap_excess(self, text, matches):
+        """{keyword: hits to take back} for self-overlapping keywords credited by matches (findall of text)"""
+        credited = {}
+        for match in matches:
+            for keyword in self.overlap_credits.get(match, ()):
+                credited[keyword] = credited.get(keyword, 0) + 1
+        excess = {}
+        for keyword, count in credited.items():
+            pattern, overlaps = self.overlapping[keyword]
+            if count > 1 and any(overlap in text for overlap in overlaps):
+                extra = count - len(pattern.findall(text))
+                if extra:
+                    excess[keyword] = extra
+        return excess
+
+    def score(self, text):
+        """Return {domain: keyword hit count} for already lower-cased text"""
+        domain_scores = dict.fromkeys(self.domain_names, 0)
+        hits = {}
+        matches = self.pattern.findall(text)
+        for keyword in matches:
+            hits[keyword] = hits.get(keyword, 0) + 1
+        for keyword, count in hits.items():
+            for domain_name, weight in self.credits[keyword].items():
+                domain_scores[domain_name] += weight * count
+        for keyword, extra in self.overlap_excess(text, matches).items():
+            for domain_name, weight in self.weights[keyword].items():
+                domain_scores[domain_name] -= weight * extra
+        return domain_scores
+
+
+_keyword_matcher = None
+
+def get_keyword_matcher():
+    """Return the shared matcher for DOMAINS, compiling it on first use"""
+    global _keyword_matcher
+    if _keyword_matcher is None:
+        _keyword_matcher = KeywordMatcher(DOMAINS)
+    return _keyword_matcher
+
+def score_domains(question_text, options_text, solution_text):
+    """Return keyword hit counts per domain for a question"""
+    full_text = f"{question_text} {options_text} {solution_text}".lower()
+    return get_keyword_matcher().score(full_text)
+
 def detect_domain(question_text, options_text, solution_text):
     """Detect the domain for a question based on keywords"""
-    # Combine all text
-    full_text = f"{question_text} {options_text} {solution_text}".lower()
-    
-    domain_scores = {}
-    
-    for domain_name, domain_info in DOMAINS.items():
-        score = 0
-        keywords = domain_info['keywords']
-        
-        for keyword in keywords:
-            # Count occurrences
-            count = len(re.findall(r'\b' + re.escape(keyword.lower()) + r'\b', full_text))
-            score += count
-        
-        domain_scores[domain_name] = score
+    domain_scores = score_domains(question_text, options_text, solution_text)
     
     # Get domain with highest score
     if domain_scores:
@@ -91,56 +235,279 @@ def detect_domain(question_text, options_text, solution_text):
             return top_domains[0]
     
     # Default if no match
-    return 'Design Secure Architectures'
+    return DEFAULT_DOMAIN
+
+class DomainClassifier:
+    """Score a whole question bank against the domains in one batch.
+
+    DOMAINS is the seed vocabulary: a keyword-by-domain weight matrix built
+    from the keyword lists. One pass of the keyword matcher per question
+    yields a sparse (question, keyword) count matrix for the bank, which is
+    weighted with sublinear TF-IDF (keywords found in most questions, like
+    'access', count less than rare ones like 'guardduty') and multiplied with
+    the weight matrix. The result is a score vector per question; its largest
+    entry is the primary domain and entries of at least SECONDARY_RATIO of it
+    are secondary domains.
+    """
+
+    def __init__(self, domains):
+        self.domains = domains
+        self.domain_names = list(domains)
+        self.shorts = [domains[name]['short'] for name in self.domain_names]
+        self.matcher = KeywordMatcher(domains)
+        self.keywords = sorted(self.matcher.weights)
+        index = {keyword: i for i, keyword in enumerate(self.keywords)}
+        self.weight_rows = [[self.matcher.weights[keyword].get(domain_name, 0)
+                             for domain_name in self.domain_names] for keyword in self.keywords]
+        # Matched keyword -> indices of the keywords it counts for (itself and its prefixes)
+        self.implied = {keyword: [index[other] for other in implied]
+                        for keyword, implied in self.matcher.implied.items()}
+        self.index = index
+
+    def keyword_hits(self, texts):
+        """Lists of implied keyword indices, one list per lower-cased text"""
+        implied = self.implied
+        findall = self.matcher.pattern.findall
+        overlap_excess = self.matcher.overlap_excess
+        results = []
+        for text in texts:
+            matches = findall(text)
+            hits = [k for match in matches for k in implied[match]]
+            for keyword, extra in overlap_excess(text, matches).items():
+                for _ in range(extra):
+                    hits.remove(self.index[keyword])
+            results.append(hits)
+        return results
+
+    def score(self, texts):
+        """Return an (n x domains) matrix of TF-IDF domain scores (lists without NumPy)"""
+        hits = self.keyword_hits(texts)
+        if np is None:
+            return self._score_python(hits)
+
+        n_keywords = len(self.keywords)
+        rows = np.repeat(np.arange(len(hits), dtype=np.int64), [len(h) for h in hits])
+        cols = np.fromiter((k for h in hits for k in h), dtype=np.int64, count=len(rows))
+        keys = np.sort(rows * n_keywords + cols)
+        if len(keys):
+            starts = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1])))
+            counts = np.diff(np.append(starts, len(keys)))
+            keys = keys[starts]
+        else:
+            counts = np.zeros(0, dtype=np.int64)
+        row, col = keys // n_keywords, keys % n_keywords
+
+        document_frequency = np.bincount(col, minlength=n_keywords)
+        idf = np.log((len(hits) + 1) / (document_frequency + 1)) + 1.0
+        tfidf = (1.0 + np.log(counts)) * idf[col]
+        weights = np.asarray(self.weight_rows, dtype=float)
+        return np.column_stack([np.bincount(row, tfidf * weights[col, d], minlength=len(hits))
+                                for d in range(len(self.domain_names))])
+
+    def _score_python(self, hits):
+        counted = [{} for _ in hits]
+        document_frequency = [0] * len(self.keywords)
+        for per_question, keyword_hits in zip(counted, hits):
+            for k in keyword_hits:
+                per_question[k] = per_question.get(k, 0) + 1
+            for k in per_question:
+                document_frequency[k] += 1
+        idf = self.idf(len(hits), document_frequency)
+        return [self.score_counts(per_question, idf) for per_question in counted]
+
+    def classify(self, questions, secondary_ratio=SECONDARY_RATIO, default_domain=DEFAULT_DOMAIN):
+        """Set domain, domain_short, domain_scores and secondary_domains on every question.
+
+        domain_scores maps domain_short -> share of the question's total score
+        (non-zero shares only). Questions without any keyword get default_domain
+        and empty scores. Returns the number of such questions.
+        """
+        texts = [question_text(q).lower() for q in questions]
+        unmatched = 0
+        for q, ranking in zip(questions, self._rank(self.score(texts))):
+            unmatched += not self.assign(q, *ranking, secondary_ratio, default_domain)
+        return unmatched
+
+    def assign(self, q, row, shares, ranked, secondary_ratio=SECONDARY_RATIO, default_domain=DEFAULT_DOMAIN):
+        """Set the domain fields of q from one ranked score row; False if nothing matched"""
+        if not shares:
+            domain = default_domain
+            q['domain_scores'] = {}
+            q['secondary_domains'] = []
+        else:
+            shorts = self.shorts
+            domain = self.domain_names[ranked[0]]
+            q['domain_scores'] = {shorts[d]: shares[d] for d in ranked if row[d] > 0}
+            q['secondary_domains'] = [shorts[d] for d in ranked[1:]
+                                      if row[d] > 0 and row[d] >= secondary_ratio * row[ranked[0]]]
+        q['domain'] = domain
+        q['domain_short'] = self.domains[domain]['short']
+        return bool(shares)
+
+    def hit_counts(self, text):
+        """{keyword index: count} for one lower-cased text"""
+        counts = {}
+        for k in self.keyword_hits([text])[0]:
+            counts[k] = counts.get(k, 0) + 1
+        return counts
 
-def analyze_questions():
-    """Analyze questions and add domain information"""
-    input_file = 'questions.json'
-    output_file = 'questions.json'
+    @staticmethod
+    def idf(documents, document_frequency):
+        """Smoothed IDF per keyword, the same formula score() fits on a bank"""
+        return [math.log((documents + 1) / (df + 1)) + 1.0 for df in document_frequency]
+
+    def score_counts(self, counts, idf):
+        """Domain score row of one question's hit counts for a given IDF vector.
+
+        With the IDF of the whole bank this is the question's row of score(),
+        so a question can be scored without the rest of the bank at hand.
+        """
+        row = [0.0] * len(self.domain_names)
+        for k, count in counts.items():
+            tfidf = (1.0 + math.log(count)) * idf[k]
+            for d, weight in enumerate(self.weight_rows[k]):
+                row[d] += tfidf * weight
+        return row
+
+    @staticmethod
+    def _rank(scores):
+        """Yield (scores, rounded shares or None, domain indices best first) per question"""
+        if np is not None:
+            totals = scores.sum(axis=1)
+            matched = totals > 0
+            shares = np.round(scores / np.where(matched, totals, 1.0)[:, None], 3).tolist()
+            ranked = np.argsort(-scores, axis=1, kind='stable').tolist()
+            for row, share, order, ok in zip(scores.tolist(), shares, ranked, matched.tolist()):
+                yield row, share if ok else None, order
+            return
+        for row in scores:
+            yield DomainClassifier.rank_row(row)
+
+    @staticmethod
+    def rank_row(row):
+        """(row, rounded shares or None, domain indices best first) of one score row"""
+        total = sum(row)
+        order = sorted(range(len(row)), key=lambda d: -row[d])
+        return row, [round(value / total, 3) for value in row] if total > 0 else None, order
+
+def question_text(q):
+    """Question, options and solution joined the way score_domains sees them"""
+    options_text = ' '.join(q.get('options', {}).values())
+    return f"{q.get('question', '')} {options_text} {q.get('solution', '')}"
+
+def analyze_questions(single_file=False, shard_dir=SHARD_DIR, shard_size=DEFAULT_SHARD_SIZE,
+                      input_file='questions.json', output_file='questions.json',
+                      secondary_ratio=SECONDARY_RATIO, default_domain=DEFAULT_DOMAIN, profiler=None):
+    """Analyze questions and add domain information.
+
+    questions.json is always updated in place; unless single_file is set, the
+    domain-grouped shards, manifest and search index used by the front end
+    are written too.
+    """
+    profiler = profiler or NullProfiler()
     
     print(f"Reading questions from {input_file}...")
-    with open(input_file, 'r', encoding='utf-8') as f:
+    with profiler.stage('load') as stage, open(input_file, 'r', encoding='utf-8') as f:
         questions = json.load(f)
+        stage.add_items(len(questions))
     
     print(f"Found {len(questions)} questions")
     print("\nAnalyzing domains...")
     
-    domain_counts = {}
+    with profiler.stage('classify') as stage:
+        classifier = DomainClassifier(DOMAINS)
+        classifier.matcher.pattern = profiler.count_pattern(classifier.matcher.pattern, 'analyze_domains.keywords')
+        unmatched = classifier.classify(questions, secondary_ratio, default_domain)
+        stage.add_items(len(questions))
     
-    for i, q in enumerate(questions):
-        # Combine options text
-        options_text = ' '.join(q.get('options', {}).values())
-        solution_text = q.get('solution', '')
-        question_text = q.get('question', '')
-        
-        # Detect domain
-        domain = detect_domain(question_text, options_text, solution_text)
-        q['domain'] = domain
-        q['domain_short'] = DOMAINS[domain]['short']
-        
-        # Count domains
-        domain_counts[domain] = domain_counts.get(domain, 0) + 1
-        
-        if (i + 1) % 10 == 0:
-            print(f"  Processed {i + 1}/{len(questions)} questions...")
+    domain_counts = {}
+    secondary_count = 0
+    for q in questions:
+        domain_counts[q['domain']] = domain_counts.get(q['domain'], 0) + 1
+        secondary_count += bool(q['secondary_domains'])
     
     # Save updated questions
     print(f"\nSaving updated questions to {output_file}...")
-    with open(output_file, 'w', encoding='utf-8') as f:
+    with profiler.stage('write'), atomic_output(output_file) as f:
         json.dump(questions, f, ensure_ascii=False, indent=2)
     
+    if not single_file:
+        with profiler.stage('shards'):
+            manifest = write_shards(questions, shard_dir, shard_size)
+        print(f"Wrote {len(manifest['shards'])} shards and manifest to {shard_dir}/")
+        with profiler.stage('search_index'):
+            index = write_index(questions, os.path.join(shard_dir, SEARCH_INDEX_NAME))
+        print(f"Wrote search index with {len(index['terms'])} terms to {shard_dir}/{SEARCH_INDEX_NAME}")
+    
+    profiler.set_counter('questions', len(questions))
+    profiler.set_counter('unmatched', unmatched)
+    profiler.set_counter('secondary', secondary_count)
+    profiler.set_counter('domains', domain_counts)
+    
     print(f"\n✅ Domain analysis complete!")
     print(f"\nDomain distribution:")
     for domain, count in sorted(domain_counts.items(), key=lambda x: x[1], reverse=True):
         percentage = (count / len(questions)) * 100
         print(f"  {domain}: {count} questions ({percentage:.1f}%)")
+    print(f"  {secondary_count} questions also have secondary domains")
+    if unmatched:
+        print(f"  ⚠️  {unmatched} questions matched no keyword and were assigned to {default_domain}")
     
     # Show sample
     if questions:
         print(f"\nSample questions with domains:")
         for q in questions[:5]:
-            print(f"  Question #{q['id']}: {q['domain_short']} - {q['domain']}")
+            secondary = f" (+{', '.join(q['secondary_domains'])})" if q['secondary_domains'] else ''
+            print(f"  Question #{q['id']}: {q['domain_short']}{secondary} - {q['domain']}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Tag questions.json with SAA-C03 exam domains')
+    parser.add_argument('--single-file', action='store_true',
+                        help='Only update questions.json, do not write shards, manifest and search index')
+    parser.add_argument('--shard-dir', default=SHARD_DIR, help='Directory for shards, manifest and search index')
+    parser.add_argument('--shard-size', type=int, default=DEFAULT_SHARD_SIZE,
+                        help='Maximum number of questions per shard')
+    parser.add_argument('--secondary-ratio', type=float, default=SECONDARY_RATIO,
+                        help='Minimum score, relative to the primary domain, for a secondary domain')
+    parser.add_argument('--default-domain', default=DEFAULT_DOMAIN, choices=list(DOMAINS),
+                        help='Domain for questions that match no keyword')
+    parser.add_argument('-i', '--input', default=None,
+                        help='Question bank (default: questions.json, or questions.ndjson with --ndjson)')
+    parser.add_argument('-o', '--output', default=None, help='Tagged bank (default: update the input in place)')
+    parser.add_argument('--ndjson', action='store_true',
+                        help='Tag an NDJSON bank line by line with a memo of unchanged questions '
+                             '(no shards or search index; see domain_memo.py)')
+    parser.add_argument('--memo', default=None, help='Memo database for --ndjson (default: <input>.domainmemo.db)')
+    parser.add_argument('--refit', action='store_true',
+                        help='With --ndjson, refit keyword frequencies on the current bank')
+    parser.add_argument('--prune', action='store_true',
+                        help='With --ndjson, drop memo entries of questions no longer in the bank')
+    add_profile_argument(parser)
+    args = parser.parse_args()
+    profiler = make_profiler(args, __file__)
+    
+    if args.ndjson:
+        # domain_memo imports this module, so it is imported here
+        from domain_memo import memo_path, tag_ndjson
+        input_file = args.input or 'questions.ndjson'
+        memo_file = args.memo or memo_path(input_file)
+        counts = tag_ndjson(input_file, args.output, memo_file, args.refit,
+                            args.secondary_ratio, args.default_domain, args.prune, profiler)
+        fitted = 'refitted keyword frequencies, ' if counts['refitted'] else ''
+        print(f"Tagged {counts['questions']} questions into {args.output or input_file}: {fitted}"
+              f"{counts['rescored']} rescored, {counts['reused']} reused from {memo_file}, "
+              f"{counts['matched']} keyword-matched")
+        if 'pruned' in counts:
+            print(f"  Pruned {counts['pruned']} stale memo entries")
+        if counts['unmatched']:
+            print(f"  ⚠️  {counts['unmatched']} questions matched no keyword and were assigned to {args.default_domain}")
+    else:
+        analyze_questions(args.single_file, args.shard_dir, args.shard_size,
+                          input_file=args.input or 'questions.json', output_file=args.output or args.input or 'questions.json',
+                          secondary_ratio=args.secondary_ratio, default_domain=args.default_domain,
+                          profiler=profiler)
+    profiler.write(vars(args))
 
 if __name__ == '__main__':
-    analyze_questions()
+    main()
 
@@ -0,0 +1,580 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Append-only answer event log with columnar per-question rollups
+
+learner_stats.db (and localStorage) only keep a learner's running
+correct/wrong/lastSeen counters. Every answer is also written here as one
+event, so difficulty can be analyzed across learners:
+
+    answer_log/
+        learners.txt            learner names, line number = learner id
+        segment-000001.log      sealed segments ...
+        segment-000007.log      ... and the segment being written
+        rollup.bin              per-question aggregates of rolled-up segments
+        archive/                rolled-up segments, gzipped
+
+A segment is a 16-byte header (b'QANS', format version, record size) followed
+by fixed-size little-endian records:
+
+    i64 timestamp (ms)   u32 learner id   u32 question id   u8 letter   u8 correct
+
+Nothing is ever rewritten: answers are appended to the newest segment, which
+is sealed and replaced by a new one after SEGMENT_EVENTS events and whenever a
+writer opens the log. A record cut short by a crash at the end of a segment
+is ignored by readers. One process (app_server.py --answer-log) writes a log.
+
+The rollup job folds sealed segments into rollup.bin and gzips them into
+archive/ (or deletes them with --delete). rollup.bin has one row per question,
+stored column by column like questions.bin:
+
+    ids, attempts, correct      u32
+    distractor.A .. .H          u32  wrong answers per chosen letter
+    decayed_attempts/_wrong     f64  answers weighted by 2 ** (-age / half-life)
+    last_seen                   i64  newest answer (ms)
+
+Decayed sums are kept relative to the newest event rolled up so far and are
+rescaled when newer segments are added, so rollups merge without rereading
+old events. difficulty() is the decayed share of wrong answers, pulled
+towards 0.5 by a prior of PRIOR_ATTEMPTS answers: a question answered wrong
+by most learners recently is hard, and old answers fade out over time. A
+query only reads rollup.bin (one row per question, not per event); the
+segment being written is not part of it until the next rollup.
+
+    python3 answer_log.py                          # summary
+    python3 answer_log.py --rollup                 # fold sealed segments into rollup.bin
+    python3 answer_log.py 17 42                    # aggregates of single questions
+    python3 answer_log.py --hardest 20
+    python3 answer_log.py --benchmark 2000000      # rollup and query times
+
+mock_exam.py --answer-log and app_server.py use difficulty() to put hard
+questions early in the decks of mock exams (see difficulty_preference).
+"""
+
+import argparse
+import bisect
+import gzip
+import json
+import os
+import random
+import re
+import shutil
+import struct
+import sys
+import tempfile
+import threading
+import time
+from array import array
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from parse_cache import atomic_output
+
+DEFAULT_LOG_DIR = 'answer_log'
+LEARNERS_NAME = 'learners.txt'
+ROLLUP_NAME = 'rollup.bin'
+ARCHIVE_DIR = 'archive'
+SEGMENT_PATTERN = re.compile(r'^segment-(\d{6})\.log$')
+SEGMENT_MAGIC = b'QANS'
+ROLLUP_MAGIC = b'QRLP'
+FORMAT_VERSION = 1
+SEGMENT_HEADER = struct.Struct('<4sIII')
+ROLLUP_HEADER = struct.Struct('<4sII')
+EVENT = struct.Struct('<qIIBB')
+MAX_ID = 2 ** 32 - 1
+# 1M events (18 MB) per segment
+SEGMENT_EVENTS = 1000000
+LETTERS = 'ABCDEFGH'
+ALIGNMENT = 8
+HALF_LIFE_DAYS = 30
+DAY_MS = 24 * 60 * 60 * 1000
+# Difficulty prior: PRIOR_ATTEMPTS answers, half of them wrong
+PRIOR_ATTEMPTS = 2.0
+PRIOR_WRONG = 1.0
+# A question of difficulty 1 is this much more likely to come early in a mock exam deck
+DIFFICULTY_PREFERENCE = 2.0
+
+if np is not None:
+    EVENT_DTYPE = np.dtype([('ts', '<i8'), ('learner', '<u4'), ('qid', '<u4'), ('letter', 'u1'),
+                            ('correct', 'u1')])
+
+# Column name -> array typecode, in file order
+COLUMNS = {'ids': 'I', 'attempts': 'I', 'correct': 'I'}
+COLUMNS.update({f"distractor.{letter}": 'I' for letter in LETTERS})
+COLUMNS.update({'decayed_attempts': 'd', 'decayed_wrong': 'd', 'last_seen': 'q'})
+
+def segment_name(number):
+    return f"segment-{number:06d}.log"
+
+def list_segments(directory):
+    """[(number, path)] of the segments in directory, oldest first"""
+    if not os.path.isdir(directory):
+        return []
+    segments = []
+    for name in os.listdir(directory):
+        match = SEGMENT_PATTERN.match(name)
+        if match:
+            segments.append((int(match.group(1)), os.path.join(directory, name)))
+    return sorted(segments)
+
+def normalize_answer(answer, now=None):
+    """Validate a client answer {id, answer, correct, ts}; raises KeyError/TypeError/ValueError if malformed.
+
+    Ids must fit the u32 column of an event. Timestamps in the future (a
+    client clock ahead of the server) are clamped to now.
+    """
+    now = int(time.time() * 1000) if now is None else now
+    qid = int(answer['id'])
+    if not 0 <= qid <= MAX_ID:
+        raise ValueError(f"question id {qid} out of range")
+    letter = str(answer['answer'])
+    if len(letter) != 1 or letter not in LETTERS:
+        raise ValueError(f"unknown answer letter {letter!r}")
+    timestamp = int(answer['ts'])
+    if timestamp <= 0:
+        raise ValueError('timestamp must be positive')
+    return {'id': qid, 'answer': letter, 'correct': bool(answer['correct']),
+            'ts': min(timestamp, now)}
+
+def last_segment_number(directory):
+    """Newest segment number in directory, on disk or archived (0 if none)"""
+    numbers = [number for number, _ in list_segments(directory)]
+    archive = os.path.join(directory, ARCHIVE_DIR)
+    if os.path.isdir(archive):
+        for name in os.listdir(archive):
+            match = SEGMENT_PATTERN.match(name.removesuffix('.gz'))
+            if match:
+                numbers.append(int(match.group(1)))
+    return max(numbers, default=0)
+
+class AnswerLog:
+    """Writer of one log directory; append() is thread-safe"""
+
+    def __init__(self, directory=DEFAULT_LOG_DIR, segment_events=SEGMENT_EVENTS):
+        self.directory = directory
+        self.segment_events = segment_events
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+        self.learner_ids = {}
+        self._learners_path = os.path.join(directory, LEARNERS_NAME)
+        if os.path.exists(self._learners_path):
+            with open(self._learners_path, 'rb+') as f:
+                data = f.read()
+                # A name cut short by a crash has no newline; drop it, it is written again
+                complete = data.rfind(b'\n') + 1
+                if complete < len(data):
+                    f.truncate(complete)
+            for name in data[:complete].decode('utf-8').split('\n')[:-1]:
+                self.learner_ids[name] = len(self.learner_ids)
+        self._learners = open(self._learners_path, 'a', encoding='utf-8')
+
+        # Never append to an existing segment: a rollup may already have read it. Numbers go on
+        # after archived and rolled-up segments too, which rollup() skips by number
+        segments = list_segments(directory)
+        rolled_up = AnswerRollup.open(directory).meta['segments']
+        last = max(last_segment_number(directory), rolled_up)
+        if (segments and segments[-1][0] == last > rolled_up
+                and os.path.getsize(segments[-1][1]) <= SEGMENT_HEADER.size):
+            # ... unless it is still empty
+            self.number = last
+        else:
+            self.number = last + 1
+        self._open_segment()
+
+    def _open_segment(self):
+        path = os.path.join(self.directory, segment_name(self.number))
+        self._file = open(path, 'wb')
+        self._file.write(SEGMENT_HEADER.pack(SEGMENT_MAGIC, FORMAT_VERSION, EVENT.size, 0))
+        self._file.flush()
+        self.count = 0
+
+    def _rotate(self):
+        self._file.close()
+        self.number += 1
+        self._open_segment()
+
+    def _learner_id(self, learner):
+        learner_id = self.learner_ids.get(learner)
+        if learner_id is None:
+            learner_id = self.learner_ids[learner] = len(self.learner_ids)
+            self._learners.write(learner + '\n')
+            self._learners.flush()
+        return learner_id
+
+    def append(self, learner, answers):
+        """Append normalized answers of one learner (see normalize_answer)"""
+        if not answers:
+            return
+        # Learner names are one per line
+        learner = learner.replace('\n', ' ').replace('\r', ' ')
+        with self._lock:
+            learner_id = self._learner_id(learner)
+            for answer in answers:
+                if self.count >= self.segment_events:
+                    self._file.flush()
+                    self._rotate()
+                self._file.write(EVENT.pack(answer['ts'], learner_id, answer['id'],
+                                            ord(answer['answer']), answer['correct']))
+                self.count += 1
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+            self._learners.close()
+
+def read_segment(path):
+    """Records of a segment: a NumPy structured array, or a list of (ts, learner, qid, letter, correct)"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    magic, version, record_size, _ = SEGMENT_HEADER.unpack_from(data)
+    if magic != SEGMENT_MAGIC or version != FORMAT_VERSION or record_size != EVENT.size:
+        raise ValueError(f"{path} is not a version {FORMAT_VERSION} answer log segment")
+    # A torn record at the end is dropped
+    count = (len(data) - SEGMENT_HEADER.size) // EVENT.size
+    if np is not None:
+        return np.frombuffer(data, dtype=EVENT_DTYPE, count=count, offset=SEGMENT_HEADER.size)
+    return list(EVENT.iter_unpack(data[SEGMENT_HEADER.size:SEGMENT_HEADER.size + count * EVENT.size]))
+
+def segment_aggregates(events, half_life_ms):
+    """({qid: [attempts, correct, distractors..., decayed_attempts, decayed_wrong, last_seen]}, reference ms)
+
+    Decayed sums are relative to the newest event of the segment.
+    """
+    if len(events) == 0:
+        return {}, 0
+    n_letters = len(LETTERS)
+    if np is not None:
+        reference = int(events['ts'].max())
+        ids, inverse = np.unique(events['qid'], return_inverse=True)
+        wrong = events['correct'] == 0
+        weight = np.exp2((events['ts'] - reference) / half_life_ms)
+        letters = events['letter'].astype(np.int64) - ord(LETTERS[0])
+        distractors = np.bincount(inverse[wrong] * n_letters + letters[wrong],
+                                  minlength=len(ids) * n_letters).reshape(len(ids), n_letters)
+        last_seen = np.full(len(ids), np.iinfo(np.int64).min)
+        np.maximum.at(last_seen, inverse, events['ts'])
+        columns = [
+            np.bincount(inverse, minlength=len(ids)).tolist(),
+            np.bincount(inverse, events['correct'], minlength=len(ids)).astype(np.int64).tolist(),
+            distractors.tolist(),
+            np.bincount(inverse, weight, minlength=len(ids)).tolist(),
+            np.bincount(inverse, weight * wrong, minlength=len(ids)).tolist(),
+            last_seen.tolist(),
+        ]
+        return {qid: [attempts, correct, *letter_counts, decayed, decayed_wrong, seen]
+                for qid, attempts, correct, letter_counts, decayed, decayed_wrong, seen
+                in zip(ids.tolist(), *columns)}, reference
+
+    reference = max(event[0] for event in events)
+    rows = {}
+    for ts, _, qid, letter, correct in events:
+        row = rows.get(qid)
+        if row is None:
+            row = rows[qid] = [0, 0] + [0] * n_letters + [0.0, 0.0, ts]
+        weight = 2.0 ** ((ts - reference) / half_life_ms)
+        row[0] += 1
+        row[-3] += weight
+        if correct:
+            row[1] += 1
+        else:
+            row[2 + letter - ord(LETTERS[0])] += 1
+            row[-2] += weight
+        row[-1] = max(row[-1], ts)
+    return rows, reference
+
+class AnswerRollup:
+    """Per-question aggregates, one row per question sorted by id"""
+
+    def __init__(self, columns=None, meta=None):
+        self.columns = columns or {name: array(typecode) for name, typecode in COLUMNS.items()}
+        self.meta = meta or {'segments': 0, 'events': 0, 'reference_ms': 0,
+                             'half_life_ms': HALF_LIFE_DAYS * DAY_MS}
+        self.ids = self.columns['ids']
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            data = f.read()
+        magic, version, meta_length = ROLLUP_HEADER.unpack_from(data)
+        if magic != ROLLUP_MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"{path} is not a version {FORMAT_VERSION} answer rollup")
+        meta = json.loads(data[ROLLUP_HEADER.size:ROLLUP_HEADER.size + meta_length])
+        columns = {}
+        for name, typecode in COLUMNS.items():
+            offset, length = meta['sections'][name]
+            columns[name] = array(typecode, data[offset:offset + length])
+            if sys.byteorder == 'big':
+                columns[name].byteswap()
+        return cls(columns, meta)
+
+    @classmethod
+    def open(cls, directory=DEFAULT_LOG_DIR):
+        """Rollup of a log directory; empty if nothing has been rolled up yet"""
+        path = os.path.join(directory, ROLLUP_NAME)
+        return cls.load(path) if os.path.exists(path) else cls()
+
+    def __len__(self):
+        return len(self.ids)
+
+    def save(self, path):
+        meta = {key: value for key, value in self.meta.items() if key != 'sections'}
+        meta.update({'count': len(self), 'letters': LETTERS, 'columns': list(COLUMNS)})
+        blobs = []
+        for name in COLUMNS:
+            column = self.columns[name]
+            if sys.byteorder == 'big':
+                column = array(column.typecode, column)
+                column.byteswap()
+            blobs.append((name, column.tobytes()))
+        # The section offsets depend on the meta length, which depends on the offsets; fix it up once
+        sections = {name: [0, len(data)] for name, data in blobs}
+        for _ in range(2):
+            meta_bytes = json.dumps({**meta, 'sections': sections}, separators=(',', ':')).encode('utf-8')
+            position = ROLLUP_HEADER.size + len(meta_bytes)
+            for name, data in blobs:
+                position += -position % ALIGNMENT
+                sections[name] = [position, len(data)]
+                position += len(data)
+        meta_bytes = json.dumps({**meta, 'sections': sections}, separators=(',', ':')).encode('utf-8')
+        with atomic_output(path, binary=True) as f:
+            f.write(ROLLUP_HEADER.pack(ROLLUP_MAGIC, FORMAT_VERSION, len(meta_bytes)))
+            f.write(meta_bytes)
+            for name, data in blobs:
+                if sections[name][0] < f.tell():
+                    raise ValueError('Section table did not settle')
+                f.write(b'\0' * (sections[name][0] - f.tell()))
+                f.write(data)
+        self.meta = {**meta, 'sections': sections}
+
+    def rows(self):
+        """{qid: row} in segment_aggregates order"""
+        columns = [self.columns[name] for name in COLUMNS]
+        return {values[0]: list(values[1:]) for values in zip(*columns)}
+
+    def merge(self, aggregates, reference, events, segment):
+        """Fold segment_aggregates() of one segment into the rollup"""
+        half_life = self.meta['half_life_ms']
+        new_reference = max(self.meta['reference_ms'], reference)
+        rows = self.rows()
+        # Rescale the decayed sums of both sides to the newer reference
+        old_scale = 2.0 ** ((self.meta['reference_ms'] - new_reference) / half_life)
+        new_scale = 2.0 ** ((reference - new_reference) / half_life)
+        for row in rows.values():
+            row[-3] *= old_scale
+            row[-2] *= old_scale
+        for qid, values in aggregates.items():
+            row = rows.get(qid)
+            if row is None:
+                row = rows[qid] = [0] * (len(values) - 3) + [0.0, 0.0, values[-1]]
+            for index in range(len(values) - 3):
+                row[index] += values[index]
+            row[-3] += values[-3] * new_scale
+            row[-2] += values[-2] * new_scale
+            row[-1] = max(row[-1], values[-1])
+
+        columns = {name: array(typecode) for name, typecode in COLUMNS.items()}
+        names = list(COLUMNS)
+        for qid in sorted(rows):
+            columns['ids'].append(qid)
+            for name, value in zip(names[1:], rows[qid]):
+                columns[name].append(value)
+        self.columns = columns
+        self.ids = columns['ids']
+        self.meta.update({'reference_ms': new_reference, 'segments': segment,
+                          'events': self.meta['events'] + events})
+
+    def _row(self, qid):
+        index = bisect.bisect_left(self.ids, qid)
+        if index == len(self.ids) or self.ids[index] != qid:
+            raise KeyError(f"No answers for question {qid}")
+        return index
+
+    def _scale(self, now):
+        # Decay from the rollup's reference to now
+        return 2.0 ** ((self.meta['reference_ms'] - now) / self.meta['half_life_ms'])
+
+    def question(self, qid, now=None):
+        """Aggregates of one question; raises KeyError if it has no answers"""
+        now = int(time.time() * 1000) if now is None else now
+        index = self._row(qid)
+        attempts = self.columns['attempts'][index]
+        correct = self.columns['correct'][index]
+        distractors = {letter: self.columns[f"distractor.{letter}"][index] for letter in LETTERS}
+        wrong = attempts - correct
+        scale = self._scale(now)
+        return {
+            'id': qid,
+            'attempts': attempts,
+            'correct': correct,
+            'accuracy': round(correct / attempts, 3),
+            'distractors': {letter: round(count / wrong, 3) for letter, count in distractors.items() if count},
+            'difficulty': round(self._difficulty(index, scale), 3),
+            'last_seen': self.columns['last_seen'][index],
+        }
+
+    def _difficulty(self, index, scale):
+        return ((self.columns['decayed_wrong'][index] * scale + PRIOR_WRONG) /
+                (self.columns['decayed_attempts'][index] * scale + PRIOR_ATTEMPTS))
+
+    def difficulty(self, now=None):
+        """{qid: time-decayed difficulty in 0..1} of every question with answers"""
+        now = int(time.time() * 1000) if now is None else now
+        scale = self._scale(now)
+        return {qid: self._difficulty(index, scale) for index, qid in enumerate(self.ids)}
+
+    def hardest(self, limit=20, min_attempts=5, now=None):
+        """[(qid, difficulty)] of the hardest questions with at least min_attempts answers"""
+        attempts = self.columns['attempts']
+        scores = [(difficulty, qid) for (qid, difficulty), count
+                  in zip(self.difficulty(now).items(), attempts) if count >= min_attempts]
+        return [(qid, difficulty) for difficulty, qid in sorted(scores, reverse=True)[:limit]]
+
+def rollup(directory=DEFAULT_LOG_DIR, include_active=False, delete=False):
+    """Fold sealed segments into rollup.bin and archive (or delete) them; returns the segments rolled up.
+
+    The newest segment is the one a running writer appends to and is skipped
+    unless include_active is set (only when no writer is running).
+    """
+    path = os.path.join(directory, ROLLUP_NAME)
+    current = AnswerRollup.open(directory)
+    segments = [(number, segment_path) for number, segment_path in list_segments(directory)
+                if number > current.meta['segments']]
+    if segments and not include_active:
+        segments = [segment for segment in segments if segment[0] < list_segments(directory)[-1][0]]
+    for number, segment_path in segments:
+        events = read_segment(segment_path)
+        aggregates, reference = segment_aggregates(events, current.meta['half_life_ms'])
+        current.merge(aggregates, reference, len(events), number)
+    if not segments:
+        return []
+    # Written before the segments go, so a crash in between rolls nothing up twice
+    current.save(path)
+    archive = os.path.join(directory, ARCHIVE_DIR)
+    for number, segment_path in segments:
+        if not delete:
+            os.makedirs(archive, exist_ok=True)
+            with open(segment_path, 'rb') as source, \
+                    atomic_output(os.path.join(archive, os.path.basename(segment_path) + '.gz'), binary=True) as f:
+                with gzip.GzipFile(fileobj=f, mode='wb', mtime=0) as packed:
+                    shutil.copyfileobj(source, packed)
+        os.remove(segment_path)
+    return [number for number, _ in segments]
+
+def difficulty_preference(difficulty, weight=DIFFICULTY_PREFERENCE):
+    """{qid: deck weight} from {qid: difficulty}, for mock_exam.generate_pool.
+
+    Weights are relative to the prior difficulty (0.5 -> 1.0), which is also
+    the weight of questions nobody has answered yet (missing ids weigh 1), so
+    those rank between easy and hard questions rather than below all of them.
+    """
+    prior = 1.0 + weight * PRIOR_WRONG / PRIOR_ATTEMPTS
+    return {qid: (1.0 + weight * value) / prior for qid, value in difficulty.items()}
+
+def combine_preferences(*preferences):
+    """Multiply deck weights of several {qid: weight} maps (missing ids weigh 1)"""
+    combined = {}
+    for preference in preferences:
+        for qid, weight in (preference or {}).items():
+            combined[qid] = combined.get(qid, 1.0) * weight
+    return combined
+
+def benchmark(events, questions=1000, learners=500, segment_events=SEGMENT_EVENTS):
+    """Write events synthetic answers, roll them up and time a few queries"""
+    rng = random.Random(0)
+    # Per-question wrong rate and favourite distractor
+    profile = {qid: (rng.random() * 0.8, rng.choice('BCD')) for qid in range(1, questions + 1)}
+    start_ms = int(time.time() * 1000) - 90 * DAY_MS
+    results = {'events': events}
+    with tempfile.TemporaryDirectory() as directory:
+        log = AnswerLog(directory, segment_events)
+        started = time.perf_counter()
+        batch = []
+        for number in range(events):
+            qid = rng.randint(1, questions)
+            wrong_rate, distractor = profile[qid]
+            wrong = rng.random() < wrong_rate
+            batch.append({'id': qid, 'answer': distractor if wrong else 'A', 'correct': not wrong,
+                          'ts': start_ms + number * (90 * DAY_MS // events)})
+            if len(batch) == 1000:
+                log.append(f"learner-{rng.randrange(learners)}", batch)
+                batch = []
+        log.append('learner-0', batch)
+        log.close()
+        results['append_s'] = time.perf_counter() - started
+        results['log_bytes'] = sum(os.path.getsize(path) for _, path in list_segments(directory))
+
+        started = time.perf_counter()
+        rolled = rollup(directory, include_active=True, delete=True)
+        results['rollup_s'] = time.perf_counter() - started
+        results['segments'] = len(rolled)
+        results['rollup_bytes'] = os.path.getsize(os.path.join(directory, ROLLUP_NAME))
+
+        started = time.perf_counter()
+        table = AnswerRollup.open(directory)
+        results['load_ms'] = (time.perf_counter() - started) * 1000
+        started = time.perf_counter()
+        for qid in range(1, 101):
+            table.question(qid)
+        results['question_ms'] = (time.perf_counter() - started) * 1000 / 100
+        started = time.perf_counter()
+        table.hardest(20)
+        results['hardest_ms'] = (time.perf_counter() - started) * 1000
+    return results
+
+def print_benchmark(results):
+    print(f"{results['events']} events in {results['segments']} segments: "
+          f"{results['log_bytes'] / 1e6:.1f} MB of log -> {results['rollup_bytes'] / 1e3:.1f} kB rollup")
+    print(f"  append {results['append_s']:.2f} s, rollup {results['rollup_s']:.2f} s "
+          f"({'NumPy' if np is not None else 'pure Python'})")
+    print(f"  load rollup {results['load_ms']:.2f} ms, one question {results['question_ms']:.3f} ms, "
+          f"hardest 20 {results['hardest_ms']:.2f} ms")
+
+def print_summary(directory):
+    segments = list_segments(directory)
+    table = AnswerRollup.open(directory)
+    pending = sum(max(os.path.getsize(path) - SEGMENT_HEADER.size, 0) // EVENT.size for _, path in segments)
+    print(f"{directory}: {len(segments)} segments with {pending} events not rolled up yet")
+    print(f"  rollup: {table.meta['events']} events over {len(table)} questions "
+          f"(segments up to {table.meta['segments']})")
+
+def main():
+    parser = argparse.ArgumentParser(description='Answer event log: roll up segments and query per-question aggregates')
+    parser.add_argument('ids', nargs='*', type=int, help='Question ids to show')
+    parser.add_argument('-d', '--directory', default=DEFAULT_LOG_DIR, help='Log directory')
+    parser.add_argument('--rollup', action='store_true', help='Fold sealed segments into rollup.bin')
+    parser.add_argument('--all', action='store_true',
+                        help='With --rollup, include the newest segment (only when no server is writing)')
+    parser.add_argument('--delete', action='store_true',
+                        help='With --rollup, delete rolled-up segments instead of archiving them')
+    parser.add_argument('--hardest', type=int, default=None, metavar='N', help='Show the N hardest questions')
+    parser.add_argument('--min-attempts', type=int, default=5, help='Answers a question needs for --hardest')
+    parser.add_argument('--benchmark', type=int, default=None, metavar='EVENTS',
+                        help='Time append, rollup and queries on synthetic events')
+    args = parser.parse_args()
+
+    if args.benchmark:
+        print_benchmark(benchmark(args.benchmark))
+        return
+    if args.rollup:
+        rolled = rollup(args.directory, args.all, args.delete)
+        print(f"Rolled up {len(rolled)} segments" + (f" ({rolled[0]}-{rolled[-1]})" if rolled else ''))
+    table = AnswerRollup.open(args.directory)
+    for qid in args.ids:
+        try:
+            print(json.dumps(table.question(qid), ensure_ascii=False))
+        except KeyError as e:
+            print(e.args[0])
+    if args.hardest:
+        for qid, difficulty in table.hardest(args.hardest, args.min_attempts):
+            row = table.question(qid)
+            print(f"  #{qid}: difficulty {difficulty:.3f}, {row['attempts']} answers, accuracy {row['accuracy']:.2f}")
+    if not args.ids and not args.hardest:
+        print_summary(args.directory)
+
+if __name__ == '__main__':
+    main()
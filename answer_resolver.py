@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Batch answer-letter resolution
+
+The dumps rarely say "Correct answer: B"; usually they repeat the text of the
+correct option (ans- line) or only discuss it in the explanation. Instead of
+comparing each option with the answer by string heuristics one question at a
+time, all evidence texts and options of a batch are tokenized once into a
+shared vocabulary and scored together:
+
+  - every text becomes a binary TF-IDF vector over the shared vocabulary
+  - answer-to-option cosine similarity is computed for the whole batch with a
+    sorted (document, token) join in NumPy, without building a dense matrix
+  - the best option wins; its confidence is its softmax share among the
+    options of that question, so it is close to 1 for a clear match and 1/k
+    when the k options are equally (un)recognisable in the answer
+
+Questions without evidence (no answer line and no explanation) are not
+scored, and a best option that shares no word with the evidence, that ties
+with another option, or whose confidence is below DEFAULT_MIN_CONFIDENCE (just
+above the 1/2 of two indistinguishable options) is not assigned: they keep
+correct_answer None, like the parsers leave them, so they are dropped instead
+of shipping a guess.
+
+Letters found explicitly by the parsers and sole options (the TXT dump often
+lists only the correct one) keep their letter with confidence 1.0.
+
+NumPy is optional: without it the same scores are computed in pure Python,
+which is fine for the real dump but slow for very large synthetic ones.
+"""
+
+import math
+import re
+from collections import Counter, defaultdict
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+TOKEN = re.compile(r'[a-z0-9]+')
+STOPWORDS = frozenset("""
+    a an and are as at be by can for from has have in into is it its of on or that the their then this
+    to use using will with which when you your
+""".split())
+# Softmax temperature for the confidence; cosine differences of ~0.3 decide clearly
+TEMPERATURE = 0.1
+# Above 1/k for every k >= 2, so near-uniform scores are not shipped as answers
+DEFAULT_MIN_CONFIDENCE = 0.55
+DEFAULT_BATCH_SIZE = 50000
+
+def tokenize(text):
+    return [token for token in TOKEN.findall(text.lower()) if token not in STOPWORDS]
+
+def evidence_text(q):
+    """Text the correct option is recognised by: the answer line, else the explanation"""
+    return q.get('answer_text') or q.get('solution') or ''
+
+def resolve_answers(questions, min_confidence=DEFAULT_MIN_CONFIDENCE):
+    """Fill correct_answer and answer_confidence of every question in place.
+
+    Questions that already have a letter keep it with confidence 1.0. A letter
+    whose confidence is below min_confidence, whose option shares no word with
+    the evidence or whose similarity ties with another option, is not assigned (correct_answer stays None,
+    answer_confidence records the score). Questions without evidence are not
+    scored (answer_confidence None). Returns the questions.
+    """
+    pending = []
+    for q in questions:
+        options = q.get('options') or {}
+        if q.get('correct_answer'):
+            q['answer_confidence'] = 1.0
+        elif len(options) == 1:
+            q['correct_answer'] = next(iter(options))
+            q['answer_confidence'] = 1.0
+        else:
+            q['answer_confidence'] = None
+            if options and tokenize(evidence_text(q)):
+                pending.append(q)
+
+    if pending:
+        scorer = _score_numpy if np is not None else _score_python
+        for q, (letter, confidence, decided) in zip(pending, scorer(pending)):
+            q['answer_confidence'] = round(confidence, 4)
+            # No option or several options match best: picking one would be a guess
+            if decided and confidence >= min_confidence:
+                q['correct_answer'] = letter
+    return questions
+
+def iter_resolved(questions, batch_size=DEFAULT_BATCH_SIZE, min_confidence=DEFAULT_MIN_CONFIDENCE):
+    """Resolve a stream of questions in batches, keeping their order"""
+    batch = []
+    for q in questions:
+        batch.append(q)
+        if len(batch) >= batch_size:
+            yield from resolve_answers(batch, min_confidence)
+            batch = []
+    if batch:
+        yield from resolve_answers(batch, min_confidence)
+
+def _documents(questions):
+    """Evidence texts first, then every option; returns (texts, owners, letters)"""
+    texts = [evidence_text(q) for q in questions]
+    owners = []
+    letters = []
+    for index, q in enumerate(questions):
+        for letter, option in q['options'].items():
+            texts.append(option)
+            owners.append(index)
+            letters.append(letter)
+    return texts, owners, letters
+
+def _score_numpy(questions):
+    texts, owners, letters = _documents(questions)
+    n_questions = len(questions)
+
+    # Token ids are assigned on first sight; stop words get the first ids and are dropped below
+    vocabulary = defaultdict(lambda: len(vocabulary))
+    for word in sorted(STOPWORDS):
+        vocabulary[word]
+    token_ids = []
+    lengths = []
+    for text in texts:
+        tokens = TOKEN.findall(text.lower())
+        token_ids.extend(map(vocabulary.__getitem__, tokens))
+        lengths.append(len(tokens))
+    vocab_size = len(vocabulary)
+
+    # Unique (document, token) pairs, sorted by document then token
+    docs = np.repeat(np.arange(len(texts), dtype=np.int64), lengths)
+    pairs = docs * vocab_size + np.asarray(token_ids, dtype=np.int64)
+    pairs = pairs[pairs % vocab_size >= len(STOPWORDS)]
+    pairs.sort()
+    if len(pairs):
+        pairs = pairs[np.concatenate(([True], pairs[1:] != pairs[:-1]))]
+    doc, token = pairs // vocab_size, pairs % vocab_size
+
+    document_frequency = np.bincount(token, minlength=vocab_size)
+    idf = np.log((len(texts) + 1) / (document_frequency + 1)) + 1.0
+    weight = idf[token]
+    norm = np.sqrt(np.bincount(doc, weight * weight, minlength=len(texts)))
+    weight = weight / norm[doc]
+
+    # Join option tokens with the evidence tokens of their own question
+    is_evidence = doc < n_questions
+    evidence_keys = pairs[is_evidence]
+    evidence_weight = weight[is_evidence]
+    option_index = doc[~is_evidence] - n_questions
+    owner = np.asarray(owners, dtype=np.int64)
+    option_keys = owner[option_index] * vocab_size + token[~is_evidence]
+    found = np.searchsorted(evidence_keys, option_keys)
+    found = np.minimum(found, max(len(evidence_keys) - 1, 0))
+    matched = evidence_keys[found] == option_keys if len(evidence_keys) else np.zeros(len(option_keys), bool)
+    similarity = np.bincount(option_index[matched],
+                             weight[~is_evidence][matched] * evidence_weight[found[matched]],
+                             minlength=len(owners))
+
+    # Options of a question are contiguous; rank them within each question
+    counts = np.bincount(owner, minlength=n_questions)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    order = np.lexsort((-similarity, owner))
+    best = order[starts]
+    best_similarity = similarity[best]
+    shares = np.exp((similarity - best_similarity[owner]) / TEMPERATURE)
+    confidence = 1.0 / np.bincount(owner, shares, minlength=n_questions)
+    tied = np.bincount(owner, similarity == best_similarity[owner], minlength=n_questions) > 1
+    decided = (best_similarity > 0) & ~tied
+
+    return [(letters[index], float(share), bool(clear))
+            for index, share, clear in zip(best, confidence, decided)]
+
+def _score_python(questions):
+    texts, owners, letters = _documents(questions)
+    token_sets = [set(tokenize(text)) for text in texts]
+    document_frequency = Counter(token for tokens in token_sets for token in tokens)
+    idf = {token: math.log((len(texts) + 1) / (df + 1)) + 1.0 for token, df in document_frequency.items()}
+
+    def vector(tokens):
+        # Sorted, so options with equal weights sum in the same order and tie exactly
+        tokens = sorted(tokens)
+        norm = math.sqrt(sum(idf[token] ** 2 for token in tokens)) or 1.0
+        return {token: idf[token] / norm for token in tokens}
+
+    evidence = [vector(tokens) for tokens in token_sets[:len(questions)]]
+    scored = [[] for _ in questions]
+    for offset, (owner, letter) in enumerate(zip(owners, letters)):
+        option = vector(token_sets[len(questions) + offset])
+        similarity = sum(weight * evidence[owner].get(token, 0.0) for token, weight in option.items())
+        scored[owner].append((similarity, letter))
+
+    results = []
+    for options in scored:
+        best_similarity, letter = max(options, key=lambda item: item[0])
+        total = sum(math.exp((similarity - best_similarity) / TEMPERATURE) for similarity, _ in options)
+        tied = sum(similarity == best_similarity for similarity, _ in options) > 1
+        results.append((letter, 1.0 / total, best_similarity > 0 and not tied))
+    return results
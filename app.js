@@ -12,6 +12,39 @@ let sessionStats = {
 // Question tracking for spaced repetition
 let questionStats = {}; // {questionId: {correct: count, wrong: count, lastSeen: timestamp}}
 
+// Lazy loading: questions holds manifest entries {id, shard, domain_short};
+// full question objects are fetched shard by shard into loadedQuestions
+let shardFiles = [];
+let loadedQuestions = {}; // {questionId: question}
+let shardRequests = {}; // {shardNumber: Promise}
+let prefetching = false;
+
+// Server-side scheduler and stats API (app_server.py); null when only static files are served
+let schedulerApi = null;
+
+// Full-text search index (questions/search.json, see search_index.py), loaded on first use
+const SEARCH_STOPWORDS = new Set(('a an and are as at be by can for from has have how in into is it its of on ' +
+    'or that the their them this to was which will with what when where who').split(' '));
+const SEARCH_MASK_BITS = 3;
+const SEARCH_MASK_WEIGHTS = [0, 3, 2, 5, 1, 4, 3, 6]; // question 3, options 2, solution 1
+const SEARCH_PREFIX_LENGTH = 2;
+const SEARCH_MAX_EXPANSIONS = 20;
+const SEARCH_LIMIT = 10;
+let searchIndex = null;
+let searchIndexRequest = null;
+
+// Mock exams (questions/exams.json, see mock_exam.py); exam is null outside an exam
+const EXAM_PASS_RATIO = 0.72; // 720 of 1000 in the real exam
+let exam = null; // {number, ids, position, deadline, timer, results: {domain: [correct, total]}}
+
+// Write-behind stats: changes since the last flush, sent as one batch
+const STATS_FLUSH_INTERVAL = 5000;
+let pendingDeltas = {}; // {questionId: {correct: +n, wrong: +n, lastSeen: timestamp}}
+let pendingSession = { correct: 0, wrong: 0, total: 0 };
+let pendingSessionReset = false;
+let pendingAnswers = []; // [{id, answer, correct, ts}] for the server's answer event log
+let statsFlushTimer = null;
+
 // Initialize application
 async function init() {
     // Load session stats from localStorage
@@ -22,11 +55,7 @@ async function init() {
     
     // Load questions
     try {
-        const response = await fetch('questions.json');
-        questions = await response.json();
-        
-        // Filter questions that have at least 2 options
-        questions = questions.filter(q => Object.keys(q.options).length >= 2);
+        questions = await loadQuestionIndex();
         
         console.log(`Loaded ${questions.length} questions`);
         
@@ -42,8 +71,11 @@ async function init() {
             }
         });
         
+        schedulerApi = await detectSchedulerApi();
+        setupSearch();
+        
         // Start with first question
-        nextQuestion();
+        await nextQuestion();
     } catch (error) {
         console.error('Error loading questions:', error);
         document.getElementById('question-text').textContent = 
@@ -51,6 +83,320 @@ async function init() {
     }
 }
 
+// Versioned bank of app_server.py (see bank_versions.py), kept in IndexedDB between visits
+const BANK_DB_NAME = 'aws-exam-bank';
+const BANK_STORE = 'bank';
+let bankCacheStale = false; // no usable cached bank: fetch one in the background once the shards are in
+
+function openBankDb() {
+    return new Promise((resolve, reject) => {
+        const request = indexedDB.open(BANK_DB_NAME, 1);
+        request.onupgradeneeded = () => request.result.createObjectStore(BANK_STORE);
+        request.onsuccess = () => resolve(request.result);
+        request.onerror = () => reject(request.error);
+    });
+}
+
+async function readCachedBank() {
+    const db = await openBankDb();
+    return new Promise((resolve, reject) => {
+        const request = db.transaction(BANK_STORE).objectStore(BANK_STORE).get('current');
+        request.onsuccess = () => resolve(request.result || null);
+        request.onerror = () => reject(request.error);
+    });
+}
+
+async function writeCachedBank(bank) {
+    const db = await openBankDb();
+    return new Promise((resolve, reject) => {
+        const transaction = db.transaction(BANK_STORE, 'readwrite');
+        transaction.objectStore(BANK_STORE).put(bank, 'current');
+        transaction.oncomplete = () => resolve();
+        transaction.onerror = () => reject(transaction.error);
+    });
+}
+
+// JSON body of an API response, or null when the API is not there (nginx answers with index.html)
+async function apiJson(response) {
+    const type = response.headers.get('Content-Type') || '';
+    return response.ok && type.startsWith('application/json') ? response.json() : null;
+}
+
+// Cached bank patched with the delta since its version; null when there is nothing to patch
+// (first visit, version no longer kept, no API): the app then loads shards lazily as before
+async function loadVersionedBank() {
+    let cached = null;
+    try {
+        cached = await readCachedBank();
+    } catch (error) {
+        // No IndexedDB (e.g. private mode): shards only
+        return null;
+    }
+    if (!cached) {
+        bankCacheStale = true;
+        return null;
+    }
+    
+    const response = await fetch(`api/bank/delta?since=${cached.version}`);
+    if (response.status === 304) {
+        return cached.questions;
+    }
+    const delta = await apiJson(response);
+    if (!delta) {
+        bankCacheStale = response.status === 410;
+        return null;
+    }
+    const byId = new Map(cached.questions.map(q => [q.id, q]));
+    delta.removed.forEach(id => byId.delete(id));
+    delta.changed.concat(delta.added).forEach(q => byId.set(q.id, q));
+    const bank = { version: delta.version, questions: [...byId.values()] };
+    console.log(`Bank v${cached.version} -> v${delta.version}: ${delta.added.length} added, ` +
+                `${delta.changed.length} changed, ${delta.removed.length} removed`);
+    try {
+        await writeCachedBank(bank);
+    } catch (error) {
+        console.warn('Question bank could not be cached:', error);
+    }
+    return bank.questions;
+}
+
+// Store the whole bank for the next visit's delta; runs after the shards, off the first question's path
+async function refreshCachedBank() {
+    bankCacheStale = false;
+    try {
+        const payload = await apiJson(await fetch('api/bank'));
+        if (payload) {
+            await writeCachedBank({ version: payload.version, questions: payload.questions });
+        }
+    } catch (error) {
+        console.warn('Question bank could not be cached:', error);
+    }
+}
+
+// Load the cached versioned bank patched by the server, else the shard manifest, else the single questions.json file
+async function loadQuestionIndex() {
+    let versioned = null;
+    try {
+        versioned = await loadVersionedBank();
+    } catch (error) {
+        versioned = null;
+    }
+    if (versioned) {
+        const usable = versioned.filter(q => Object.keys(q.options || {}).length >= 2);
+        usable.forEach(q => {
+            loadedQuestions[q.id] = q;
+        });
+        return usable;
+    }
+    
+    let manifest = null;
+    try {
+        const response = await fetch('questions/manifest.json');
+        if (response.ok) {
+            manifest = await response.json();
+        }
+    } catch (error) {
+        // nginx answers unknown paths with index.html, which is not JSON
+        manifest = null;
+    }
+    
+    if (manifest) {
+        shardFiles = manifest.shards;
+        return manifest.questions.map(([id, shard]) => ({
+            id,
+            shard,
+            domain_short: shardFiles[shard].domain_short
+        }));
+    }
+    
+    // Tek dosya modu: tüm bankayı bir kerede yükle
+    const response = await fetch('questions.json');
+    const bank = await response.json();
+    
+    // Filter questions that have at least 2 options
+    const usable = bank.filter(q => Object.keys(q.options).length >= 2);
+    usable.forEach(q => {
+        loadedQuestions[q.id] = q;
+    });
+    return usable;
+}
+
+// Return a stable learner id for the server-side scheduler
+function getLearnerId() {
+    let learnerId = localStorage.getItem('learnerId');
+    if (!learnerId) {
+        learnerId = `learner-${Date.now().toString(36)}-${Math.random().toString(36).slice(2, 10)}`;
+        localStorage.setItem('learnerId', learnerId);
+    }
+    return learnerId;
+}
+
+// Use the server-side scheduler if app_server.py is serving the app
+async function detectSchedulerApi() {
+    const learner = encodeURIComponent(getLearnerId());
+    try {
+        const response = await fetch(`api/sync?learner=${learner}`);
+        if (!response.ok) return null;
+        const snapshot = await response.json();
+        // Counters only grow, so the larger of server and local copy is the newest
+        Object.entries(snapshot.questions).forEach(([id, [correct, wrong, lastSeen]]) => {
+            const local = questionStats[id] || { correct: 0, wrong: 0, lastSeen: 0, priority: 0 };
+            questionStats[id] = {
+                ...local,
+                correct: Math.max(local.correct, correct),
+                wrong: Math.max(local.wrong, wrong),
+                lastSeen: Math.max(local.lastSeen, lastSeen)
+            };
+        });
+        const [correct, wrong, total] = snapshot.session;
+        if (total >= sessionStats.total) {
+            sessionStats = { correct, wrong, total };
+            updateStatsDisplay();
+        }
+        console.log('Using server-side scheduler');
+        return { learner };
+    } catch (error) {
+        // nginx / http.server: no API, schedule in the browser
+        return null;
+    }
+}
+
+// Ask the server for the next question id
+async function getNextQuestionFromServer() {
+    const response = await fetch(`api/next?learner=${schedulerApi.learner}`);
+    const payload = await response.json();
+    return questions.find(q => q.id === payload.id) || null;
+}
+
+// Record a change for the next batched stats flush
+function recordQuestionDelta(questionId, field, value) {
+    const delta = pendingDeltas[questionId] || (pendingDeltas[questionId] = { correct: 0, wrong: 0, lastSeen: 0 });
+    if (field === 'lastSeen') {
+        delta.lastSeen = value;
+    } else {
+        delta[field] += 1;
+    }
+}
+
+// Flush stats in one go instead of after every answer
+function scheduleStatsFlush() {
+    if (statsFlushTimer === null) {
+        statsFlushTimer = setTimeout(flushStats, STATS_FLUSH_INTERVAL);
+    }
+}
+
+// Put a batch that could not be sent back in front of the changes made since, for the next flush
+function restorePendingStats(batch) {
+    batch.deltas.forEach(({ id, correct, wrong, lastSeen }) => {
+        const delta = pendingDeltas[id] || (pendingDeltas[id] = { correct: 0, wrong: 0, lastSeen: 0 });
+        delta.correct += correct;
+        delta.wrong += wrong;
+        delta.lastSeen = Math.max(delta.lastSeen, lastSeen);
+    });
+    pendingAnswers = batch.answers.concat(pendingAnswers);
+    // A reset made since the batch supersedes its session totals
+    if (!pendingSessionReset) {
+        pendingSessionReset = batch.resetSession;
+        ['correct', 'wrong', 'total'].forEach(key => {
+            pendingSession[key] += batch.session[key];
+        });
+    }
+    scheduleStatsFlush();
+}
+
+// Write stats to localStorage and send pending deltas to the server
+async function flushStats(useBeacon = false) {
+    if (statsFlushTimer !== null) {
+        clearTimeout(statsFlushTimer);
+        statsFlushTimer = null;
+    }
+    saveQuestionStats();
+    saveSessionStats();
+    
+    const deltas = Object.entries(pendingDeltas).map(([id, delta]) => ({ id: Number(id), ...delta }));
+    const answers = pendingAnswers;
+    const hasChanges = deltas.length > 0 || answers.length > 0 || pendingSession.total > 0 || pendingSessionReset;
+    const learner = schedulerApi ? decodeURIComponent(schedulerApi.learner) : null;
+    const session = pendingSession;
+    const resetSession = pendingSessionReset;
+    pendingDeltas = {};
+    pendingSession = { correct: 0, wrong: 0, total: 0 };
+    pendingSessionReset = false;
+    pendingAnswers = [];
+    if (!schedulerApi || !hasChanges) {
+        return;
+    }
+    
+    const batch = { learner, deltas, answers, session, resetSession };
+    const body = JSON.stringify(batch);
+    
+    if (useBeacon && navigator.sendBeacon) {
+        if (!navigator.sendBeacon('api/sync', new Blob([body], { type: 'application/json' }))) {
+            restorePendingStats(batch);
+        }
+        return;
+    }
+    // The batch only leaves the buffers once the server has accepted it
+    try {
+        const response = await fetch('api/sync', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body
+        });
+        if (!response.ok) {
+            console.warn(`Stats could not be sent to the server: HTTP ${response.status}`);
+            restorePendingStats(batch);
+        }
+    } catch (error) {
+        console.warn('Stats could not be sent to the server:', error);
+        restorePendingStats(batch);
+    }
+}
+
+// Fetch one shard (once) and register its questions
+function loadShard(shardNumber) {
+    if (!shardRequests[shardNumber]) {
+        shardRequests[shardNumber] = fetch(`questions/${shardFiles[shardNumber].file}`)
+            .then(response => response.json())
+            .then(shard => {
+                shard.forEach(q => {
+                    loadedQuestions[q.id] = q;
+                });
+            })
+            .catch(error => {
+                // Allow a retry on the next request
+                delete shardRequests[shardNumber];
+                throw error;
+            });
+    }
+    return shardRequests[shardNumber];
+}
+
+// Return the full question for a manifest entry, loading its shard if needed
+async function loadQuestion(entry) {
+    if (!loadedQuestions[entry.id]) {
+        await loadShard(entry.shard);
+    }
+    return loadedQuestions[entry.id];
+}
+
+// Kullanıcı soruyu cevaplarken kalan shard'ları arka planda sırayla yükle
+async function prefetchShards() {
+    if (prefetching) return;
+    prefetching = true;
+    for (let i = 0; i < shardFiles.length; i++) {
+        try {
+            await loadShard(i);
+        } catch (error) {
+            console.warn(`Shard ${shardFiles[i].file} could not be prefetched:`, error);
+        }
+    }
+    prefetching = false;
+    if (bankCacheStale) {
+        refreshCachedBank();
+    }
+}
+
 // Load session stats from localStorage
 function loadSessionStats() {
     const saved = localStorage.getItem('sessionStats');
@@ -60,7 +406,7 @@ function loadSessionStats() {
     }
 }
 
-// Save session stats to localStorage
+// Save session stats to localStorage (called from flushStats)
 function saveSessionStats() {
     localStorage.setItem('sessionStats', JSON.stringify(sessionStats));
 }
@@ -73,7 +419,7 @@ function loadQuestionStats() {
     }
 }
 
-// Save question stats to localStorage
+// Save question stats to localStorage (called from flushStats)
 function saveQuestionStats() {
     localStorage.setItem('questionStats', JSON.stringify(questionStats));
 }
@@ -107,6 +453,9 @@ function resetSessionStats() {
         
         // localStorage'dan session stats'ı sil
         localStorage.removeItem('sessionStats');
+        pendingSession = { correct: 0, wrong: 0, total: 0 };
+        pendingSessionReset = true;
+        flushStats();
         
         // Ekranı güncelle
         updateStatsDisplay();
@@ -210,7 +559,10 @@ function displayQuestion(question) {
     const domainBadge = document.getElementById('domain-badge');
     const domainName = document.getElementById('domain-name');
     if (question.domain) {
-        domainName.textContent = question.domain;
+        const secondary = question.secondary_domains || [];
+        domainName.textContent = secondary.length
+            ? `${question.domain} (+${secondary.join(', ')})`
+            : question.domain;
         domainBadge.style.display = 'flex';
         
         // Add domain-specific class for styling
@@ -260,7 +612,8 @@ function displayQuestion(question) {
     // Update last seen timestamp
     if (questionStats[question.id]) {
         questionStats[question.id].lastSeen = Date.now();
-        saveQuestionStats();
+        recordQuestionDelta(question.id, 'lastSeen', questionStats[question.id].lastSeen);
+        scheduleStatsFlush();
     }
 }
 
@@ -298,8 +651,9 @@ function checkAnswer() {
         } else {
             questionStats[currentQuestion.id].wrong++;
         }
-        saveQuestionStats();
+        recordQuestionDelta(currentQuestion.id, isCorrect ? 'correct' : 'wrong');
     }
+    pendingAnswers.push({ id: currentQuestion.id, answer: selectedAnswer, correct: isCorrect, ts: Date.now() });
     
     // Update session stats
     if (isCorrect) {
@@ -308,7 +662,12 @@ function checkAnswer() {
         sessionStats.wrong++;
     }
     sessionStats.total++;
-    saveSessionStats();
+    if (exam) {
+        recordExamAnswer(isCorrect);
+    }
+    pendingSession[isCorrect ? 'correct' : 'wrong']++;
+    pendingSession.total++;
+    scheduleStatsFlush();
     updateStatsDisplay();
     
     // Show feedback
@@ -354,10 +713,33 @@ function checkAnswer() {
 }
 
 // Next question
-function nextQuestion() {
-    const nextQ = getNextQuestion();
+async function nextQuestion() {
+    if (exam) {
+        return nextExamQuestion();
+    }
+    let nextQ;
+    try {
+        if (schedulerApi) {
+            // The server scheduler has to see the last answer before choosing
+            await flushStats();
+        }
+        nextQ = schedulerApi ? await getNextQuestionFromServer() : getNextQuestion();
+    } catch (error) {
+        // Scheduler API went away; continue in the browser
+        console.warn('Scheduler API unavailable, falling back to local scheduling:', error);
+        schedulerApi = null;
+        nextQ = getNextQuestion();
+    }
     if (nextQ) {
-        displayQuestion(nextQ);
+        try {
+            displayQuestion(await loadQuestion(nextQ));
+        } catch (error) {
+            console.error('Error loading question shard:', error);
+            document.getElementById('question-text').textContent = 
+                'Soru yüklenirken bir hata oluştu. Lütfen tekrar deneyin.';
+            return;
+        }
+        prefetchShards();
     } else {
         // No more questions
         document.getElementById('question-text').textContent = 
@@ -369,6 +751,354 @@ function nextQuestion() {
     }
 }
 
+// Load the search index once; null when the build did not write one
+function loadSearchIndex() {
+    if (!searchIndexRequest) {
+        searchIndexRequest = fetch('questions/search.json')
+            .then(response => response.ok ? response.json() : null)
+            .catch(() => null)
+            .then(index => {
+                if (index && index.version === 1) {
+                    searchIndex = {
+                        ...index,
+                        termNumbers: new Map(index.terms.map((term, number) => [term, number])),
+                        decoded: new Map()
+                    };
+                    document.getElementById('search-input').placeholder =
+                        `${index.ids.length} soruda ara (ör. Transfer Acceleration, DAX)`;
+                } else {
+                    document.getElementById('search-container').style.display = 'none';
+                }
+                return searchIndex;
+            });
+    }
+    return searchIndexRequest;
+}
+
+// Same tokenizer as search_index.tokenize
+function searchTokens(text) {
+    return (text.normalize('NFKC').toLowerCase().match(/[a-z0-9]+/g) || [])
+        .filter(token => !SEARCH_STOPWORDS.has(token) && (token.length > 1 || /[0-9]/.test(token)));
+}
+
+// Doc numbers and field masks of one term, decoded from its delta-encoded posting
+function decodePosting(number) {
+    let decoded = searchIndex.decoded.get(number);
+    if (!decoded) {
+        const posting = searchIndex.postings[number];
+        const docs = new Int32Array(posting.length);
+        const masks = new Uint8Array(posting.length);
+        let doc = 0;
+        posting.forEach((value, i) => {
+            doc += Math.floor(value / 8);
+            docs[i] = doc;
+            masks[i] = value & 7;
+        });
+        decoded = { docs, masks };
+        searchIndex.decoded.set(number, decoded);
+    }
+    return decoded;
+}
+
+// Term numbers starting with prefix, most frequent first
+function expandPrefix(prefix, limit) {
+    const range = searchIndex.prefixes[prefix.slice(0, SEARCH_PREFIX_LENGTH)];
+    if (!range) return [];
+    let [start, end] = range;
+    if (prefix.length > SEARCH_PREFIX_LENGTH) {
+        const lowerBound = (value, low, high) => {
+            while (low < high) {
+                const middle = (low + high) >> 1;
+                if (searchIndex.terms[middle] < value) low = middle + 1; else high = middle;
+            }
+            return low;
+        };
+        start = lowerBound(prefix, start, end);
+        end = lowerBound(prefix + '\uffff', start, end);
+    }
+    const numbers = [];
+    for (let number = start; number < end; number++) numbers.push(number);
+    const length = number => searchIndex.postings[number].length;
+    return numbers.sort((a, b) => length(b) - length(a)).slice(0, limit);
+}
+
+// [questionId, score] pairs matching every word of query; the last word is a prefix while typing
+function searchQuestions(query, limit = SEARCH_LIMIT) {
+    const tokens = searchTokens(query);
+    if (!searchIndex || tokens.length === 0) return [];
+    const prefix = !/\s$/.test(query);
+    
+    const slots = [];
+    for (let position = 0; position < tokens.length; position++) {
+        const exact = searchIndex.termNumbers.get(tokens[position]);
+        let numbers = exact === undefined ? [] : [exact];
+        if (prefix && position === tokens.length - 1) {
+            numbers = numbers.concat(expandPrefix(tokens[position], SEARCH_MAX_EXPANSIONS).filter(n => n !== exact));
+        }
+        if (numbers.length === 0) return [];
+        slots.push(numbers);
+    }
+    const size = numbers => numbers.reduce((sum, number) => sum + searchIndex.postings[number].length, 0);
+    slots.sort((a, b) => size(a) - size(b));
+    
+    // Dense score vectors: each word adds its best term's idf x field weight, misses rule a doc out
+    const docCount = searchIndex.ids.length;
+    const total = new Float64Array(docCount);
+    const matched = new Uint8Array(docCount).fill(1);
+    slots.forEach(numbers => {
+        const scores = new Float64Array(docCount);
+        numbers.forEach(number => {
+            const { docs, masks } = decodePosting(number);
+            const idf = Math.log(1 + docCount / docs.length);
+            for (let i = 0; i < docs.length; i++) {
+                const score = idf * SEARCH_MASK_WEIGHTS[masks[i]];
+                if (score > scores[docs[i]]) scores[docs[i]] = score;
+            }
+        });
+        for (let doc = 0; doc < docCount; doc++) {
+            total[doc] += scores[doc];
+            if (scores[doc] === 0) matched[doc] = 0;
+        }
+    });
+    
+    // Keep the best `limit` docs; earlier docs win ties
+    const best = [];
+    for (let doc = 0; doc < docCount; doc++) {
+        if (!matched[doc]) continue;
+        if (best.length === limit && total[doc] <= best[best.length - 1][1]) continue;
+        let i = best.length;
+        while (i > 0 && best[i - 1][1] < total[doc]) i--;
+        best.splice(i, 0, [doc, total[doc]]);
+        if (best.length > limit) best.pop();
+    }
+    return best.map(([doc, score]) => [searchIndex.ids[doc], score]);
+}
+
+// Type-ahead: the query with its last word completed by the most frequent terms
+function searchSuggestions(query, limit = 8) {
+    const words = query.split(/\s+/);
+    const last = searchTokens(words[words.length - 1]).pop();
+    if (!searchIndex || !last || /\s$/.test(query)) return [];
+    const head = words.slice(0, -1).join(' ');
+    return expandPrefix(last, limit)
+        .map(number => searchIndex.terms[number])
+        .filter(term => term !== last)
+        .map(term => (head ? `${head} ${term}` : term));
+}
+
+// Show the result list; question texts are filled in as their shards arrive
+function showSearchResults(query) {
+    const resultsList = document.getElementById('search-results');
+    const suggestions = document.getElementById('search-suggestions');
+    resultsList.innerHTML = '';
+    suggestions.innerHTML = '';
+    if (!query.trim()) {
+        resultsList.style.display = 'none';
+        return;
+    }
+    
+    searchSuggestions(query).forEach(value => {
+        const option = document.createElement('option');
+        option.value = value;
+        suggestions.appendChild(option);
+    });
+    
+    const results = searchQuestions(query);
+    if (results.length === 0) {
+        const empty = document.createElement('li');
+        empty.className = 'search-empty';
+        empty.textContent = 'Sonuç bulunamadı';
+        resultsList.appendChild(empty);
+    }
+    results.forEach(([id]) => {
+        const entry = questions.find(q => q.id === id);
+        if (!entry) return;
+        const item = document.createElement('li');
+        const label = document.createElement('span');
+        label.className = 'search-result-id';
+        label.textContent = `Soru #${id}`;
+        const text = document.createElement('span');
+        item.appendChild(label);
+        item.appendChild(text);
+        item.onclick = async () => {
+            resultsList.style.display = 'none';
+            try {
+                displayQuestion(await loadQuestion(entry));
+            } catch (error) {
+                console.error('Error loading question shard:', error);
+            }
+        };
+        resultsList.appendChild(item);
+        loadQuestion(entry)
+            .then(question => {
+                text.textContent = question.question.length > 140
+                    ? `${question.question.slice(0, 140)}...` : question.question;
+            })
+            .catch(() => {});
+    });
+    resultsList.style.display = 'block';
+}
+
+// Wire up the search box; the index is only downloaded once the box is used
+function setupSearch() {
+    const input = document.getElementById('search-input');
+    const resultsList = document.getElementById('search-results');
+    input.addEventListener('focus', loadSearchIndex);
+    input.addEventListener('input', async () => {
+        await loadSearchIndex();
+        showSearchResults(input.value);
+    });
+    input.addEventListener('keydown', event => {
+        if (event.key === 'Escape') {
+            resultsList.style.display = 'none';
+        }
+    });
+    document.addEventListener('click', event => {
+        if (!document.getElementById('search-container').contains(event.target)) {
+            resultsList.style.display = 'none';
+        }
+    });
+}
+
+// Next exam from the server (review=1: own wrong answers first) or from the static pool
+async function loadExam(review) {
+    if (schedulerApi) {
+        const learner = encodeURIComponent(getLearnerId());
+        try {
+            const response = await fetch(`api/exam?learner=${learner}${review ? '&review=1' : ''}`);
+            if (response.ok) return await response.json();
+        } catch (error) {
+            console.warn('Exam API unavailable, using the static exam pool:', error);
+        }
+    }
+    const response = await fetch('questions/exams.json');
+    if (!response.ok) throw new Error('No exam pool');
+    const pool = await response.json();
+    // Walk the pool like the server does, one exam after the other
+    const cursor = Number(localStorage.getItem('examCursor') || 0);
+    localStorage.setItem('examCursor', String(cursor + 1));
+    const number = cursor % pool.exams.length;
+    return { exam: number, minutes: pool.minutes, ids: pool.exams[number] };
+}
+
+// The exam button starts an exam, or finishes the running one
+async function toggleExam() {
+    if (exam) {
+        if (confirm('Sınavı şimdi bitirmek istediğinize emin misiniz?')) {
+            finishExam(false);
+        }
+        return;
+    }
+    const review = schedulerApi !== null &&
+        confirm('Daha önce yanlış cevapladığınız sorular öncelikli gelsin mi?');
+    let loaded;
+    try {
+        loaded = await loadExam(review);
+    } catch (error) {
+        console.error('Error loading exam:', error);
+        alert('Deneme sınavı yüklenemedi. questions/exams.json dosyasını mock_exam.py ile oluşturun.');
+        return;
+    }
+    const known = new Set(questions.map(q => q.id));
+    const ids = loaded.ids.filter(id => known.has(id));
+    if (ids.length === 0) return;
+    exam = {
+        number: loaded.exam,
+        ids,
+        position: 0,
+        deadline: Date.now() + loaded.minutes * 60000,
+        timer: setInterval(updateExamStatus, 1000),
+        results: {}
+    };
+    document.getElementById('exam-button').textContent = '⏹ Sınavı Bitir';
+    document.getElementById('exam-status').style.display = 'block';
+    updateExamStatus();
+    await nextExamQuestion();
+}
+
+async function nextExamQuestion() {
+    if (exam.position >= exam.ids.length) {
+        finishExam(false);
+        return;
+    }
+    const id = exam.ids[exam.position++];
+    try {
+        displayQuestion(await loadQuestion(questions.find(q => q.id === id)));
+    } catch (error) {
+        console.error('Error loading question shard:', error);
+        document.getElementById('question-text').textContent = 
+            'Soru yüklenirken bir hata oluştu. Lütfen tekrar deneyin.';
+        return;
+    }
+    document.getElementById('question-progress').textContent = `Sınav: ${exam.position} / ${exam.ids.length}`;
+    updateExamStatus();
+}
+
+function recordExamAnswer(isCorrect) {
+    const domain = currentQuestion.domain_short || 'Diğer';
+    const result = exam.results[domain] || (exam.results[domain] = [0, 0]);
+    result[0] += isCorrect ? 1 : 0;
+    result[1]++;
+}
+
+function updateExamStatus() {
+    if (!exam) return;
+    const remaining = Math.max(0, exam.deadline - Date.now());
+    const minutes = Math.floor(remaining / 60000);
+    const seconds = String(Math.floor(remaining / 1000) % 60).padStart(2, '0');
+    const answered = Object.values(exam.results).reduce((sum, [, total]) => sum + total, 0);
+    document.getElementById('exam-status').textContent =
+        `📝 Deneme sınavı: ${answered} / ${exam.ids.length} cevaplandı · Kalan süre ${minutes}:${seconds}`;
+    if (remaining === 0) {
+        finishExam(true);
+    }
+}
+
+// Show the score; unanswered questions count as wrong, like in the real exam
+function finishExam(timedOut) {
+    clearInterval(exam.timer);
+    const finished = exam;
+    exam = null;
+    document.getElementById('exam-button').textContent = '📝 Deneme Sınavı';
+    document.getElementById('exam-status').style.display = 'none';
+    
+    const correct = Object.values(finished.results).reduce((sum, [right]) => sum + right, 0);
+    const ratio = correct / finished.ids.length;
+    const passed = ratio >= EXAM_PASS_RATIO;
+    
+    document.getElementById('question-number').textContent = 'Deneme Sınavı Sonucu';
+    document.getElementById('question-progress').textContent = timedOut ? 'Süre doldu' : '';
+    document.getElementById('question-text').textContent =
+        `${finished.ids.length} sorudan ${correct} doğru: %${Math.round(ratio * 100)} ` +
+        `(geçme notu %${Math.round(EXAM_PASS_RATIO * 100)})`;
+    document.getElementById('domain-badge').style.display = 'none';
+    
+    const breakdown = document.getElementById('options-container');
+    breakdown.innerHTML = '';
+    Object.entries(finished.results).sort().forEach(([domain, [right, total]]) => {
+        const row = document.createElement('div');
+        row.className = `exam-result domain-${domain.toLowerCase()}`;
+        row.textContent = `${domain}: ${right} / ${total} doğru (%${Math.round(right / total * 100)})`;
+        breakdown.appendChild(row);
+    });
+    
+    const feedbackMessage = document.getElementById('feedback-message');
+    feedbackMessage.textContent = passed ? '✓ Geçtiniz!' : '✗ Kaldınız.';
+    feedbackMessage.className = `feedback-message ${passed ? 'correct' : 'wrong'}`;
+    document.getElementById('feedback-container').style.display = 'block';
+    document.getElementById('solution-container').style.display = 'none';
+    document.getElementById('check-button').style.display = 'none';
+    document.getElementById('next-button').style.display = 'inline-block';
+    currentQuestion = null;
+}
+
 // Initialize on page load
 document.addEventListener('DOMContentLoaded', init);
 
+// Do not lose buffered stats when the tab is hidden or closed
+document.addEventListener('visibilitychange', () => {
+    if (document.visibilityState === 'hidden') {
+        flushStats(true);
+    }
+});
+
@@ -0,0 +1,361 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Local web server: serves the static app and a small JSON API
+
+    GET  /api/next?learner=ID    -> {"id": question id}   (marks it as seen)
+    GET  /api/sync?learner=ID    -> {"questions": {id: [correct, wrong, lastSeen]},
+                                     "session": [correct, wrong, total]}
+    GET  /api/exam?learner=ID[&review=1]
+                                 -> {"exam": number, "minutes": m, "ids": [question ids]}
+    GET  /api/bank               -> {"version", "etag", "questions": [...]}   (ETag, 304)
+    GET  /api/bank/delta?since=V -> {"version", "since", "added", "changed", "removed", ...}
+                                    (304 if V is current, 410 if V is not kept)
+    POST /api/sync               <- {"learner": ID, "deltas": [{id, correct, wrong, lastSeen}],
+                                     "answers": [{id, answer, correct, ts}],
+                                     "session": {correct, wrong, total}, "resetSession": bool}
+                                 -> {"ok": true, "unknown": [ids not in the bank, skipped]}
+
+Used by start_server.sh instead of `python3 -m http.server`; app.js falls back
+to its in-browser scheduler and localStorage when the API is not available
+(e.g. behind nginx). Stats deltas are buffered and written to SQLite in
+periodic batches (see stats_service.py). Mock exams are looked up in the
+precomputed pool (questions/exams.json, see mock_exam.py); with review=1 the
+learner gets a small pool of their own in which questions they got wrong come
+first, rebuilt once it has been used up. Every answer is also appended to the
+answer event log (see answer_log.py); once it has been rolled up, questions
+many learners get wrong come early in review pools too. The bank is also kept
+in memory with a version number and ETag (see bank_versions.py), so cached
+clients only download what changed since their version. When questions.json
+changes, the ids, review pools and every learner's scheduler follow the new
+version on the next request.
+"""
+
+import argparse
+import json
+import os
+import signal
+import threading
+from collections import OrderedDict
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from answer_log import (DEFAULT_LOG_DIR, ROLLUP_NAME, AnswerLog, AnswerRollup, combine_preferences,
+                        difficulty_preference, normalize_answer)
+from bank_versions import DEFAULT_VERSIONS_DIR, BankStore
+from mock_exam import EXAMS_NAME, ExamPool, generate_pool, learner_preference
+from question_shards import SHARD_DIR
+from scheduler import Scheduler
+from stats_service import StatsDatabase, WriteBehindStats, normalize_delta, stats_from_snapshot
+
+DEFAULT_LEARNER = 'default'
+# Exams in a learner's review pool before it is rebuilt from their latest stats
+REVIEW_EXAMS = 5
+# Learners whose scheduler and review pool stay in memory; the least recently active one is
+# dropped beyond this and rebuilt from the stats database when it comes back
+MAX_LEARNERS = 1000
+
+class AppState:
+    """Question bank, buffered stats, one scheduler per learner and the mock exam pool"""
+
+    def __init__(self, bank_file, stats_db, flush_interval, exams_file=None, answer_log_dir=None,
+                 versions_dir=DEFAULT_VERSIONS_DIR):
+        self.bank_file = bank_file
+        self.bank_store = BankStore(bank_file, versions_dir)
+        self.stats = WriteBehindStats(StatsDatabase(stats_db), flush_interval)
+        self.schedulers = {}
+        self.learners = OrderedDict()
+        self.exam_pool = ExamPool.load(exams_file) if exams_file and os.path.exists(exams_file) else None
+        self.review_pools = {}
+        self.review_builds = {}
+        self.answer_log = AnswerLog(answer_log_dir) if answer_log_dir else None
+        self._rollup = (None, None)
+        self.lock = threading.Lock()
+        # Usable questions of the current bank version, taken from bank_store (see refresh_bank)
+        self._bank_version = None
+        self._bank = []
+        self.question_ids = []
+        self.known_ids = frozenset()
+        self.refresh_bank()
+
+    def refresh_bank(self):
+        """Follow bank_store to a new bank version: new ids, new bank, updated schedulers.
+
+        Schedulers keep their state; questions that joined the bank are added
+        (with the learner's stats if they answered them before) and questions
+        that left are dropped. Review pools are rebuilt from the new bank.
+        """
+        self.bank_store.refresh()
+        with self.bank_store.lock:
+            version, records = self.bank_store.version, self.bank_store.records
+        with self.lock:
+            if version == self._bank_version:
+                return
+            ids = list(records)
+            added = [qid for qid in ids if qid not in self.known_ids]
+            removed = self.known_ids.difference(ids)
+            for learner, scheduler in self.schedulers.items():
+                saved = stats_from_snapshot(self.stats.snapshot(learner)) if added else {}
+                for qid in added:
+                    scheduler.add_question(qid, saved.get(qid))
+                for qid in removed:
+                    scheduler.remove_question(qid)
+            self.question_ids = ids
+            self.known_ids = frozenset(ids)
+            self._bank = list(records.values())
+            self.review_pools = {}
+            self._bank_version = version
+
+    def _touch(self, learner):
+        """Mark a learner as active and drop the in-memory state of the least recently active ones"""
+        self.learners[learner] = None
+        self.learners.move_to_end(learner)
+        while len(self.learners) > MAX_LEARNERS:
+            evicted, _ = self.learners.popitem(last=False)
+            self.schedulers.pop(evicted, None)
+            self.review_pools.pop(evicted, None)
+            self.review_builds.pop(evicted, None)
+
+    def scheduler(self, learner):
+        self._touch(learner)
+        if learner not in self.schedulers:
+            snapshot = self.stats.snapshot(learner)
+            self.schedulers[learner] = Scheduler(self.question_ids, stats_from_snapshot(snapshot))
+        return self.schedulers[learner]
+
+    def next_question(self, learner):
+        self.refresh_bank()
+        with self.lock:
+            return self.scheduler(learner).next_question()
+
+    def bank(self):
+        """Usable questions of the current bank version"""
+        return self._bank
+
+    def difficulty(self):
+        """{qid: difficulty} from the latest answer log rollup, reloaded when the rollup job rewrites it"""
+        if self.answer_log is None:
+            return {}
+        path = os.path.join(self.answer_log.directory, ROLLUP_NAME)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            return {}
+        if self._rollup[0] != mtime:
+            self._rollup = (mtime, AnswerRollup.load(path).difficulty())
+        return self._rollup[1]
+
+    def review_pool(self, learner):
+        self._touch(learner)
+        pool = self.review_pools.get(learner)
+        if pool is None or pool.served(learner) >= len(pool):
+            preference = combine_preferences(
+                learner_preference(stats_from_snapshot(self.stats.snapshot(learner))),
+                difficulty_preference(self.difficulty()))
+            # A new seed per rebuild, so a rebuilt pool does not repeat the previous one
+            self.review_builds[learner] = self.review_builds.get(learner, 0) + 1
+            seed = f"{learner}/{self.review_builds[learner]}"
+            pool = ExamPool(generate_pool(self.bank(), REVIEW_EXAMS, seed=seed, preference=preference),
+                            spread=False)
+            self.review_pools[learner] = pool
+        return pool
+
+    def next_exam(self, learner, review=False):
+        """{"exam", "minutes", "ids"} of the learner's next mock exam, or None without a pool"""
+        self.refresh_bank()
+        with self.lock:
+            pool = self.review_pool(learner) if review else self.exam_pool
+            if pool is None:
+                return None
+            number, ids = pool.next_exam(learner)
+            return {'exam': number, 'minutes': pool.minutes, 'ids': ids}
+
+    def sync(self, learner, deltas, session=None, reset_session=False, answers=()):
+        """Buffer a batch of deltas, log the answers and apply the answer counts to the scheduler.
+
+        Everything is validated before anything is written, so a malformed
+        request changes nothing. Deltas and answers of questions that are not
+        in the bank (e.g. removed since the client cached it) are skipped;
+        returns their ids.
+        """
+        self.refresh_bank()
+        deltas = [normalize_delta(delta) for delta in deltas]
+        answers = [normalize_answer(answer) for answer in answers]
+        known_ids = self.known_ids
+        unknown = sorted({item['id'] for item in deltas + answers if item['id'] not in known_ids})
+        deltas = [delta for delta in deltas if delta['id'] in known_ids]
+        answers = [answer for answer in answers if answer['id'] in known_ids]
+        if session:
+            session = {key: int(session.get(key, 0)) for key in ('correct', 'wrong', 'total')}
+        if self.answer_log:
+            self.answer_log.append(learner, answers)
+        self.stats.add(learner, deltas, session, reset_session)
+        with self.lock:
+            scheduler = self.schedulers.get(learner)
+            if scheduler is None:
+                return unknown
+            for delta in deltas:
+                qid = delta['id']
+                # The bank may have changed since the ids were checked
+                if qid not in scheduler.stats:
+                    continue
+                for _ in range(delta['correct']):
+                    scheduler.record_answer(qid, True)
+                for _ in range(delta['wrong']):
+                    scheduler.record_answer(qid, False)
+        return unknown
+
+class AppHTTPServer(ThreadingHTTPServer):
+    # The default backlog of 5 resets connections as soon as a class logs in at once
+    request_queue_size = 128
+
+class AppRequestHandler(SimpleHTTPRequestHandler):
+    """Static files from the app directory plus the /api/ routes"""
+
+    def __init__(self, *args, state=None, **kwargs):
+        self.state = state
+        super().__init__(*args, **kwargs)
+
+    def send_json(self, payload, status=200):
+        body = json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Cache-Control', 'no-store')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_encoded(self, etag, encoded, status=200):
+        """Send a bank_versions.EncodedBody, gzip-compressed if the client accepts it"""
+        body = encoded.body
+        use_gzip = encoded.gzip is not None and 'gzip' in self.headers.get('Accept-Encoding', '')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        if use_gzip:
+            body = encoded.gzip
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Vary', 'Accept-Encoding')
+        self.send_header('ETag', etag)
+        # Cached copies are revalidated with If-None-Match on every use
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_not_modified(self, etag):
+        self.send_response(304)
+        self.send_header('ETag', etag)
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+
+    def etag_matches(self, etag):
+        header = self.headers.get('If-None-Match', '')
+        tags = [tag.strip().removeprefix('W/') for tag in header.split(',')]
+        return etag in tags or '*' in tags
+
+    def read_json(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return json.loads(self.rfile.read(length) or b'{}')
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if not url.path.startswith('/api/'):
+            return super().do_GET()
+
+        query = parse_qs(url.query)
+        learner = query.get('learner', [DEFAULT_LEARNER])[0]
+        if url.path == '/api/next':
+            self.send_json({'id': self.state.next_question(learner)})
+        elif url.path == '/api/exam':
+            exam = self.state.next_exam(learner, query.get('review', ['0'])[0] == '1')
+            if exam is None:
+                self.send_json({'error': 'no exam pool'}, 404)
+            else:
+                self.send_json(exam)
+        elif url.path == '/api/sync':
+            self.send_json(self.state.stats.snapshot(learner))
+        elif url.path == '/api/bank':
+            etag, encoded = self.state.bank_store.full()
+            if self.etag_matches(etag):
+                self.send_not_modified(etag)
+            else:
+                self.send_encoded(etag, encoded)
+        elif url.path == '/api/bank/delta':
+            try:
+                since = int(query['since'][0])
+            except (KeyError, ValueError):
+                return self.send_json({'error': 'since must be a bank version'}, 400)
+            try:
+                etag, encoded = self.state.bank_store.delta(since)
+            except KeyError as e:
+                return self.send_json({'error': e.args[0]}, 410)
+            if encoded is None:
+                self.send_not_modified(etag)
+            else:
+                self.send_encoded(etag, encoded)
+        else:
+            self.send_json({'error': 'not found'}, 404)
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        try:
+            payload = self.read_json()
+        except ValueError:
+            return self.send_json({'error': 'invalid JSON'}, 400)
+        if not isinstance(payload, dict):
+            return self.send_json({'error': 'expected a JSON object'}, 400)
+
+        if url.path == '/api/sync':
+            learner = payload.get('learner') or DEFAULT_LEARNER
+            if not isinstance(learner, str):
+                return self.send_json({'error': 'learner must be a string'}, 400)
+            try:
+                unknown = self.state.sync(learner, payload.get('deltas') or [], payload.get('session'),
+                                          bool(payload.get('resetSession')), payload.get('answers') or [])
+            except (KeyError, TypeError, ValueError):
+                return self.send_json({'error': 'malformed deltas'}, 400)
+            self.send_json({'ok': True, 'unknown': unknown} if unknown else {'ok': True})
+        else:
+            self.send_json({'error': 'not found'}, 404)
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve the app with the scheduler and stats API')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--bind', default='0.0.0.0')
+    parser.add_argument('--directory', default='.', help='Directory with index.html and questions.json')
+    parser.add_argument('--bank', default='questions.json', help='Question bank used by the scheduler')
+    parser.add_argument('--exams', default=os.path.join(SHARD_DIR, EXAMS_NAME),
+                        help='Precomputed mock exam pool (see mock_exam.py)')
+    parser.add_argument('--stats-db', default='learner_stats.db', help='SQLite file where learner stats are kept')
+    parser.add_argument('--flush-interval', type=float, default=2.0,
+                        help='Seconds between batched stats writes')
+    parser.add_argument('--answer-log', default=DEFAULT_LOG_DIR,
+                        help='Directory of the answer event log (empty to disable, see answer_log.py)')
+    parser.add_argument('--versions-dir', default=DEFAULT_VERSIONS_DIR,
+                        help='Bank version history for delta updates (see bank_versions.py)')
+    args = parser.parse_args()
+
+    state = AppState(args.bank, args.stats_db, args.flush_interval, args.exams, args.answer_log,
+                     args.versions_dir)
+    state.stats.start()
+    handler = partial(AppRequestHandler, state=state, directory=args.directory)
+    server = AppHTTPServer((args.bind, args.port), handler)
+    # docker stop / kill send SIGTERM; shut down cleanly so buffered stats are flushed
+    def handle_sigterm(signum, frame):
+        raise KeyboardInterrupt
+    signal.signal(signal.SIGTERM, handle_sigterm)
+    
+    print(f"Serving {args.directory} with {len(state.question_ids)} questions on http://localhost:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        state.stats.stop()
+        if state.answer_log:
+            state.answer_log.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Version history of the question bank, for delta updates of cached clients
+
+Every pipeline run that changes questions.json records a new bank version
+(pipeline stage 'versions'):
+
+    bank_versions/
+        history.json        {"current": 7, "versions": [{"version", "etag", "count", "created"}, ...]}
+        v000007.json        {"version": 7, "hashes": [[question id, content hash], ...]}
+
+A version file holds a short hash of every question's JSON, so the delta
+between any kept version and the current bank is a comparison of two hash
+maps: ids that are new, ids whose hash changed and ids that are gone. Only
+the added and changed questions are sent, so an update costs bytes (and
+client parse time) in proportion to the change, not to the bank. The last
+KEEP_VERSIONS versions are kept; a client with an older version loads the
+whole bank again.
+
+app_server.py serves the bank from memory (BankStore):
+
+    GET /api/bank                 -> {"version", "etag", "questions": [...]}
+                                     ETag; If-None-Match with the current ETag -> 304
+    GET /api/bank/delta?since=V   -> {"version", "since", "etag", "count",
+                                      "added": [questions], "changed": [questions], "removed": [ids]}
+                                     304 if V is current, 410 if V is unknown
+
+Bodies are encoded once per version (and per since for deltas) and sent
+gzip-compressed to clients that accept it. app.js keeps the bank in IndexedDB
+and asks for the delta since its version on every load; without a cached
+version it loads the shards lazily and fetches /api/bank in the background
+for the next visit. Only usable questions (at least two options, as in
+scheduler.load_question_ids) are versioned and sent. Questions are keyed by
+id; if the bank repeats an id the first record is used.
+
+    python3 bank_versions.py                     # record questions.json if it changed
+    python3 bank_versions.py --delta 3           # what changed since version 3
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+
+from parse_cache import write_atomic
+
+DEFAULT_VERSIONS_DIR = 'bank_versions'
+HISTORY_NAME = 'history.json'
+KEEP_VERSIONS = 10
+# 48-bit content hashes: short enough for large banks, long enough that a change is never missed in practice
+HASH_LENGTH = 12
+# Bodies below this size are sent uncompressed
+MIN_GZIP_SIZE = 1024
+
+def question_hash(q):
+    text = json.dumps(q, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()[:HASH_LENGTH]
+
+def bank_records(questions):
+    """{id: question} of the usable questions (at least two options), first record of a repeated id"""
+    records = {}
+    for q in questions:
+        if len(q.get('options') or {}) >= 2:
+            records.setdefault(q['id'], q)
+    return records
+
+def bank_hashes(records):
+    return {qid: question_hash(q) for qid, q in records.items()}
+
+def bank_etag(version, hashes):
+    digest = hashlib.sha256(json.dumps(sorted(hashes.items())).encode('utf-8')).hexdigest()[:HASH_LENGTH]
+    return f'"bank-{version}-{digest}"'
+
+def version_path(versions_dir, version):
+    return os.path.join(versions_dir, f"v{version:06d}.json")
+
+def load_history(versions_dir):
+    path = os.path.join(versions_dir, HISTORY_NAME)
+    if not os.path.exists(path):
+        return {'current': 0, 'versions': []}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def load_hashes(versions_dir, version):
+    """{id: hash} of a recorded version; raises KeyError if it is not kept"""
+    try:
+        with open(version_path(versions_dir, version), 'r', encoding='utf-8') as f:
+            return {qid: digest for qid, digest in json.load(f)['hashes']}
+    except FileNotFoundError:
+        raise KeyError(f"Bank version {version} is not kept") from None
+
+def record_version(questions, versions_dir=DEFAULT_VERSIONS_DIR, keep=KEEP_VERSIONS):
+    """Record questions as a new version unless they equal the current one; returns its history entry"""
+    return record_hashes(bank_hashes(bank_records(questions)), versions_dir, keep)
+
+def record_hashes(hashes, versions_dir=DEFAULT_VERSIONS_DIR, keep=KEEP_VERSIONS):
+    """record_version for the {id: hash} map of a bank"""
+    history = load_history(versions_dir)
+    current = history['current']
+    if current and history['versions']:
+        try:
+            if load_hashes(versions_dir, current) == hashes:
+                return history['versions'][-1]
+        except KeyError:
+            pass
+
+    version = current + 1
+    entry = {'version': version, 'etag': bank_etag(version, hashes), 'count': len(hashes),
+             'created': int(time.time())}
+    os.makedirs(versions_dir, exist_ok=True)
+    write_atomic(version_path(versions_dir, version),
+                 json.dumps({'version': version, 'hashes': sorted(hashes.items())}, separators=(',', ':')))
+    versions = history['versions'] + [entry]
+    # The history is written last: a version only counts once its hash file exists
+    write_atomic(os.path.join(versions_dir, HISTORY_NAME),
+                 json.dumps({'current': version, 'versions': versions[-keep:]}, indent=2))
+    for old in versions[:-keep]:
+        if os.path.exists(version_path(versions_dir, old['version'])):
+            os.remove(version_path(versions_dir, old['version']))
+    return entry
+
+def compute_delta(old_hashes, hashes):
+    """(added, changed, removed) question ids, each sorted"""
+    added = sorted(qid for qid in hashes if qid not in old_hashes)
+    changed = sorted(qid for qid, digest in hashes.items() if qid in old_hashes and old_hashes[qid] != digest)
+    removed = sorted(qid for qid in old_hashes if qid not in hashes)
+    return added, changed, removed
+
+class EncodedBody:
+    """A JSON payload encoded once, with its gzip form when that is worth sending"""
+
+    def __init__(self, payload):
+        self.body = json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        self.gzip = gzip.compress(self.body, 6, mtime=0) if len(self.body) >= MIN_GZIP_SIZE else None
+
+class BankStore:
+    """The current bank in memory with its version, ETag and encoded responses.
+
+    The bank file is checked on every request (one stat); after a pipeline
+    run it is reloaded and recorded as a version if it changed.
+    """
+
+    def __init__(self, bank_file, versions_dir=DEFAULT_VERSIONS_DIR):
+        self.bank_file = bank_file
+        self.versions_dir = versions_dir
+        self.lock = threading.Lock()
+        self._stat = None
+        self.version = None
+        self.etag = None
+        self.records = {}
+        self.hashes = {}
+        self._full = None
+        self._deltas = {}
+
+    def refresh(self):
+        """Reload the bank if the file changed since it was loaded"""
+        stat = os.stat(self.bank_file)
+        key = (stat.st_size, stat.st_mtime_ns)
+        with self.lock:
+            if key == self._stat:
+                return
+            with open(self.bank_file, 'r', encoding='utf-8') as f:
+                questions = json.load(f)
+            self.records = bank_records(questions)
+            self.hashes = bank_hashes(self.records)
+            entry = record_hashes(self.hashes, self.versions_dir)
+            self.version = entry['version']
+            self.etag = entry['etag']
+            self._full = None
+            self._deltas = {}
+            self._stat = key
+
+    def full(self):
+        """(etag, EncodedBody) of the whole bank"""
+        self.refresh()
+        with self.lock:
+            if self._full is None:
+                self._full = EncodedBody({'version': self.version, 'etag': self.etag,
+                                          'questions': list(self.records.values())})
+            return self.etag, self._full
+
+    def delta(self, since):
+        """(etag, EncodedBody or None if since is current); raises KeyError if since is not kept"""
+        self.refresh()
+        with self.lock:
+            if since == self.version:
+                return self.etag, None
+            if since > self.version:
+                raise KeyError(f"Bank version {since} is newer than {self.version}")
+            encoded = self._deltas.get(since)
+            if encoded is None:
+                added, changed, removed = compute_delta(load_hashes(self.versions_dir, since), self.hashes)
+                encoded = self._deltas[since] = EncodedBody({
+                    'version': self.version, 'since': since, 'etag': self.etag, 'count': len(self.records),
+                    'added': [self.records[qid] for qid in added],
+                    'changed': [self.records[qid] for qid in changed],
+                    'removed': removed,
+                })
+            return self.etag, encoded
+
+def main():
+    parser = argparse.ArgumentParser(description='Record bank versions and show deltas between them')
+    parser.add_argument('-i', '--input', default='questions.json')
+    parser.add_argument('--versions-dir', default=DEFAULT_VERSIONS_DIR)
+    parser.add_argument('--delta', type=int, default=None, metavar='VERSION',
+                        help='Show what changed between VERSION and the current bank')
+    args = parser.parse_args()
+
+    with open(args.input, 'r', encoding='utf-8') as f:
+        questions = json.load(f)
+    entry = record_version(questions, args.versions_dir)
+    print(f"{args.input}: version {entry['version']} ({entry['count']} questions, ETag {entry['etag']})")
+    if args.delta is not None:
+        store = BankStore(args.input, args.versions_dir)
+        try:
+            _, encoded = store.delta(args.delta)
+        except KeyError as e:
+            print(e.args[0])
+            return
+        if encoded is None:
+            print(f"  no changes since version {args.delta}")
+            return
+        delta = json.loads(encoded.body)
+        _, full = store.full()
+        print(f"  since version {args.delta}: {len(delta['added'])} added, {len(delta['changed'])} changed, "
+              f"{len(delta['removed'])} removed; {len(encoded.gzip or encoded.body)} bytes "
+              f"instead of {len(full.gzip or full.body)} for the whole bank")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark the single-pass domain keyword matcher against the original
+one-regex-per-keyword implementation on a synthetic question corpus, and time
+the batch TF-IDF classifier used by analyze_questions on the same corpus
+"""
+
+import argparse
+import random
+import re
+import time
+
+from analyze_domains import DOMAINS, DomainClassifier, get_keyword_matcher, score_domains
+
+FILLER_WORDS = [
+    'company', 'application', 'solutions', 'architect', 'requirements', 'data',
+    'users', 'instances', 'amazon', 'bucket', 'region', 'which', 'should', 'the',
+    'needs', 'design', 'workload', 'database', 'traffic', 'storage', 'minimal',
+    'operational', 'overhead', 'web', 'tier', 'queue', 'files', 'team', 'store',
+]
+
+def score_domains_reference(question_text, options_text, solution_text):
+    """Original per-keyword implementation, kept as the correctness baseline"""
+    full_text = f"{question_text} {options_text} {solution_text}".lower()
+
+    domain_scores = {}
+
+    for domain_name, domain_info in DOMAINS.items():
+        score = 0
+        for keyword in domain_info['keywords']:
+            count = len(re.findall(r'\b' + re.escape(keyword.lower()) + r'\b', full_text))
+            score += count
+        domain_scores[domain_name] = score
+
+    return domain_scores
+
+def generate_corpus(size, seed=0):
+    """Generate (question, options, solution) triples mixing filler and keywords"""
+    rng = random.Random(seed)
+    keywords = [kw for info in DOMAINS.values() for kw in info['keywords']]
+
+    def sentence(length):
+        words = []
+        for _ in range(length):
+            if rng.random() < 0.15:
+                words.append(rng.choice(keywords))
+            else:
+                words.append(rng.choice(FILLER_WORDS))
+        return ' '.join(words).capitalize() + '.'
+
+    corpus = []
+    for _ in range(size):
+        question = ' '.join(sentence(rng.randint(10, 25)) for _ in range(3))
+        options = ' '.join(sentence(rng.randint(8, 20)) for _ in range(4))
+        solution = ' '.join(sentence(rng.randint(10, 25)) for _ in range(4))
+        corpus.append((question, options, solution))
+    return corpus
+
+def time_function(func, corpus):
+    start = time.perf_counter()
+    results = [func(*item) for item in corpus]
+    return time.perf_counter() - start, results
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark domain keyword matching')
+    parser.add_argument('--size', type=int, default=100000, help='Number of synthetic questions')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed for the corpus')
+    args = parser.parse_args()
+
+    print(f"Generating {args.size} synthetic questions...")
+    corpus = generate_corpus(args.size, args.seed)
+
+    # Compile outside the timed region, like a long-running ingest would
+    get_keyword_matcher()
+
+    print("Timing single-pass matcher...")
+    fast_time, fast_results = time_function(score_domains, corpus)
+    print("Timing per-keyword reference...")
+    ref_time, ref_results = time_function(score_domains_reference, corpus)
+
+    mismatches = sum(1 for a, b in zip(fast_results, ref_results) if a != b)
+
+    print("Timing batch classifier...")
+    classifier = DomainClassifier(DOMAINS)
+    questions = [{'question': question, 'options': {'A': options}, 'solution': solution}
+                 for question, options, solution in corpus]
+    start = time.perf_counter()
+    classifier.classify(questions)
+    batch_time = time.perf_counter() - start
+
+    print(f"\nQuestions:        {args.size}")
+    print(f"Per-keyword regex: {ref_time:.2f}s ({args.size / ref_time:,.0f} q/s)")
+    print(f"Single-pass:       {fast_time:.2f}s ({args.size / fast_time:,.0f} q/s)")
+    print(f"Speed-up:          {ref_time / fast_time:.1f}x")
+    print(f"Batch classifier:  {batch_time:.2f}s ({args.size / batch_time:,.0f} q/s, scores + domains)")
+    print(f"Mismatched scores: {mismatches}")
+
+    if mismatches:
+        raise SystemExit(1)
+
+if __name__ == '__main__':
+    main()
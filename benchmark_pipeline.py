@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+End-to-end benchmark of the ingest pipeline on synthetic dumps
+
+For every size, a TXT dump and matching PDF-extracted text are generated with
+synthetic_dump.py (no PDF library needed) and each stage is timed in its own
+process, so the reported peak RSS belongs to that stage alone:
+
+    parse_questions                 TXT dump -> questions
+    parse_answers_from_txt          TXT dump -> answers
+    parse_questions_from_pdf        PDF text -> questions
+    combine_questions_and_answers   PDF questions + TXT answers
+    analyze_questions               domain tagging of the combined bank
+
+Results go to a JSON file that can be compared with a run from another commit
+via --compare.
+"""
+
+import argparse
+import contextlib
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import synthetic_dump
+
+STAGES = [
+    'parse_questions',
+    'parse_answers_from_txt',
+    'parse_questions_from_pdf',
+    'combine_questions_and_answers',
+    'analyze_questions',
+]
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def load_json(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def dump_json(data, path):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+
+def _stage_work(stage, files):
+    """Return (prepare, run, finish) callables; only run() is timed"""
+    from parse_questions import parse_questions
+    from parse_questions_from_pdf import (combine_questions_and_answers, parse_answers_from_txt,
+                                          parse_questions_from_pdf)
+    from analyze_domains import analyze_questions
+
+    state = {}
+    if stage == 'parse_questions':
+        prepare = lambda: None
+        run = lambda: len(parse_questions(files['txt']))
+        finish = lambda: None
+    elif stage == 'parse_answers_from_txt':
+        prepare = lambda: None
+        def run():
+            state['answers'] = parse_answers_from_txt(files['txt'])
+            return len(state['answers'])
+        finish = lambda: dump_json(state['answers'], files['answers'])
+    elif stage == 'parse_questions_from_pdf':
+        def prepare():
+            with open(files['pdf_text'], 'r', encoding='utf-8') as f:
+                state['text'] = f.read()
+        def run():
+            state['questions'] = parse_questions_from_pdf(state['text'])
+            return len(state['questions'])
+        finish = lambda: dump_json(state['questions'], files['pdf_questions'])
+    elif stage == 'combine_questions_and_answers':
+        def prepare():
+            state['questions'] = load_json(files['pdf_questions'])
+            state['answers'] = {int(k): v for k, v in load_json(files['answers']).items()}
+        def run():
+            state['combined'] = combine_questions_and_answers(state['questions'], state['answers'])
+            return len(state['combined'])
+        finish = lambda: dump_json(state['combined'], files['combined'])
+    elif stage == 'analyze_questions':
+        prepare = lambda: None
+        def run():
+            analyze_questions(single_file=True, input_file=files['combined'], output_file=files['tagged'])
+            return len(load_json(files['tagged']))
+        finish = lambda: None
+    else:
+        raise ValueError(f"Unknown stage: {stage}")
+    return prepare, run, finish
+
+def _stage_process(stage, files, conn):
+    try:
+        prepare, run, finish = _stage_work(stage, files)
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            prepare()
+            rss_before = peak_rss_mb()
+            wall_start, cpu_start = time.perf_counter(), time.process_time()
+            count = run()
+            wall, cpu = time.perf_counter() - wall_start, time.process_time() - cpu_start
+            peak = peak_rss_mb()
+            finish()
+        conn.send({'items': count, 'wall_seconds': wall, 'cpu_seconds': cpu,
+                   'peak_rss_mb': peak, 'stage_rss_mb': peak - rss_before})
+    except BaseException as e:
+        conn.send({'error': f"{type(e).__name__}: {e}"})
+    finally:
+        conn.close()
+
+def run_stage(stage, files):
+    """Run one stage in a fresh process and return its measurements"""
+    ctx = multiprocessing.get_context('fork')
+    parent_conn, child_conn = ctx.Pipe(duplex=False)
+    process = ctx.Process(target=_stage_process, args=(stage, files, child_conn))
+    process.start()
+    child_conn.close()
+    result = parent_conn.recv()
+    process.join()
+    return result
+
+def benchmark_size(size, workdir, seed):
+    files = {
+        'txt': os.path.join(workdir, f'dump-{size}.txt'),
+        'pdf_text': os.path.join(workdir, f'pdf-{size}.txt'),
+        'answers': os.path.join(workdir, f'answers-{size}.json'),
+        'pdf_questions': os.path.join(workdir, f'pdf-questions-{size}.json'),
+        'combined': os.path.join(workdir, f'combined-{size}.json'),
+        'tagged': os.path.join(workdir, f'tagged-{size}.json'),
+    }
+    synthetic_dump.write_txt_dump(files['txt'], size, seed)
+    synthetic_dump.write_pdf_text(files['pdf_text'], size, seed)
+    input_mb = os.path.getsize(files['txt']) / (1024 * 1024)
+
+    results = []
+    for stage in STAGES:
+        result = run_stage(stage, files)
+        result.update({'size': size, 'stage': stage, 'input_mb': round(input_mb, 2)})
+        if 'wall_seconds' in result:
+            result['questions_per_second'] = size / result['wall_seconds'] if result['wall_seconds'] else None
+        results.append(result)
+        print_result(result)
+
+    for path in files.values():
+        if os.path.exists(path):
+            os.remove(path)
+    return results
+
+def print_result(r):
+    if 'error' in r:
+        print(f"{r['size']:>8} {r['stage']:<31} ERROR {r['error']}")
+        return
+    print(f"{r['size']:>8} {r['stage']:<31} {r['wall_seconds']:>9.3f}s {r['cpu_seconds']:>9.3f}s "
+          f"{r['questions_per_second']:>12,.0f} q/s {r['peak_rss_mb']:>9.1f} MB")
+
+def compare(current, baseline):
+    """Print wall-time ratios against a previous results file"""
+    old = {(r['size'], r['stage']): r for r in baseline['results'] if 'wall_seconds' in r}
+    print(f"\nCompared with {baseline.get('commit') or 'baseline'}:")
+    for r in current['results']:
+        before = old.get((r['size'], r['stage']))
+        if not before or 'wall_seconds' not in r:
+            continue
+        ratio = r['wall_seconds'] / before['wall_seconds'] if before['wall_seconds'] else float('inf')
+        rss = r['peak_rss_mb'] - before['peak_rss_mb']
+        print(f"{r['size']:>8} {r['stage']:<31} {ratio:>6.2f}x time  {rss:>+9.1f} MB peak RSS")
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the ingest pipeline on synthetic dumps')
+    parser.add_argument('--sizes', default='1000,10000,100000',
+                        help='Comma-separated question counts (e.g. 1000,10000,100000,500000)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('-o', '--output', default='bench_pipeline.json')
+    parser.add_argument('--compare', default=None, help='Results file from another commit')
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(',') if size.strip()]
+    print(f"{'size':>8} {'stage':<31} {'wall':>10} {'cpu':>10} {'throughput':>16} {'peak RSS':>12}")
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix='bench-pipeline-') as workdir:
+        for size in sizes:
+            results.extend(benchmark_size(size, workdir, args.seed))
+
+    report = {
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'seed': args.seed,
+        'results': results,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults saved to {args.output}")
+
+    if args.compare:
+        compare(report, load_json(args.compare))
+
+if __name__ == '__main__':
+    main()
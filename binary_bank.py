@@ -0,0 +1,473 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Compact binary form of the question bank with O(1) access by question id
+
+questions.json spells out every key of every record, the long domain names
+and the same AWS vocabulary thousands of times. questions.bin stores the bank
+in columns instead:
+
+    header      b'QBNK', format version, length of the JSON meta block
+    meta        count, id range, column names and {section: [offset, length]}
+    strings     the shared string table: u32 offsets + utf-8 bytes
+    ids         u32 question id per record
+    id_table    u32 per id from min_id to max_id: record number + 1 (0: none)
+    layout      u32 string id per record: the record's keys in their order
+    atom.F      u32 string id per record for the short, repeated fields
+                (correct_answer, domain, domain_short, secondary_domains),
+                stored as their JSON text, so every distinct value is kept once
+    offsets.C   u32 per record + 1: where the record's value starts in heap.C
+    heap.C      token stream of the text columns (question, answer_text,
+                solution), the options and the remaining fields (extra, JSON)
+
+Texts are split at spaces into tokens (a word with its punctuation and the
+space after it); each token is the varint of its string id. The string table
+is sorted by frequency, so the common words of the bank take one byte, and
+the options of a record are one text with separator characters. Sections are
+8-byte aligned and all integers little-endian.
+
+BinaryBank memory-maps the file; question(qid) finds the record through
+id_table and each column's offsets with fixed-width reads and decodes only the
+strings that record uses. Nothing is parsed up front, so opening the file
+costs the same for any bank size. A dump can repeat an id; id_table then
+points at the first record, like dump_index.DumpIndex.
+
+    python3 binary_bank.py                       # questions.json -> questions.bin
+    python3 binary_bank.py --show 17 42          # decode single questions
+    python3 binary_bank.py --benchmark 100000    # size and load time vs. JSON
+"""
+
+import argparse
+import gzip
+import json
+import mmap
+import os
+import random
+import re
+import struct
+import tempfile
+import time
+from array import array
+from collections import Counter
+
+from parse_cache import atomic_output
+
+MAGIC = b'QBNK'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('<4sII')
+U32 = struct.Struct('<I')
+ALIGNMENT = 8
+ATOM_FIELDS = ('correct_answer', 'domain', 'domain_short', 'secondary_domains')
+TEXT_FIELDS = ('question', 'answer_text', 'solution')
+# Heap columns: the text fields, options and everything else as JSON
+HEAP_COLUMNS = TEXT_FIELDS + ('options', 'extra')
+# Options are one text: letter LETTER_END text, joined by OPTION_END
+OPTION_END = '\x1e'
+LETTER_END = '\x1f'
+# Words with the space that follows them, and single spaces and separators;
+# together they cover every character
+TOKEN = re.compile(r'[^ \x1e\x1f]+ ?|[ \x1e\x1f]')
+# One varint: continuation bytes and the byte that ends it
+VARINT = re.compile(rb'[\x80-\xff]*[\x00-\x7f]')
+DEFAULT_OUTPUT = 'questions.bin'
+
+def write_varint(out, value):
+    while value > 0x7f:
+        out.append(value & 0x7f | 0x80)
+        value >>= 7
+    out.append(value)
+
+def varint(value):
+    out = bytearray()
+    write_varint(out, value)
+    return bytes(out)
+
+def read_varint(data, position):
+    value = shift = 0
+    while True:
+        byte = data[position]
+        position += 1
+        value |= (byte & 0x7f) << shift
+        if not byte & 0x80:
+            return value, position
+        shift += 7
+
+def options_text(options):
+    """Options as one text, or None if they cannot be stored that way"""
+    if not isinstance(options, dict):
+        return None
+    parts = []
+    for letter, text in options.items():
+        if not isinstance(text, str) or any(mark in letter + text for mark in (OPTION_END, LETTER_END)):
+            return None
+        parts.append(f"{letter}{LETTER_END}{text}")
+    return OPTION_END.join(parts)
+
+def split_record(q):
+    """({atom field: JSON text}, {heap column: text}) of one record; the layout keeps the key order"""
+    atoms, texts, extra = {}, {}, {}
+    for key, value in q.items():
+        if key == 'id':
+            continue
+        if key in ATOM_FIELDS:
+            atoms[key] = json.dumps(value, ensure_ascii=False)
+        elif key in TEXT_FIELDS and isinstance(value, str):
+            texts[key] = value
+        elif key == 'options' and options_text(value) is not None:
+            texts[key] = options_text(value)
+        else:
+            extra[key] = value
+    if extra:
+        # Default separators: the spaces split the JSON into reusable tokens
+        texts['extra'] = json.dumps(extra, ensure_ascii=False)
+    return atoms, texts
+
+def layout_string(q):
+    return json.dumps(list(q), ensure_ascii=False)
+
+def build_string_table(records):
+    """Strings by frequency (tokens first, so common words get the shortest varints) and their ids.
+
+    records are (question, atoms, texts) as split_record gives them.
+    """
+    tokens = Counter()
+    atoms = set()
+    for q, record_atoms, texts in records:
+        for text in texts.values():
+            tokens.update(TOKEN.findall(text))
+        atoms.update(record_atoms.values())
+        atoms.add(layout_string(q))
+    strings = sorted(tokens, key=lambda token: (-tokens[token], token))
+    strings += sorted(atoms - tokens.keys())
+    return strings, {string: number for number, string in enumerate(strings)}
+
+class TokenCodes(dict):
+    """token -> varint bytes of its string id, computed once per token"""
+
+    def __init__(self, string_ids):
+        super().__init__()
+        self.string_ids = string_ids
+
+    def __missing__(self, token):
+        code = self[token] = varint(self.string_ids[token])
+        return code
+
+    def encode(self, text):
+        return b''.join([self[token] for token in TOKEN.findall(text)])
+
+def encode_bank(questions):
+    """Bytes of the binary bank for a list of question dicts"""
+    records = [(q, *split_record(q)) for q in questions]
+    strings, string_ids = build_string_table(records)
+    codes = TokenCodes(string_ids)
+    ids = array('I', (q['id'] for q in questions))
+    min_id, max_id = (min(ids), max(ids)) if ids else (0, -1)
+    id_table = array('I', bytes(4 * (max_id - min_id + 1)))
+    for number, qid in enumerate(ids):
+        if not id_table[qid - min_id]:
+            id_table[qid - min_id] = number + 1
+
+    layout = array('I')
+    atoms = {field: array('I') for field in ATOM_FIELDS}
+    offsets = {column: array('I', [0]) for column in HEAP_COLUMNS}
+    heaps = {column: bytearray() for column in HEAP_COLUMNS}
+    for q, record_atoms, texts in records:
+        layout.append(string_ids[layout_string(q)])
+        for field in ATOM_FIELDS:
+            atoms[field].append(string_ids[record_atoms[field]] if field in record_atoms else 0)
+        for column in HEAP_COLUMNS:
+            heap = heaps[column]
+            if column in texts:
+                heap += codes.encode(texts[column])
+            if len(heap) > 0xffffffff:
+                raise ValueError(f"Column {column} is larger than 4 GiB")
+            offsets[column].append(len(heap))
+
+    encoded_strings = [string.encode('utf-8') for string in strings]
+    string_offsets = array('I', [0])
+    for data in encoded_strings:
+        string_offsets.append(string_offsets[-1] + len(data))
+
+    sections = [('string_offsets', string_offsets), ('strings', b''.join(encoded_strings)),
+                ('ids', ids), ('id_table', id_table), ('layout', layout)]
+    sections += [(f"atom.{field}", atoms[field]) for field in ATOM_FIELDS]
+    for column in HEAP_COLUMNS:
+        sections += [(f"offsets.{column}", offsets[column]), (f"heap.{column}", heaps[column])]
+    return pack_sections(sections, {
+        'count': len(ids), 'min_id': min_id, 'max_id': max_id, 'strings': len(strings),
+        'atoms': list(ATOM_FIELDS), 'heaps': list(HEAP_COLUMNS),
+    })
+
+def pack_sections(sections, meta):
+    """Header + meta + aligned sections; the meta gets the section table"""
+    blobs = []
+    for name, data in sections:
+        if isinstance(data, array):
+            if data.itemsize != 4:
+                raise ValueError(f"Section {name} is not u32")
+            if struct.pack('=I', 1) != U32.pack(1):
+                data = array(data.typecode, data)
+                data.byteswap()
+            data = data.tobytes()
+        blobs.append((name, bytes(data)))
+
+    # The section offsets depend on the meta length, which depends on the offsets; fix it up once
+    table = {name: [0, len(data)] for name, data in blobs}
+    for _ in range(2):
+        meta_bytes = json.dumps({**meta, 'sections': table}, separators=(',', ':')).encode('utf-8')
+        position = align(HEADER.size + len(meta_bytes))
+        for name, data in blobs:
+            table[name] = [position, len(data)]
+            position = align(position + len(data))
+    meta_bytes = json.dumps({**meta, 'sections': table}, separators=(',', ':')).encode('utf-8')
+    if align(HEADER.size + len(meta_bytes)) != table[blobs[0][0]][0]:
+        raise ValueError('Section table did not settle')
+
+    out = bytearray(HEADER.pack(MAGIC, FORMAT_VERSION, len(meta_bytes)))
+    out += meta_bytes
+    for name, data in blobs:
+        out += bytes(table[name][0] - len(out))
+        out += data
+    return bytes(out)
+
+def align(position):
+    return -(-position // ALIGNMENT) * ALIGNMENT
+
+def write_bank(questions, path):
+    """Write questions (a list of dicts) to path atomically; returns the file size"""
+    data = encode_bank(questions)
+    with atomic_output(path, binary=True) as f:
+        f.write(data)
+    return len(data)
+
+class BinaryBank:
+    """Memory-mapped reader; records are decoded on demand"""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, meta_length = HEADER.unpack_from(self._data, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a binary question bank")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"Unsupported binary bank version: {version}")
+        self.meta = json.loads(self._data[HEADER.size:HEADER.size + meta_length])
+        self.sections = self.meta['sections']
+        self.min_id = self.meta['min_id']
+        self.max_id = self.meta['max_id']
+        self._strings = [None] * self.meta['strings']
+        self._tokens = {}
+        self._atoms = {}
+
+    def close(self):
+        self._data.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return self.meta['count']
+
+    def _u32(self, section, index):
+        return U32.unpack_from(self._data, self.sections[section][0] + 4 * index)[0]
+
+    def _slice(self, section, start, end):
+        offset = self.sections[section][0]
+        return self._data[offset + start:offset + end]
+
+    def string(self, number):
+        """Entry number of the string table"""
+        string = self._strings[number]
+        if string is None:
+            start, end = self._u32('string_offsets', number), self._u32('string_offsets', number + 1)
+            string = self._strings[number] = self._slice('strings', start, end).decode('utf-8')
+        return string
+
+    def _decode_tokens(self, data):
+        """Text of a token stream; each distinct varint is resolved to its string once"""
+        codes = VARINT.findall(data)
+        tokens = self._tokens
+        try:
+            return ''.join([tokens[code] for code in codes])
+        except KeyError:
+            for code in codes:
+                if code not in tokens:
+                    tokens[code] = self.string(read_varint(code, 0)[0])
+            return ''.join([tokens[code] for code in codes])
+
+    def _heap_text(self, column, number):
+        start = self._u32(f"offsets.{column}", number)
+        end = self._u32(f"offsets.{column}", number + 1)
+        return self._decode_tokens(self._slice(f"heap.{column}", start, end))
+
+    def _atom(self, number):
+        """JSON value of an atom string (parsed once)"""
+        if number not in self._atoms:
+            self._atoms[number] = json.loads(self.string(number))
+        value = self._atoms[number]
+        # Lists are shared between records; hand out copies
+        return list(value) if isinstance(value, list) else value
+
+    def record_number(self, qid):
+        """Position of question qid in the bank"""
+        if not self.min_id <= qid <= self.max_id or not self._u32('id_table', qid - self.min_id):
+            raise KeyError(f"Question {qid} not found in {self.path}")
+        return self._u32('id_table', qid - self.min_id) - 1
+
+    def __contains__(self, qid):
+        try:
+            self.record_number(qid)
+        except KeyError:
+            return False
+        return True
+
+    def record(self, number):
+        """Question dict of the record at position number"""
+        keys = self._atom(self._u32('layout', number))
+        extra = self._heap_text('extra', number)
+        extra = json.loads(extra) if extra else {}
+        q = {}
+        for key in keys:
+            if key == 'id':
+                q[key] = self._u32('ids', number)
+            elif key in extra:
+                q[key] = extra[key]
+            elif key in ATOM_FIELDS:
+                q[key] = self._atom(self._u32(f"atom.{key}", number))
+            elif key == 'options':
+                text = self._heap_text('options', number)
+                q[key] = dict(option.split(LETTER_END, 1) for option in text.split(OPTION_END)) if text else {}
+            else:
+                q[key] = self._heap_text(key, number)
+        return q
+
+    def question(self, qid):
+        """Question dict of question id qid"""
+        return self.record(self.record_number(qid))
+
+    def ids(self):
+        return [self._u32('ids', number) for number in range(len(self))]
+
+    def column(self, field):
+        """Values of an atom field for every record, without touching the text columns"""
+        if field not in ATOM_FIELDS:
+            raise ValueError(f"{field} is not an atom column ({', '.join(ATOM_FIELDS)})")
+        return [self._atom(self._u32(f"atom.{field}", number)) for number in range(len(self))]
+
+    def __iter__(self):
+        for number in range(len(self)):
+            yield self.record(number)
+
+def best_of(repeat, fn):
+    """(fastest wall time, result) of repeat calls"""
+    best, result = None, None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+def benchmark(size, seed=0, repeat=3, lookups=1000):
+    """Size and load time of questions.json vs. questions.bin for a synthetic, domain-tagged bank"""
+    import synthetic_dump
+    from analyze_domains import DOMAINS, DomainClassifier
+
+    questions = list(synthetic_dump.iter_questions(size, seed))
+    DomainClassifier(DOMAINS).classify(questions)
+    rng = random.Random(seed)
+    sample = [rng.choice(questions)['id'] for _ in range(lookups)]
+
+    with tempfile.TemporaryDirectory(prefix='binary-bank-') as workdir:
+        json_path = os.path.join(workdir, 'questions.json')
+        bin_path = os.path.join(workdir, 'questions.bin')
+        with open(json_path, 'w', encoding='utf-8') as f:
+            json.dump(questions, f, ensure_ascii=False, indent=2)
+        write_seconds, _ = best_of(1, lambda: write_bank(questions, bin_path))
+
+        def load_json():
+            with open(json_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+
+        def open_and_get():
+            with BinaryBank(bin_path) as bank:
+                return bank.question(sample[0])
+
+        def lookup_all():
+            with BinaryBank(bin_path) as bank:
+                return [bank.question(qid) for qid in sample]
+
+        def decode_all():
+            with BinaryBank(bin_path) as bank:
+                return list(bank)
+
+        json_seconds, loaded = best_of(repeat, load_json)
+        first_seconds, _ = best_of(repeat, open_and_get)
+        lookup_seconds, _ = best_of(repeat, lookup_all)
+        decode_seconds, decoded = best_of(repeat, decode_all)
+        if decoded != loaded:
+            raise AssertionError('Binary bank does not round-trip the JSON bank')
+
+        sizes = {}
+        for name, path in (('json', json_path), ('bin', bin_path)):
+            with open(path, 'rb') as f:
+                data = f.read()
+            sizes[name] = (len(data), len(gzip.compress(data, 6)))
+
+    return {
+        'questions': size,
+        'json_bytes': sizes['json'][0], 'json_gzip_bytes': sizes['json'][1],
+        'bin_bytes': sizes['bin'][0], 'bin_gzip_bytes': sizes['bin'][1],
+        'json_load_seconds': json_seconds,
+        'bin_write_seconds': write_seconds,
+        'bin_open_first_question_seconds': first_seconds,
+        'bin_lookup_microseconds': lookup_seconds / lookups * 1e6,
+        'bin_decode_all_seconds': decode_seconds,
+    }
+
+def print_benchmark(r):
+    mb = 1024 * 1024
+    print(f"{r['questions']} synthetic questions")
+    print(f"  questions.json  {r['json_bytes'] / mb:8.1f} MB  ({r['json_gzip_bytes'] / mb:.1f} MB gzipped)")
+    print(f"  questions.bin   {r['bin_bytes'] / mb:8.1f} MB  ({r['bin_gzip_bytes'] / mb:.1f} MB gzipped), "
+          f"{r['bin_bytes'] / r['json_bytes']:.0%} of the JSON")
+    print(f"  json.load of the whole bank        {r['json_load_seconds'] * 1000:9.1f} ms")
+    print(f"  open .bin + first question         {r['bin_open_first_question_seconds'] * 1000:9.3f} ms")
+    print(f"  one question by id (open file)     {r['bin_lookup_microseconds']:9.1f} us")
+    print(f"  decode every record of the .bin    {r['bin_decode_all_seconds'] * 1000:9.1f} ms")
+    print(f"  write .bin                         {r['bin_write_seconds'] * 1000:9.1f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description='Write or read the compact binary question bank')
+    parser.add_argument('-i', '--input', default='questions.json', help='JSON question bank')
+    parser.add_argument('-o', '--output', default=DEFAULT_OUTPUT, help='Binary bank')
+    parser.add_argument('--show', nargs='+', type=int, metavar='ID', help='Decode questions from the binary bank')
+    parser.add_argument('--benchmark', type=int, metavar='N', default=None,
+                        help='Compare size and load time with JSON on N synthetic questions')
+    args = parser.parse_args()
+
+    if args.benchmark:
+        print_benchmark(benchmark(args.benchmark))
+        return
+    if args.show:
+        with BinaryBank(args.output) as bank:
+            for qid in args.show:
+                try:
+                    print(json.dumps(bank.question(qid), ensure_ascii=False, indent=2))
+                except KeyError as e:
+                    print(e.args[0])
+        return
+
+    with open(args.input, 'r', encoding='utf-8') as f:
+        questions = json.load(f)
+    size = write_bank(questions, args.output)
+    print(f"Wrote {len(questions)} questions to {args.output}: {size / 1024:.0f} KiB "
+          f"({size / os.path.getsize(args.input):.0%} of {args.input})")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Incremental domain tagging of an NDJSON question bank
+
+    python3 analyze_domains.py --ndjson -i questions.ndjson
+    python3 analyze_domains.py --ndjson -i questions.ndjson -o tagged.ndjson --refit
+
+Questions are read, tagged and written one line at a time, so memory use does
+not grow with the bank. A SQLite memo next to the input (questions.ndjson.domainmemo.db)
+maps the hash of each question's text (question_text: question, options and
+solution) to its keyword hit counts and its domain result:
+
+    memo(key, hits, model, result)
+
+An unchanged question reuses its stored result without being scored; only new
+or edited questions run the keyword matcher. The memo belongs to one version
+of the DOMAINS table and is emptied when the keyword lists change.
+
+DomainClassifier weighs keywords by TF-IDF over the whole bank, which a
+one-record-at-a-time pass cannot know up front. The memo therefore keeps a
+fitted model: the document frequency of every keyword and the number of
+questions it was counted over. Results are stored with the version of the
+model (DOMAINS version, frequencies, secondary ratio, default domain) that
+produced them. The model is fitted on the first run, when DOMAINS changed and
+with --refit; fitting is a first streaming pass that takes hit counts from the
+memo where it can, so it matches keywords of changed questions only and every
+result is then rescored with plain arithmetic. After a refit the output equals
+a batch run of analyze_domains.py on the same bank. Between refits, new and
+edited questions are scored with the frozen frequencies, so their weights can
+drift slightly from a batch run as the bank grows; refit after large imports.
+"""
+
+import hashlib
+import json
+import sqlite3
+
+from analyze_domains import DEFAULT_DOMAIN, DOMAINS, SECONDARY_RATIO, DomainClassifier, question_text
+from ingest_profile import NullProfiler
+from parse_cache import atomic_output
+
+MEMO_SUFFIX = '.domainmemo.db'
+# Questions per memo lookup and write transaction; keeps IN (...) below SQLite's parameter limit
+BATCH_SIZE = 500
+# In the order DomainClassifier.assign sets them, so reused and rescored lines look the same
+RESULT_FIELDS = ('domain_scores', 'secondary_domains', 'domain', 'domain_short')
+# Bumped when KeywordMatcher counts hits differently; memo entries of an older matcher are dropped
+MATCHER_VERSION = 2
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    name TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS memo (
+    key TEXT PRIMARY KEY,
+    hits TEXT NOT NULL,
+    model TEXT,
+    result TEXT
+);
+"""
+
+def memo_path(input_path):
+    """Return the memo database path that belongs to an NDJSON bank"""
+    return input_path + MEMO_SUFFIX
+
+def domains_version(domains=DOMAINS):
+    """Hash of the domain table and matcher version; any keyword change invalidates the memo"""
+    return hashlib.sha256(json.dumps([domains, MATCHER_VERSION], sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+def text_key(q):
+    return hashlib.sha256(question_text(q).encode('utf-8')).hexdigest()
+
+def iter_ndjson(path):
+    """Yield the questions of an NDJSON file one line at a time"""
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+def batched(items, size=BATCH_SIZE):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+class DomainMemo:
+    """Text hash -> keyword hits and domain result, for one DOMAINS version"""
+
+    def __init__(self, path, version):
+        self.path = path
+        self.conn = sqlite3.connect(path, isolation_level=None)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(SCHEMA)
+        if self.get_meta('domains') != version:
+            # Hit counts are keyword indices of one DOMAINS table; nothing carries over
+            self.conn.execute('BEGIN')
+            self.conn.execute('DELETE FROM memo')
+            self.conn.execute('DELETE FROM meta')
+            self.conn.execute("INSERT INTO meta (name, value) VALUES ('domains', ?)", (version,))
+            self.conn.execute('COMMIT')
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def get_meta(self, name):
+        row = self.conn.execute('SELECT value FROM meta WHERE name = ?', (name,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, name, value):
+        self.conn.execute('INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)', (name, value))
+
+    def lookup(self, keys):
+        """{key: (hits, model, result)} for the keys found in the memo"""
+        unique = list(set(keys))
+        rows = self.conn.execute(
+            f"SELECT key, hits, model, result FROM memo WHERE key IN ({','.join('?' * len(unique))})", unique)
+        return {key: (hits, model, result) for key, hits, model, result in rows}
+
+    def store(self, rows):
+        """Write (key, hits, model, result) rows in one transaction"""
+        if not rows:
+            return
+        self.conn.execute('BEGIN')
+        self.conn.executemany('INSERT OR REPLACE INTO memo (key, hits, model, result) VALUES (?, ?, ?, ?)', rows)
+        self.conn.execute('COMMIT')
+
+    def prune(self, keys):
+        """Delete every entry whose key is not in keys (an iterable of the bank's keys)"""
+        self.conn.execute('CREATE TEMP TABLE IF NOT EXISTS seen (key TEXT PRIMARY KEY)')
+        self.conn.execute('BEGIN')
+        self.conn.execute('DELETE FROM seen')
+        for batch in batched(keys):
+            self.conn.executemany('INSERT OR IGNORE INTO seen (key) VALUES (?)', [(key,) for key in batch])
+        deleted = self.conn.execute('DELETE FROM memo WHERE key NOT IN (SELECT key FROM seen)').rowcount
+        self.conn.execute('COMMIT')
+        return deleted
+
+def encode_hits(counts):
+    return json.dumps(sorted(counts.items()), separators=(',', ':'))
+
+def decode_hits(hits):
+    return dict(json.loads(hits))
+
+class IncrementalTagger:
+    """Streams an NDJSON bank through the memo and a frozen-IDF DomainClassifier"""
+
+    def __init__(self, memo, classifier, secondary_ratio=SECONDARY_RATIO, default_domain=DEFAULT_DOMAIN):
+        self.memo = memo
+        self.classifier = classifier
+        self.secondary_ratio = secondary_ratio
+        self.default_domain = default_domain
+        self.model = None
+        self.idf = None
+        # matched: keyword matcher runs; rescored: questions scored; reused: results taken from the memo
+        self.counts = {'questions': 0, 'matched': 0, 'rescored': 0, 'reused': 0, 'unmatched': 0}
+
+    def load_model(self):
+        """Use the model stored in the memo; False if none has been fitted yet"""
+        saved = self.memo.get_meta('model')
+        if saved is None:
+            return False
+        self._set_model(json.loads(saved))
+        return True
+
+    def _set_model(self, model):
+        version = hashlib.sha256(json.dumps([
+            model['documents'], model['document_frequency'], self.secondary_ratio, self.default_domain,
+        ]).encode('utf-8')).hexdigest()[:16]
+        self.model = {**model, 'version': version}
+        self.idf = self.classifier.idf(model['documents'], model['document_frequency'])
+
+    def _hits(self, questions):
+        """(key, {keyword: count}) per question; counts come from the memo or the keyword matcher.
+
+        Hit counts of newly matched questions are stored without a result.
+        """
+        keys = [text_key(q) for q in questions]
+        found = self.memo.lookup(keys)
+        hits = []
+        new_rows = {}
+        for q, key in zip(questions, keys):
+            if key in found:
+                counts = decode_hits(found[key][0])
+            elif key in new_rows:
+                counts = decode_hits(new_rows[key][1])
+            else:
+                counts = self.classifier.hit_counts(question_text(q).lower())
+                new_rows[key] = (key, encode_hits(counts), None, None)
+                self.counts['matched'] += 1
+            hits.append((key, counts))
+        self.memo.store(list(new_rows.values()))
+        return found, hits
+
+    def fit(self, path):
+        """Count keyword document frequencies over the bank at path and store the model"""
+        documents = 0
+        document_frequency = [0] * len(self.classifier.keywords)
+        for batch in batched(iter_ndjson(path)):
+            for _, counts in self._hits(batch)[1]:
+                documents += 1
+                for k in counts:
+                    document_frequency[k] += 1
+        model = {'documents': documents, 'document_frequency': document_frequency}
+        self.memo.set_meta('model', json.dumps(model, separators=(',', ':')))
+        self._set_model(model)
+
+    def tag(self, questions):
+        """Set the domain fields of a batch of questions, reusing memo results of the current model"""
+        found, hits = self._hits(questions)
+        version = self.model['version']
+        updates = {}
+        for q, (key, counts) in zip(questions, hits):
+            self.counts['questions'] += 1
+            entry = found.get(key)
+            if entry and entry[1] == version:
+                q.update(json.loads(entry[2]))
+                self.counts['reused'] += 1
+                self.counts['unmatched'] += not q['domain_scores']
+                continue
+            if key in updates:
+                q.update(json.loads(updates[key][3]))
+            else:
+                ranking = self.classifier.rank_row(self.classifier.score_counts(counts, self.idf))
+                self.classifier.assign(q, *ranking, self.secondary_ratio, self.default_domain)
+                result = {field: q[field] for field in RESULT_FIELDS}
+                updates[key] = (key, encode_hits(counts), version, json.dumps(result, ensure_ascii=False))
+            self.counts['rescored'] += 1
+            self.counts['unmatched'] += not q['domain_scores']
+        self.memo.store(list(updates.values()))
+        return questions
+
+def tag_ndjson(input_file, output_file=None, memo_file=None, refit=False,
+               secondary_ratio=SECONDARY_RATIO, default_domain=DEFAULT_DOMAIN, prune=False, profiler=None):
+    """Tag an NDJSON bank line by line; returns the tagger counts.
+
+    output_file defaults to input_file (rewritten atomically). With prune,
+    memo entries of questions no longer in the bank are deleted.
+    """
+    profiler = profiler or NullProfiler()
+    output_file = output_file or input_file
+    classifier = DomainClassifier(DOMAINS)
+    classifier.matcher.pattern = profiler.count_pattern(classifier.matcher.pattern, 'analyze_domains.keywords')
+
+    with DomainMemo(memo_file or memo_path(input_file), domains_version()) as memo:
+        tagger = IncrementalTagger(memo, classifier, secondary_ratio, default_domain)
+        refitted = refit or not tagger.load_model()
+        if refitted:
+            with profiler.stage('fit') as stage:
+                tagger.fit(input_file)
+                stage.add_items(tagger.model['documents'])
+
+        with profiler.stage('tag') as stage, atomic_output(output_file) as f:
+            for batch in batched(iter_ndjson(input_file)):
+                for q in tagger.tag(batch):
+                    f.write(json.dumps(q, ensure_ascii=False))
+                    f.write('\n')
+                stage.add_items(len(batch))
+
+        if prune:
+            with profiler.stage('prune'):
+                # The output holds the same texts as the input did
+                tagger.counts['pruned'] = memo.prune(text_key(q) for q in iter_ndjson(output_file))
+
+    tagger.counts['refitted'] = refitted
+    for name, value in tagger.counts.items():
+        profiler.set_counter(name, value)
+    return tagger.counts
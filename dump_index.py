@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Byte-offset index of the question blocks of a TXT dump
+
+One pass over the dump records where every ``N]`` block starts and ends and
+where its ``-----`` separator line is, in a ``<dump>.offsets.json`` sidecar:
+
+    {"version": 1, "size": ..., "mtime_ns": ...,
+     "blocks": [[question id, start, end, separator or null], ...]}
+
+A block runs from its N] line to the next one, exactly like
+parse_questions.iter_blocks groups lines, so parsing a block read through the
+index gives the same question (and the same parse cache key) as a full parse.
+The sidecar is rebuilt when the size or modification time of the dump changes.
+
+With the index a single question can be re-parsed without reading the dump
+from the top; the file is memory-mapped and only the requested blocks are
+decoded:
+
+    python3 dump_index.py "AWS SAA-03 Solution.txt" 417
+    python3 dump_index.py "AWS SAA-03 Solution.txt" 417 --raw
+
+parse_questions.py --workers N uses the same block ranges to hand whole blocks
+to worker processes (see iter_block_questions). Dumps with \\n or \\r\\n line
+endings are supported.
+"""
+
+import argparse
+import io
+import json
+import mmap
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+from parse_cache import write_atomic
+
+OFFSETS_SUFFIX = '.offsets.json'
+OFFSETS_VERSION = 1
+# parse_questions.QUESTION_START on a stripped line, found in the raw bytes
+BLOCK_START = re.compile(rb'^[^\S\n]*(\d+)\]', re.M)
+SEPARATOR = re.compile(rb'^[^\S\n]*-+[^\S\n]*$', re.M)
+# Worker jobs per process, so one slow chunk does not hold up the others
+CHUNKS_PER_WORKER = 4
+
+def offsets_path(dump_path):
+    return dump_path + OFFSETS_SUFFIX
+
+def scan_blocks(data):
+    """[[question id, start, end, separator offset or None]] of the blocks in a bytes-like dump"""
+    starts = [(match.start(), int(match.group(1))) for match in BLOCK_START.finditer(data)]
+    blocks = []
+    for number, (start, qid) in enumerate(starts):
+        end = starts[number + 1][0] if number + 1 < len(starts) else len(data)
+        separator = SEPARATOR.search(data, start, end)
+        blocks.append([qid, start, end, separator.start() if separator else None])
+    return blocks
+
+def decode_block(raw):
+    """Block text as text-mode reading gives it (utf-8, newlines translated)"""
+    return raw.decode('utf-8').replace('\r\n', '\n').replace('\r', '\n')
+
+def block_lines(text):
+    # Same line splitting as iterating over a file opened in text mode
+    return list(io.StringIO(text, newline=None))
+
+class DumpIndex:
+    """Memory-mapped random access to the question blocks of one dump"""
+
+    def __init__(self, path, blocks):
+        self.path = path
+        self.blocks = blocks
+        self.by_id = {}
+        for number, block in enumerate(blocks):
+            self.by_id.setdefault(block[0], []).append(number)
+        self._file = open(path, 'rb')
+        # mmap cannot map an empty file
+        self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if blocks else b''
+
+    @classmethod
+    def build(cls, path):
+        """Scan the dump and write the sidecar"""
+        stat = os.stat(path)
+        with open(path, 'rb') as f:
+            if stat.st_size:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                    blocks = scan_blocks(data)
+            else:
+                blocks = []
+        write_atomic(offsets_path(path), json.dumps({
+            'version': OFFSETS_VERSION, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'blocks': blocks,
+        }, separators=(',', ':')))
+        return cls(path, blocks)
+
+    @classmethod
+    def open(cls, path, rebuild=False):
+        """Index of path from its sidecar, building it first if missing or stale"""
+        sidecar = offsets_path(path)
+        if not rebuild and os.path.exists(sidecar):
+            stat = os.stat(path)
+            try:
+                with open(sidecar, 'r', encoding='utf-8') as f:
+                    saved = json.load(f)
+            except (OSError, ValueError):
+                saved = {}
+            if (saved.get('version') == OFFSETS_VERSION and saved.get('size') == stat.st_size
+                    and saved.get('mtime_ns') == stat.st_mtime_ns):
+                return cls(path, saved['blocks'])
+        return cls.build(path)
+
+    def close(self):
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return len(self.blocks)
+
+    def block_text(self, number, separator=True):
+        """Text of block number (position in the dump); without the separator line and what follows if asked"""
+        _, start, end, separator_offset = self.blocks[number]
+        if not separator and separator_offset is not None:
+            end = separator_offset
+        return decode_block(self._data[start:end])
+
+    def numbers(self, qid):
+        """Block numbers of question id qid, in dump order (ids can repeat in a dump)"""
+        numbers = self.by_id.get(qid)
+        if not numbers:
+            raise KeyError(f"Question {qid} not found in {self.path}")
+        return numbers
+
+    def question(self, qid, resolve=True, min_confidence=None):
+        """Parse the first block of question qid; with resolve, its answer letter is resolved too.
+
+        Text-matched letters are scored against this block alone, so a
+        borderline match (confidence near 1/options) can come out differently
+        than in a full parse, where the whole batch shares one vocabulary.
+        min_confidence defaults to answer_resolver.DEFAULT_MIN_CONFIDENCE.
+        """
+        from parse_questions import parse_block
+        from answer_resolver import DEFAULT_MIN_CONFIDENCE, resolve_answers
+        q = parse_block(block_lines(self.block_text(self.numbers(qid)[0])))
+        if not resolve:
+            return q
+        if min_confidence is None:
+            min_confidence = DEFAULT_MIN_CONFIDENCE
+        return resolve_answers([q], min_confidence)[0]
+
+    def chunks(self, count):
+        """Split the blocks into up to count [first, end) runs of about the same number of bytes"""
+        if not self.blocks:
+            return []
+        first_offset = self.blocks[0][1]
+        total = self.blocks[-1][2] - first_offset
+        runs = []
+        first = 0
+        for number, block in enumerate(self.blocks):
+            # Close the run once it reaches its share of the bytes
+            if block[2] - first_offset >= total * (len(runs) + 1) / count:
+                runs.append((first, number + 1))
+                first = number + 1
+        if first < len(self.blocks):
+            runs.append((first, len(self.blocks)))
+        return runs
+
+def _parse_ranges(path, ranges):
+    """Worker: parse the blocks at the given byte ranges of path"""
+    from parse_questions import parse_block
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        return [parse_block(block_lines(decode_block(data[start:end]))) for start, end in ranges]
+
+def iter_block_questions(path, workers=None, cache=None):
+    """Yield the parsed (unresolved) questions of a dump in order, parsing blocks in worker processes.
+
+    Blocks found in the parse cache are not sent to the workers; the cache is
+    read and updated in this process only. Results are consumed in dump order,
+    so the output is the same as a sequential parse.
+    """
+    workers = workers or os.cpu_count() or 1
+    with DumpIndex.open(path) as index:
+        jobs = []
+        for first, end in index.chunks(workers * CHUNKS_PER_WORKER):
+            keys = [cache.block_key(index.block_text(number)) if cache else None for number in range(first, end)]
+            missing = [tuple(index.blocks[number][1:3]) for number, key in zip(range(first, end), keys)
+                       if not (cache and key in cache)]
+            jobs.append((keys, missing))
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_parse_ranges, path, missing) if missing else None for keys, missing in jobs]
+        for (keys, missing), future in zip(jobs, futures):
+            parsed = iter(future.result() if future else ())
+            for key in keys:
+                record = cache.lookup(key) if cache else None
+                if record is None:
+                    record = next(parsed)
+                    if cache:
+                        cache.store(key, record)
+                yield record
+
+def main():
+    parser = argparse.ArgumentParser(description='Index question blocks of a TXT dump and parse single questions')
+    parser.add_argument('input', help='TXT dump')
+    parser.add_argument('ids', nargs='*', type=int, help='Question ids to parse (default: print a summary)')
+    parser.add_argument('--raw', action='store_true', help='Print the block text instead of the parsed question')
+    parser.add_argument('--rebuild', action='store_true', help='Rebuild the offsets sidecar')
+    args = parser.parse_args()
+
+    with DumpIndex.open(args.input, args.rebuild) as index:
+        if not args.ids:
+            repeated = sum(len(numbers) > 1 for numbers in index.by_id.values())
+            print(f"{len(index)} blocks, {len(index.by_id)} question ids ({repeated} repeated) "
+                  f"in {offsets_path(args.input)}")
+            return
+        for qid in args.ids:
+            try:
+                if args.raw:
+                    print(index.block_text(index.numbers(qid)[0]), end='')
+                else:
+                    print(json.dumps(index.question(qid), ensure_ascii=False, indent=2))
+            except KeyError as e:
+                print(e.args[0])
+
+if __name__ == '__main__':
+    main()
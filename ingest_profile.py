@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Profiling for the ingest scripts (--profile)
+
+parse_questions.py, parse_questions_from_pdf.py and analyze_domains.py accept
+--profile (trace in profile-<script>.json) or --profile-out PATH and then
+write a JSON trace like:
+
+    {
+      "script": "parse_questions.py",
+      "wall_seconds": 1.93, "cpu_seconds": 1.90, "peak_rss_mb": 61.2,
+      "stages": [{"name": "parse", "wall_seconds": ..., "cpu_seconds": ...,
+                  "calls": 1, "items": 539, "items_per_second": ..., "peak_rss_mb": ...}],
+      "regex": {"parse_questions.QUESTION_START": {"calls": 9100, "hits": 539}, ...},
+      "counters": {"questions": 539, "rejected": {"no options": 71, ...}}
+    }
+
+Without either option the scripts get a NullProfiler whose methods do nothing, so
+the hot loops run exactly as before. Reject reasons are counted by the
+scripts themselves (only on rejected questions). Regex counting replaces the
+compiled patterns and the ``re`` module of the instrumented modules with
+counting wrappers for the duration of the run; it makes regex-heavy code
+somewhat slower, so compare timings of profiled runs with profiled runs.
+"""
+
+import contextlib
+import json
+import os
+import platform
+import re
+import resource
+import sys
+import time
+
+def peak_rss_mb(who=resource.RUSAGE_SELF):
+    peak = resource.getrusage(who).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+class StageRecord:
+    def __init__(self, name):
+        self.name = name
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.calls = 0
+        self.items = None
+        self.peak_rss_mb = 0.0
+
+    def add_items(self, count):
+        self.items = (self.items or 0) + count
+
+    def to_dict(self):
+        data = {
+            'name': self.name,
+            'wall_seconds': round(self.wall, 6),
+            'cpu_seconds': round(self.cpu, 6),
+            'calls': self.calls,
+            'peak_rss_mb': round(self.peak_rss_mb, 1),
+        }
+        if self.items is not None:
+            data['items'] = self.items
+            data['items_per_second'] = round(self.items / self.wall, 1) if self.wall else None
+        return data
+
+class CountingPattern:
+    """Compiled pattern stand-in that counts calls and hits ([calls, hits] list)"""
+
+    def __init__(self, pattern, counter):
+        self._pattern = pattern
+        self._counter = counter
+
+    def _one(self, method, args, kwargs):
+        self._counter[0] += 1
+        result = getattr(self._pattern, method)(*args, **kwargs)
+        if result is not None:
+            self._counter[1] += 1
+        return result
+
+    def match(self, *args, **kwargs):
+        return self._one('match', args, kwargs)
+
+    def search(self, *args, **kwargs):
+        return self._one('search', args, kwargs)
+
+    def fullmatch(self, *args, **kwargs):
+        return self._one('fullmatch', args, kwargs)
+
+    def findall(self, *args, **kwargs):
+        self._counter[0] += 1
+        result = self._pattern.findall(*args, **kwargs)
+        self._counter[1] += len(result)
+        return result
+
+    def finditer(self, *args, **kwargs):
+        self._counter[0] += 1
+        for match in self._pattern.finditer(*args, **kwargs):
+            self._counter[1] += 1
+            yield match
+
+    def subn(self, *args, **kwargs):
+        self._counter[0] += 1
+        result = self._pattern.subn(*args, **kwargs)
+        self._counter[1] += result[1]
+        return result
+
+    def sub(self, *args, **kwargs):
+        return self.subn(*args, **kwargs)[0]
+
+    def split(self, *args, **kwargs):
+        self._counter[0] += 1
+        result = self._pattern.split(*args, **kwargs)
+        self._counter[1] += len(result) - 1
+        return result
+
+    def __getattr__(self, name):
+        return getattr(self._pattern, name)
+
+class CountingRe:
+    """Stands in for the re module inside one instrumented module"""
+
+    def __init__(self, profiler, module_name):
+        self._profiler = profiler
+        self._module_name = module_name
+        self._patterns = {}
+
+    def compile(self, pattern, flags=0):
+        if isinstance(pattern, CountingPattern):
+            return pattern
+        key = (pattern.pattern if isinstance(pattern, re.Pattern) else pattern, int(flags))
+        counting = self._patterns.get(key)
+        if counting is None:
+            label = f"{self._module_name}: {key[0][:60]}"
+            counting = CountingPattern(re.compile(pattern, flags), self._profiler.regex_counter(label))
+            self._patterns[key] = counting
+        return counting
+
+    def match(self, pattern, string, flags=0):
+        return self.compile(pattern, flags).match(string)
+
+    def search(self, pattern, string, flags=0):
+        return self.compile(pattern, flags).search(string)
+
+    def fullmatch(self, pattern, string, flags=0):
+        return self.compile(pattern, flags).fullmatch(string)
+
+    def findall(self, pattern, string, flags=0):
+        return self.compile(pattern, flags).findall(string)
+
+    def finditer(self, pattern, string, flags=0):
+        return self.compile(pattern, flags).finditer(string)
+
+    def sub(self, pattern, repl, string, count=0, flags=0):
+        return self.compile(pattern, flags).sub(repl, string, count)
+
+    def subn(self, pattern, repl, string, count=0, flags=0):
+        return self.compile(pattern, flags).subn(repl, string, count)
+
+    def split(self, pattern, string, maxsplit=0, flags=0):
+        return self.compile(pattern, flags).split(string, maxsplit)
+
+    def __getattr__(self, name):
+        # Flags, escape(), Pattern, ...
+        return getattr(re, name)
+
+class Profiler:
+    """Collects stage timings, regex counters and reject reasons for one script run"""
+
+    enabled = True
+
+    def __init__(self, script, path):
+        self.script = script
+        self.path = path
+        self.stages = {}
+        self.regex = {}
+        self.counters = {}
+        self._started_wall = time.perf_counter()
+        self._started_cpu = time.process_time()
+
+    def _record(self, name):
+        record = self.stages.get(name)
+        if record is None:
+            record = self.stages[name] = StageRecord(name)
+        return record
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """Time a block; yields the StageRecord so the caller can set .items"""
+        record = self._record(name)
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield record
+        finally:
+            record.wall += time.perf_counter() - wall
+            record.cpu += time.process_time() - cpu
+            record.calls += 1
+            record.peak_rss_mb = peak_rss_mb()
+
+    def regex_counter(self, label):
+        return self.regex.setdefault(label, [0, 0])
+
+    def count(self, name, amount=1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def set_counter(self, name, value):
+        self.counters[name] = value
+
+    def count_pattern(self, pattern, label):
+        return CountingPattern(pattern, self.regex_counter(label))
+
+    @contextlib.contextmanager
+    def instrument(self, *modules, timed=()):
+        """Count regex use in modules and time the (module, function name) pairs in timed"""
+        saved = []
+        for module in modules:
+            short = module.__name__ if module.__name__ != '__main__' else \
+                os.path.splitext(os.path.basename(self.script))[0]
+            for name, value in list(vars(module).items()):
+                if isinstance(value, re.Pattern):
+                    saved.append((module, name, value))
+                    setattr(module, name, self.count_pattern(value, f"{short}.{name}"))
+            if getattr(module, 're', None) is re:
+                saved.append((module, 're', re))
+                module.re = CountingRe(self, short)
+        for module, name in timed:
+            function = getattr(module, name)
+            saved.append((module, name, function))
+            setattr(module, name, self._timed(function, name))
+        try:
+            yield self
+        finally:
+            for module, name, value in reversed(saved):
+                setattr(module, name, value)
+
+    def _timed(self, function, name):
+        def timed(*args, **kwargs):
+            with self.stage(name):
+                return function(*args, **kwargs)
+        return timed
+
+    def trace(self, args=None):
+        wall = time.perf_counter() - self._started_wall
+        return {
+            'script': self.script,
+            'args': args or {},
+            'python': platform.python_version(),
+            'wall_seconds': round(wall, 6),
+            'cpu_seconds': round(time.process_time() - self._started_cpu, 6),
+            'peak_rss_mb': round(peak_rss_mb(), 1),
+            'peak_rss_children_mb': round(peak_rss_mb(resource.RUSAGE_CHILDREN), 1),
+            'stages': [record.to_dict() for record in self.stages.values()],
+            'regex': {label: {'calls': calls, 'hits': hits}
+                      for label, (calls, hits) in sorted(self.regex.items(), key=lambda item: -item[1][0])},
+            'counters': self.counters,
+        }
+
+    def write(self, args=None):
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump(self.trace(args), f, ensure_ascii=False, indent=2)
+        print(f"Profile trace written to {self.path}")
+
+class NullProfiler:
+    """Profiler interface that records nothing (the default)"""
+
+    enabled = False
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        yield StageRecord(name)
+
+    def count(self, name, amount=1):
+        pass
+
+    def set_counter(self, name, value):
+        pass
+
+    def count_pattern(self, pattern, label):
+        return pattern
+
+    @contextlib.contextmanager
+    def instrument(self, *modules, timed=()):
+        yield self
+
+    def write(self, args=None):
+        pass
+
+def add_profile_argument(parser):
+    # A separate path option: an optional value of --profile would swallow the positional inputs
+    parser.add_argument('--profile', action='store_true',
+                        help='Write a JSON profiling trace to profile-<script>.json')
+    parser.add_argument('--profile-out', metavar='PATH',
+                        help='Write the JSON profiling trace to PATH (implies --profile)')
+
+def make_profiler(args, script):
+    """Profiler for the --profile / --profile-out options of args; a NullProfiler without them"""
+    if not args.profile and not args.profile_out:
+        return NullProfiler()
+    script = os.path.basename(script)
+    return Profiler(script, args.profile_out or f"profile-{os.path.splitext(script)[0]}.json")
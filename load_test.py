@@ -0,0 +1,532 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Load test: many simulated learners using the app at the same time
+
+Every virtual learner behaves like a browser tab running app.js:
+
+    page load   index.html, then the style sheet and script it references
+    bank        the shard manifest (questions.json when there is none) and
+                GET api/sync to find out whether the scheduler API is there
+    questions   think, answer (POST api/sync) and fetch the next question:
+                GET api/next with the API, a random question without it;
+                a question's shard is fetched the first time it is needed
+
+and then starts over as a new learner. Think times are exponential around
+--think seconds. Connections are kept alive per learner like a browser does
+(http.server closes them after every response, which is part of its cost).
+
+    python3 load_test.py --serve app --learners 200 --duration 60
+    python3 load_test.py --serve static --directory dist/html --learners 500
+    python3 load_test.py --target http://localhost:8080 --learners 100 --think 0
+
+--serve starts a server on a free local port for the run: "app" is
+app_server.py with a throwaway stats database, "http" the plain
+`python3 -m http.server`, and "static" a small keep-alive static server
+standing in for the nginx image (gzip_static siblings and the cache headers of
+static_build.py's config), so a whole run needs nothing but this repository.
+The stand-in is not nginx; use the Docker image as --target for real nginx
+numbers.
+
+The report gives throughput and p50/p95/p99 latency per request kind, and is
+written as JSON with -o.
+"""
+
+import argparse
+import asyncio
+import email.utils
+import gzip
+import json
+import mimetypes
+import os
+import platform
+import random
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from urllib.parse import urlencode, urlparse, unquote
+
+DEFAULT_THINK = 2.0
+DEFAULT_QUESTIONS = 20
+PERCENTILES = (50, 95, 99)
+USER_AGENT = 'aws-examdump-load-test'
+# References app.js fetches, in their source or fingerprinted (static_build.py) form
+MANIFEST_REF = re.compile(r"""['"](questions/manifest(?:\.[0-9a-f]+)?\.json)['"]""")
+BANK_REF = re.compile(r"""['"](questions(?:\.[0-9a-f]+)?\.json)['"]""")
+SCRIPT_REF = re.compile(r"""<script[^>]+src=["']([^"']+)["']""")
+STYLE_REF = re.compile(r"""<link[^>]+href=["']([^"']+\.css)["']""")
+HASHED_NAME = re.compile(r'\.[0-9a-f]{10}\.(css|js|json)$')
+
+def percentile(sorted_values, p):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(1, -(-len(sorted_values) * p // 100))
+    return sorted_values[int(rank) - 1]
+
+# --- client ---
+
+class Connection:
+    """One keep-alive HTTP/1.1 connection, reopened when the server closes it"""
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.reader = None
+        self.writer = None
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except OSError:
+                pass
+            self.reader = self.writer = None
+
+    async def request(self, method, path, body=None):
+        """(status, headers, body) of one request; the body is decompressed"""
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        lines = [f"{method} {path} HTTP/1.1", f"Host: {self.host}:{self.port}", f"User-Agent: {USER_AGENT}",
+                 'Accept-Encoding: gzip', 'Connection: keep-alive']
+        if body is not None:
+            lines += ['Content-Type: application/json', f"Content-Length: {len(body)}"]
+        self.writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + (body or b''))
+        try:
+            status, headers, data, keep_alive = await self._read_response(method)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            await self.close()
+            raise
+        if not keep_alive:
+            await self.close()
+        if headers.get('content-encoding') == 'gzip':
+            data = gzip.decompress(data)
+        return status, headers, data
+
+    async def _read_response(self, method):
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionResetError('Server closed the connection')
+        version, status = status_line.decode('latin-1').split()[:2]
+        headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        status = int(status)
+        keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+
+        if method == 'HEAD' or status in (204, 304) or 100 <= status < 200:
+            data = b''
+        elif headers.get('transfer-encoding', '').lower() == 'chunked':
+            chunks = []
+            while True:
+                size = int((await self.reader.readline()).split(b';')[0], 16)
+                if size == 0:
+                    # Trailers end with an empty line
+                    while (await self.reader.readline()) not in (b'\r\n', b'\n', b''):
+                        pass
+                    break
+                chunks.append(await self.reader.readexactly(size))
+                await self.reader.readline()
+            data = b''.join(chunks)
+        elif 'content-length' in headers:
+            data = await self.reader.readexactly(int(headers['content-length']))
+        else:
+            data = await self.reader.read()
+            keep_alive = False
+        return status, headers, data, keep_alive
+
+class Recorder:
+    """Latency samples and errors per request kind, kept only inside the measured window"""
+
+    def __init__(self):
+        self.samples = {}
+        self.errors = {}
+        self.sessions = 0
+        self.answers = 0
+        self.window = (0.0, float('inf'))
+
+    def measuring(self, at):
+        return self.window[0] <= at < self.window[1]
+
+    def add(self, kind, started, elapsed):
+        if self.measuring(started):
+            self.samples.setdefault(kind, []).append(elapsed)
+
+    def error(self, kind, started, reason):
+        if self.measuring(started):
+            errors = self.errors.setdefault(kind, {})
+            errors[reason] = errors.get(reason, 0) + 1
+
+class Learner:
+    """One simulated browser tab"""
+
+    def __init__(self, number, base_path, connection, recorder, rng, args):
+        self.number = number
+        self.base = base_path
+        self.connection = connection
+        self.recorder = recorder
+        self.rng = rng
+        self.args = args
+
+    async def fetch(self, kind, path, method='GET', payload=None, expected=()):
+        """Body of a successful request, or None; every attempt is recorded.
+
+        Statuses in expected are answers the app handles (the API probe gets a
+        404 from a static server) and do not count as errors.
+        """
+        body = json.dumps(payload).encode('utf-8') if payload is not None else None
+        started = time.perf_counter()
+        try:
+            status, headers, data = await self.connection.request(method, self.base + path, body)
+        except (OSError, asyncio.IncompleteReadError, ValueError) as e:
+            self.recorder.error(kind, started, type(e).__name__)
+            return None
+        self.recorder.add(kind, started, time.perf_counter() - started)
+        if status >= 400:
+            if status not in expected:
+                self.recorder.error(kind, started, f"HTTP {status}")
+            return None
+        # nginx answers unknown paths with index.html (try_files), like app.js the JSON check catches that
+        return data
+
+    async def fetch_json(self, kind, path, method='GET', payload=None, expected=()):
+        data = await self.fetch(kind, path, method, payload, expected)
+        if data is None:
+            return None
+        try:
+            return json.loads(data)
+        except ValueError:
+            return None
+
+    async def think(self):
+        if self.args.think > 0:
+            await asyncio.sleep(self.rng.expovariate(1.0 / self.args.think))
+
+    async def session(self):
+        learner = f"load-{self.number}-{self.rng.getrandbits(32):08x}"
+        page = await self.fetch('page', '/')
+        if page is None:
+            return False
+        page = page.decode('utf-8', 'replace')
+        script = None
+        for pattern in (STYLE_REF, SCRIPT_REF):
+            match = pattern.search(page)
+            if match:
+                data = await self.fetch('asset', '/' + match.group(1).lstrip('/'))
+                if pattern is SCRIPT_REF and data is not None:
+                    script = data.decode('utf-8', 'replace')
+        script = script or ''
+
+        shards, entries = [], []
+        match = MANIFEST_REF.search(script)
+        manifest = await self.fetch_json('bank', '/' + match.group(1)) if match else None
+        if manifest:
+            shards = [shard['file'] for shard in manifest['shards']]
+            entries = {qid: shard for qid, shard in manifest['questions']}
+        else:
+            match = BANK_REF.search(script)
+            bank = await self.fetch_json('bank', '/' + (match.group(1) if match else 'questions.json'))
+            if bank is None:
+                return False
+            entries = {q['id']: None for q in bank if len(q.get('options', {})) >= 2}
+        if not entries:
+            return False
+        ids = list(entries)
+        query = urlencode({'learner': learner})
+        api = await self.fetch_json('api_detect', f"/api/sync?{query}", expected=(404,)) is not None
+
+        loaded = set()
+        qid = None
+        for _ in range(self.args.questions):
+            if qid is not None:
+                await self.think()
+                if api:
+                    delta = {'id': qid, 'correct': int(self.rng.random() < 0.6), 'lastSeen': int(time.time() * 1000)}
+                    delta['wrong'] = 1 - delta['correct']
+                    answer = {'id': qid, 'answer': 'A' if delta['correct'] else 'B',
+                              'correct': bool(delta['correct']), 'ts': delta['lastSeen']}
+                    await self.fetch('api_sync', '/api/sync', 'POST', {
+                        'learner': learner, 'deltas': [delta], 'answers': [answer],
+                        'session': {'correct': delta['correct'], 'wrong': delta['wrong'], 'total': 1}})
+                if self.recorder.measuring(time.perf_counter()):
+                    self.recorder.answers += 1
+            if api:
+                reply = await self.fetch_json('api_next', f"/api/next?{query}")
+                qid = reply.get('id') if reply else None
+            else:
+                qid = self.rng.choice(ids)
+            shard = entries.get(qid)
+            if shard is not None and shard not in loaded:
+                if await self.fetch('shard', f"/questions/{shards[shard]}") is not None:
+                    loaded.add(shard)
+        return True
+
+    async def run(self, deadline):
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            if await self.session() and self.recorder.measuring(started):
+                self.recorder.sessions += 1
+            # A new tab per session; keep-alive is per tab
+            await self.connection.close()
+            if self.args.think > 0:
+                await asyncio.sleep(self.rng.expovariate(1.0 / self.args.think))
+
+async def run_load(target, args):
+    url = urlparse(target)
+    host, port = url.hostname or 'localhost', url.port or 80
+    base_path = url.path.rstrip('/')
+    recorder = Recorder()
+    rng = random.Random(args.seed)
+    started = time.perf_counter()
+    # Ramp-up is not measured, so the numbers are those of the full load
+    recorder.window = (started + args.ramp, started + args.ramp + args.duration)
+    deadline = recorder.window[1]
+
+    async def learner_task(number):
+        await asyncio.sleep(args.ramp * number / args.learners)
+        learner = Learner(number, base_path, Connection(host, port), recorder, random.Random(rng.random()), args)
+        await learner.run(deadline)
+
+    tasks = [asyncio.ensure_future(learner_task(number)) for number in range(args.learners)]
+    # Sessions in flight at the deadline get a moment to finish, then they are cut off
+    done, pending = await asyncio.wait(tasks, timeout=deadline - time.perf_counter() + args.grace)
+    for task in pending:
+        task.cancel()
+    await asyncio.gather(*pending, return_exceptions=True)
+    for task in done:
+        if task.exception():
+            raise task.exception()
+    return recorder
+
+def summarize(recorder, duration):
+    """Report dict: throughput and latency percentiles (ms) per request kind and overall"""
+    def stats(values):
+        values = sorted(values)
+        entry = {'requests': len(values), 'per_second': round(len(values) / duration, 1)}
+        for p in PERCENTILES:
+            value = percentile(values, p)
+            entry[f"p{p}_ms"] = round(value * 1000, 2) if value is not None else None
+        entry['max_ms'] = round(values[-1] * 1000, 2) if values else None
+        return entry
+
+    kinds = {kind: stats(values) for kind, values in sorted(recorder.samples.items())}
+    overall = stats([value for values in recorder.samples.values() for value in values])
+    errors = sum(count for reasons in recorder.errors.values() for count in reasons.values())
+    return {
+        'overall': overall,
+        'kinds': kinds,
+        'errors': recorder.errors,
+        'error_count': errors,
+        'sessions': recorder.sessions,
+        'answers': recorder.answers,
+        'answers_per_second': round(recorder.answers / duration, 1),
+    }
+
+def print_report(report):
+    print(f"{'kind':<12} {'requests':>9} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    rows = list(report['kinds'].items()) + [('all', report['overall'])]
+    for kind, entry in rows:
+        cells = [f"{entry[key]:>9.2f}" if entry[key] is not None else f"{'-':>9}"
+                 for key in ('p50_ms', 'p95_ms', 'p99_ms', 'max_ms')]
+        print(f"{kind:<12} {entry['requests']:>9} {entry['per_second']:>9.1f} {' '.join(cells)}")
+    print(f"{report['sessions']} learner sessions, {report['answers']} answers "
+          f"({report['answers_per_second']}/s), {report['error_count']} errors")
+    for kind, reasons in sorted(report['errors'].items()):
+        print(f"  {kind}: " + ', '.join(f"{reason} x{count}" for reason, count in sorted(reasons.items())))
+
+# --- stand-in servers ---
+
+class StaticServer:
+    """Keep-alive static file server with the behaviour of the nginx image that matters for load"""
+
+    def __init__(self, directory):
+        self.directory = os.path.realpath(directory)
+        self.files = {}
+
+    def load(self, path):
+        """(bytes, mtime) of a file below the directory, cached until it changes"""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        cached = self.files.get(path)
+        if cached and cached[1] == stat.st_mtime_ns:
+            return cached
+        with open(path, 'rb') as f:
+            cached = (f.read(), stat.st_mtime_ns)
+        self.files[path] = cached
+        return cached
+
+    def resolve(self, url_path):
+        path = os.path.realpath(os.path.join(self.directory, unquote(url_path).lstrip('/')))
+        if path != self.directory and not path.startswith(self.directory + os.sep):
+            return None
+        if os.path.isdir(path):
+            path = os.path.join(path, 'index.html')
+        return path if os.path.isfile(path) else None
+
+    def respond(self, method, url_path, accept_gzip):
+        """(status, headers, body)"""
+        if method not in ('GET', 'HEAD'):
+            return 405, {'Content-Type': 'text/plain'}, b'method not allowed\n'
+        if url_path == '/health':
+            return 200, {'Content-Type': 'text/plain'}, b'healthy\n'
+        path = self.resolve(url_path)
+        if path is None:
+            # try_files $uri $uri/ /index.html, but hashed assets are =404
+            if HASHED_NAME.search(url_path):
+                return 404, {'Content-Type': 'text/plain'}, b'not found\n'
+            path = self.resolve('/index.html')
+            if path is None:
+                return 404, {'Content-Type': 'text/plain'}, b'not found\n'
+        content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        headers = {
+            'Content-Type': content_type + ('; charset=utf-8' if content_type.startswith('text/')
+                                            or content_type.endswith('json') else ''),
+            'Cache-Control': 'public, max-age=31536000, immutable' if HASHED_NAME.search(path) else 'no-cache',
+            'X-Content-Type-Options': 'nosniff',
+        }
+        compressed = self.load(path + '.gz') if accept_gzip else None
+        if compressed:
+            headers['Content-Encoding'] = 'gzip'
+            headers['Vary'] = 'Accept-Encoding'
+            return 200, headers, compressed[0]
+        return 200, headers, self.load(path)[0]
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                method, target, version = request_line.decode('latin-1').split()[:3]
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                if int(headers.get('content-length') or 0):
+                    await reader.readexactly(int(headers['content-length']))
+                status, response_headers, body = self.respond(
+                    method, urlparse(target).path, 'gzip' in headers.get('accept-encoding', ''))
+                keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+                response_headers.update({
+                    'Content-Length': str(len(body)),
+                    'Date': email.utils.formatdate(usegmt=True),
+                    'Connection': 'keep-alive' if keep_alive else 'close',
+                })
+                head = f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}\r\n" + ''.join(
+                    f"{name}: {value}\r\n" for name, value in response_headers.items()) + '\r\n'
+                writer.write(head.encode('latin-1') + (b'' if method == 'HEAD' else body))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+async def serve_static(directory, host, port):
+    server = StaticServer(directory)
+    # A backlog like nginx's default, so bursts of new connections queue instead of failing
+    async with await asyncio.start_server(server.handle, host, port, backlog=511) as listener:
+        await listener.serve_forever()
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def start_server(kind, directory, workdir):
+    """Start a stand-in server in its own process; returns (process, target url)"""
+    port = free_port()
+    here = os.path.dirname(os.path.abspath(__file__))
+    if kind == 'app':
+        command = [sys.executable, os.path.join(here, 'app_server.py'), '--port', str(port), '--bind', '127.0.0.1',
+                   '--directory', directory, '--bank', os.path.join(directory, 'questions.json'),
+                   # Nothing of the run is written next to the real bank
+                   '--stats-db', os.path.join(workdir, 'load_test_stats.db'),
+                   '--answer-log', os.path.join(workdir, 'answer_log'),
+                   '--versions-dir', os.path.join(workdir, 'bank_versions')]
+    elif kind == 'http':
+        command = [sys.executable, '-m', 'http.server', str(port), '--bind', '127.0.0.1', '--directory', directory]
+    else:
+        command = [sys.executable, os.path.abspath(__file__), '--stand-in', directory, '--port', str(port)]
+    process = subprocess.Popen(command, cwd=directory, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    # Wait until the server accepts connections
+    for _ in range(200):
+        if process.poll() is not None:
+            raise RuntimeError(f"Stand-in server exited: {' '.join(command)}")
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=0.1):
+                return process, f"http://127.0.0.1:{port}"
+        except OSError:
+            time.sleep(0.05)
+    process.terminate()
+    raise RuntimeError(f"Stand-in server did not start: {' '.join(command)}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Simulate concurrent learners against the app')
+    parser.add_argument('--target', default=None, help='Base URL of a running server (e.g. http://localhost:8080)')
+    parser.add_argument('--serve', choices=['app', 'static', 'http'], default=None,
+                        help='Start a local server for the run instead of using --target')
+    parser.add_argument('--directory', default='.',
+                        help='Site served by --serve (the repository, or dist/html from static_build.py)')
+    parser.add_argument('--learners', type=int, default=50, help='Concurrent learners')
+    parser.add_argument('--duration', type=float, default=30.0, help='Measured seconds, after the ramp-up')
+    parser.add_argument('--ramp', type=float, default=5.0, help='Seconds over which learners start')
+    parser.add_argument('--think', type=float, default=DEFAULT_THINK,
+                        help='Mean think time per question in seconds (0: no pauses)')
+    parser.add_argument('--questions', type=int, default=DEFAULT_QUESTIONS, help='Questions per learner session')
+    parser.add_argument('--grace', type=float, default=5.0, help='Seconds to let sessions finish after the run')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('-o', '--output', default=None, help='Write the report as JSON')
+    parser.add_argument('--stand-in', default=None, metavar='DIR', help=argparse.SUPPRESS)
+    parser.add_argument('--port', type=int, default=8081, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.stand_in:
+        try:
+            asyncio.run(serve_static(args.stand_in, '127.0.0.1', args.port))
+        except KeyboardInterrupt:
+            pass
+        return
+    if not args.target and not args.serve:
+        parser.error('give --target URL or --serve app|static|http')
+
+    process = None
+    with tempfile.TemporaryDirectory(prefix='load-test-') as workdir:
+        target = args.target
+        if args.serve:
+            process, target = start_server(args.serve, os.path.abspath(args.directory), workdir)
+            print(f"Started {args.serve} server for {args.directory} on {target}")
+        print(f"{args.learners} learners for {args.duration:g}s (+{args.ramp:g}s ramp-up), "
+              f"think {args.think:g}s, {args.questions} questions per session")
+        try:
+            recorder = asyncio.run(run_load(target, args))
+        finally:
+            if process:
+                process.terminate()
+                process.wait()
+
+    report = summarize(recorder, args.duration)
+    print_report(report)
+    if args.output:
+        report.update({'target': args.serve or args.target, 'learners': args.learners, 'duration': args.duration,
+                       'think': args.think, 'questions': args.questions, 'python': platform.python_version()})
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"Report: {args.output}")
+
+if __name__ == '__main__':
+    main()
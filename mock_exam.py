@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Mock exams shaped like the real SAA-C03: 65 questions in 130 minutes, drawn
+per domain in the exam guide's proportions
+
+    Design Secure Architectures            30%  -> 19 questions
+    Design Resilient Architectures         26%  -> 17
+    Design High-Performing Architectures   24%  -> 16
+    Design Cost-Optimized Architectures    20%  -> 13
+
+Quotas are rounded by largest remainder; a domain with fewer questions than its
+quota gives the rest to the others in proportion. Questions tagged with a
+domain outside the guide (Operations) count for the weighted domain with the
+highest share in their domain_scores.
+
+Exams are drawn in bulk from one shuffled deck per domain: every exam takes
+its quota from the top of the deck, and a deck is only reshuffled when it runs
+out. Exams therefore share no question until a domain has been used up, and
+the questions of a domain are used about equally often. With learner stats, a
+deck is ordered by a weighted shuffle that puts questions the learner got
+wrong earlier, so they show up in the first exams.
+
+    python3 mock_exam.py                     # questions/exams.json
+    python3 mock_exam.py --exams 200 --seed 7
+    python3 mock_exam.py --stats-db learner_stats.db --learner ID --exams 5 -o review.json
+    python3 mock_exam.py --answer-log answer_log    # questions many learners miss come first
+
+The pool is a compact JSON file of question id arrays; serving an exam is an
+index lookup (see ExamPool and /api/exam in app_server.py).
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import zlib
+from collections import Counter, deque
+
+from parse_cache import write_atomic
+from question_shards import SHARD_DIR
+
+EXAMS_NAME = 'exams.json'
+POOL_VERSION = 1
+EXAM_SIZE = 65
+EXAM_MINUTES = 130
+# Share of each domain (by domain_short) in the SAA-C03 exam guide
+EXAM_WEIGHTS = {'Security': 30, 'Resilience': 26, 'Performance': 24, 'Cost': 20}
+# A learner's wrong answer makes a question this much more likely to come early in its deck
+WRONG_PREFERENCE = 4.0
+# Pool size bounds when it is sized by coverage: small banks still get differently ordered exams
+MIN_POOL = 20
+MAX_POOL = 1000
+
+def exam_domain(q):
+    """Weighted domain a question counts for"""
+    domain = q.get('domain_short')
+    if domain in EXAM_WEIGHTS:
+        return domain
+    scores = q.get('domain_scores') or {}
+    # Highest score, ties in exam guide order
+    return max(EXAM_WEIGHTS, key=lambda name: (scores.get(name, 0), -list(EXAM_WEIGHTS).index(name)))
+
+def largest_remainder(shares, total):
+    """Round {name: share} to integers that add up to total"""
+    counts = {name: math.floor(share) for name, share in shares.items()}
+    order = sorted(shares, key=lambda name: -(shares[name] - counts[name]))
+    for name in order[:total - sum(counts.values())]:
+        counts[name] += 1
+    return counts
+
+def exam_quotas(available, size=EXAM_SIZE, weights=EXAM_WEIGHTS):
+    """{domain: questions per exam} for {domain: usable questions}; never more than available"""
+    size = min(size, sum(available.get(name, 0) for name in weights))
+    fixed = {}
+    while True:
+        free = [name for name in weights if name not in fixed and available.get(name)]
+        remaining = size - sum(fixed.values())
+        total_weight = sum(weights[name] for name in free)
+        counts = largest_remainder({name: remaining * weights[name] / total_weight for name in free},
+                                   remaining) if free else {}
+        short = [name for name in free if counts[name] > available[name]]
+        if not short:
+            return {name: {**fixed, **counts}.get(name, 0) for name in weights}
+        for name in short:
+            fixed[name] = available[name]
+
+class DomainDeck:
+    """Shuffled question ids of one domain, dealt from the top and reshuffled when empty"""
+
+    def __init__(self, ids, rng, preference=None):
+        self.ids = list(ids)
+        self.rng = rng
+        self.preference = preference or {}
+        self.deck = deque()
+
+    def _shuffle(self):
+        if not self.preference:
+            ids = self.ids[:]
+            self.rng.shuffle(ids)
+            return deque(ids)
+        # Weighted shuffle (Efraimidis-Spirakis): sort by u ** (1 / weight)
+        keys = {qid: self.rng.random() ** (1.0 / self.preference.get(qid, 1.0)) for qid in self.ids}
+        return deque(sorted(self.ids, key=keys.__getitem__, reverse=True))
+
+    def deal(self, count):
+        """count distinct ids; ids already in this exam are put back for the next one"""
+        dealt = []
+        seen = set()
+        put_back = []
+        while len(dealt) < count:
+            if not self.deck:
+                self.deck = self._shuffle()
+            qid = self.deck.popleft()
+            if qid in seen:
+                put_back.append(qid)
+                continue
+            dealt.append(qid)
+            seen.add(qid)
+        self.deck.extendleft(reversed(put_back))
+        return dealt
+
+def usable_questions(questions):
+    # Same selection as the shard manifest
+    return [q for q in questions if len(q.get('options', {})) >= 2]
+
+def learner_preference(stats):
+    """{question id: deck weight} from {id: {correct, wrong, ...}} stats"""
+    return {int(qid): 1.0 + WRONG_PREFERENCE * s['wrong'] for qid, s in stats.items() if s.get('wrong')}
+
+def coverage_exams(available, quotas):
+    """Number of exams after which every question has been used at least once"""
+    return max((math.ceil(available[name] / quota) for name, quota in quotas.items() if quota), default=0)
+
+def generate_pool(questions, exams=None, size=EXAM_SIZE, seed=0, preference=None):
+    """Draw a pool of exams; returns the pool dict written to exams.json.
+
+    exams defaults to the number needed to use every question once, within
+    MIN_POOL..MAX_POOL.
+    preference maps question ids to deck weights (see learner_preference).
+    """
+    by_domain = {name: [] for name in EXAM_WEIGHTS}
+    for q in usable_questions(questions):
+        by_domain[exam_domain(q)].append(q['id'])
+    available = {name: len(ids) for name, ids in by_domain.items()}
+    quotas = exam_quotas(available, size)
+    if exams is None:
+        exams = min(max(coverage_exams(available, quotas), MIN_POOL), MAX_POOL)
+
+    rng = random.Random(seed)
+    decks = {name: DomainDeck(ids, rng, preference) for name, ids in by_domain.items()}
+    pool = []
+    for _ in range(exams):
+        exam = []
+        for name, quota in quotas.items():
+            exam.extend(decks[name].deal(quota))
+        # Mix the domains like the real exam does
+        rng.shuffle(exam)
+        pool.append(exam)
+
+    return {
+        'version': POOL_VERSION,
+        'size': sum(quotas.values()),
+        # Two minutes per question, like the real exam
+        'minutes': round(EXAM_MINUTES * sum(quotas.values()) / EXAM_SIZE),
+        'quotas': quotas,
+        'seed': seed,
+        'exams': pool,
+    }
+
+def pool_summary(pool):
+    """Usage spread and overlap between consecutive exams of a pool"""
+    uses = Counter(qid for exam in pool['exams'] for qid in exam)
+    overlaps = [len(set(a) & set(b)) for a, b in zip(pool['exams'], pool['exams'][1:])]
+    return {
+        'exams': len(pool['exams']),
+        'questions_used': len(uses),
+        'min_uses': min(uses.values(), default=0),
+        'max_uses': max(uses.values(), default=0),
+        'max_consecutive_overlap': max(overlaps, default=0),
+    }
+
+def write_pool(questions, path, exams=None, size=EXAM_SIZE, seed=0, preference=None):
+    pool = generate_pool(questions, exams, size, seed, preference)
+    write_atomic(path, json.dumps(pool, separators=(',', ':')))
+    return pool
+
+class ExamPool:
+    """Precomputed exams; each learner walks the pool from a starting point of its own"""
+
+    def __init__(self, pool, spread=True):
+        if pool.get('version') != POOL_VERSION:
+            raise ValueError(f"Unsupported exam pool version: {pool.get('version')}")
+        self.minutes = pool['minutes']
+        self.exams = pool['exams']
+        self.spread = spread
+        self.cursors = {}
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    def __len__(self):
+        return len(self.exams)
+
+    def served(self, learner):
+        """Exams handed to learner so far"""
+        cursor = self.cursors.get(learner)
+        return 0 if cursor is None else cursor - self._start(learner)
+
+    def _start(self, learner):
+        # Spread learners over the pool instead of all starting with exam 0
+        return zlib.crc32(learner.encode('utf-8')) % len(self.exams) if self.spread else 0
+
+    def next_exam(self, learner):
+        """(exam number, question ids) of the learner's next exam"""
+        if not self.exams:
+            return None, []
+        cursor = self.cursors.get(learner)
+        if cursor is None:
+            cursor = self._start(learner)
+        self.cursors[learner] = cursor + 1
+        number = cursor % len(self.exams)
+        return number, self.exams[number]
+
+def load_learner_stats(stats_db, learner):
+    from stats_service import StatsDatabase, stats_from_snapshot
+    return stats_from_snapshot(StatsDatabase(stats_db).snapshot(learner))
+
+def main():
+    parser = argparse.ArgumentParser(description='Precompute a pool of stratified SAA-C03 mock exams')
+    parser.add_argument('-i', '--input', default='questions.json', help='Domain-tagged question bank')
+    parser.add_argument('-o', '--output', default=os.path.join(SHARD_DIR, EXAMS_NAME))
+    parser.add_argument('--exams', type=int, default=None,
+                        help='Number of exams (default: enough to use every question once)')
+    parser.add_argument('--size', type=int, default=EXAM_SIZE, help='Questions per exam')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--stats-db', default=None, help='Learner stats database for a personal pool')
+    parser.add_argument('--learner', default=None, help='Learner whose wrong answers come first (with --stats-db)')
+    parser.add_argument('--answer-log', default=None,
+                        help='Answer log directory whose rollup puts hard questions first (see answer_log.py)')
+    args = parser.parse_args()
+
+    with open(args.input, 'r', encoding='utf-8') as f:
+        questions = json.load(f)
+    preference = None
+    if args.stats_db and args.learner:
+        preference = learner_preference(load_learner_stats(args.stats_db, args.learner))
+        print(f"Preferring {len(preference)} questions {args.learner} got wrong")
+    if args.answer_log:
+        from answer_log import AnswerRollup, combine_preferences, difficulty_preference
+        difficulty = AnswerRollup.open(args.answer_log).difficulty()
+        preference = combine_preferences(preference, difficulty_preference(difficulty))
+        print(f"Weighting {len(difficulty)} questions by their difficulty in {args.answer_log}")
+
+    pool = write_pool(questions, args.output, args.exams, args.size, args.seed, preference)
+    summary = pool_summary(pool)
+    quotas = ', '.join(f"{name} {count}" for name, count in pool['quotas'].items())
+    print(f"Wrote {summary['exams']} exams of {pool['size']} questions ({quotas}) to {args.output}")
+    print(f"  {summary['questions_used']} questions used {summary['min_uses']}-{summary['max_uses']} times; "
+          f"consecutive exams share at most {summary['max_consecutive_overlap']}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Ingest many dump files into one question bank
+
+parse_questions.py switches to this mode when it gets several inputs, a
+directory or a glob pattern:
+
+    python3 parse_questions.py dumps/ 'extra/*.txt' -o questions.json --workers 4
+
+Every file is parsed in a worker process: TXT dumps with the usual parser and
+block cache, .json files as question lists already written by
+parse_questions.py or parse_questions_from_pdf.py. Other JSON files in a
+directory or glob (search.json, exams.json, manifest.json, ...) are skipped. The merge consumes the
+results in sorted path order while later files are still being parsed, so the
+output does not depend on the number of workers or on which one finishes
+first.
+
+Merged questions get global ids from an id registry (<output>.ids.json). The
+registry key is a hash of the normalised question and option text, so a
+question keeps its id across runs, when dump files are added or removed and
+when a dump renumbers it; new questions get the next free id in merge order.
+Where a question came from is recorded in "source" (file and original id).
+With --dedupe near-duplicates are dropped before ids are assigned, so they do
+not use up registry ids.
+"""
+
+import glob
+import hashlib
+import json
+import os
+import re
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from answer_resolver import DEFAULT_MIN_CONFIDENCE
+from dump_index import OFFSETS_SUFFIX
+from near_duplicates import DUPLICATE_THRESHOLD, iter_unique, normalize, question_text
+from parse_cache import CACHE_SUFFIX, atomic_output, write_atomic
+from parse_questions import iter_questions, open_cache, reject_reason, write_json_array, write_ndjson
+
+DUMP_SUFFIXES = ('.txt', '.json')
+REGISTRY_SUFFIX = '.ids.json'
+# Start of a JSON list of objects (or an empty list); dicts like search.json do not match
+QUESTION_LIST_START = re.compile(r'\A\ufeff?\s*\[\s*[{\]]')
+NOT_QUESTION_LIST = 'not a question list'
+
+def is_multi(specs):
+    """Whether the parser inputs name more than one plain file"""
+    return len(specs) > 1 or any(os.path.isdir(spec) or glob.has_magic(spec) for spec in specs)
+
+def looks_like_question_list(path):
+    """Whether a .json file starts like a list of questions, from its first bytes"""
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        return QUESTION_LIST_START.match(f.read(4096)) is not None
+
+def is_question(q):
+    """Whether an item of a .json input has the fields of a parsed question"""
+    return isinstance(q, dict) and isinstance(q.get('options'), dict) and 'question' in q and 'id' in q
+
+def expand_inputs(specs):
+    """Files named by the paths, directories (their .txt/.json files) and glob patterns, sorted.
+
+    JSON files found in directories and by patterns are only kept if they
+    look like question lists.
+    """
+    paths = set()
+    for spec in specs:
+        if os.path.isdir(spec):
+            matches = [os.path.join(spec, name) for name in os.listdir(spec)
+                       if name.endswith(DUMP_SUFFIXES) and os.path.isfile(os.path.join(spec, name))]
+        elif glob.has_magic(spec):
+            matches = [path for path in glob.glob(spec) if os.path.isfile(path)]
+        else:
+            matches = [spec]
+        paths.update(os.path.normpath(path) for path in matches
+                     if not path.endswith((CACHE_SUFFIX, OFFSETS_SUFFIX, REGISTRY_SUFFIX))
+                     and (path == spec or not path.endswith('.json') or looks_like_question_list(path)))
+    return sorted(paths)
+
+def parse_dump(path, min_confidence=DEFAULT_MIN_CONFIDENCE, use_cache=True):
+    """Parse one dump file; returns (valid questions, {reject reason: count}, question count).
+
+    A .json file that is not a list of questions is rejected as a whole.
+    """
+    if path.endswith('.json'):
+        with open(path, 'r', encoding='utf-8') as f:
+            questions = json.load(f)
+        if not isinstance(questions, list) or not all(map(is_question, questions)):
+            return [], {NOT_QUESTION_LIST: 1}, 0
+    else:
+        cache = open_cache(path) if use_cache else None
+        questions = list(iter_questions(path, cache, min_confidence=min_confidence))
+        if cache:
+            cache.save()
+
+    valid = []
+    rejected = {}
+    for q in questions:
+        reason = reject_reason(q)
+        if reason:
+            rejected[reason] = rejected.get(reason, 0) + 1
+        else:
+            valid.append(q)
+    return valid, rejected, len(questions)
+
+def iter_parsed(paths, workers=None, min_confidence=DEFAULT_MIN_CONFIDENCE, use_cache=True):
+    """Yield (path, valid questions, rejects, count) in path order, parsing files in parallel"""
+    parse = partial(parse_dump, min_confidence=min_confidence, use_cache=use_cache)
+    if workers == 1 or len(paths) <= 1:
+        for path in paths:
+            yield (path, *parse(path))
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # map() returns results in submission order, whatever order the workers finish in
+        for path, result in zip(paths, pool.map(parse, paths)):
+            yield (path, *result)
+
+def content_key(q):
+    """Registry key of a question: hash of its normalised question and option text"""
+    return hashlib.sha1(normalize(question_text(q)).encode('ascii')).hexdigest()[:16]
+
+class IdRegistry:
+    """Content key -> global question id, kept between runs in a JSON file"""
+
+    def __init__(self, path):
+        self.path = path
+        data = {}
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        self.ids = data.get('ids', {})
+        self.next_id = data.get('next_id', 1)
+        self.added = 0
+        self._seen = Counter()
+
+    def assign(self, q):
+        """Global id for q; repeated identical questions in one run get separate ids"""
+        key = content_key(q)
+        occurrence = self._seen[key]
+        self._seen[key] += 1
+        if occurrence:
+            key = f"{key}#{occurrence}"
+        qid = self.ids.get(key)
+        if qid is None:
+            qid = self.ids[key] = self.next_id
+            self.next_id += 1
+            self.added += 1
+        return qid
+
+    def save(self):
+        write_atomic(self.path, json.dumps({'next_id': self.next_id, 'ids': self.ids}, indent=0))
+
+def merge(parsed, registry, files=None, duplicates=None):
+    """Yield the questions of parsed (see iter_parsed) with global ids and their source.
+
+    If a files list is given, one summary dict per file is appended to it. If
+    a duplicates list is given, near-duplicates of an earlier question are
+    dropped before they get an id and (dropped source, kept source) pairs are
+    appended to it.
+    """
+    sources = []
+
+    def sourced():
+        for path, valid, rejected, count in parsed:
+            if files is not None:
+                files.append({'file': path, 'questions': count, 'valid': len(valid), 'rejected': rejected})
+            for q in valid:
+                # Questions of an earlier merge keep their original source
+                q['source'] = q.get('source') or {'file': path, 'id': q['id']}
+                # Merge position until the question is kept and gets its global id
+                q['id'] = len(sources)
+                sources.append(q['source'])
+                yield q
+
+    questions = sourced()
+    if duplicates is not None:
+        dropped = []
+        questions = iter_unique(questions, DUPLICATE_THRESHOLD, dropped)
+    for q in questions:
+        q['id'] = registry.assign(q)
+        yield q
+    if duplicates is not None:
+        duplicates.extend((sources[position], sources[kept]) for position, kept in dropped)
+
+def ingest(specs, output_file, ndjson=False, workers=None, min_confidence=DEFAULT_MIN_CONFIDENCE, use_cache=True,
+           registry_path=None, dedupe=False):
+    """Parse and merge every dump named by specs into output_file; returns a summary dict"""
+    paths = [path for path in expand_inputs(specs) if os.path.abspath(path) != os.path.abspath(output_file)]
+    if not paths:
+        raise FileNotFoundError(f"No dump files found in: {', '.join(specs)}")
+    registry = IdRegistry(registry_path or output_file + REGISTRY_SUFFIX)
+    files = []
+    duplicates = []
+
+    questions = merge(iter_parsed(paths, workers, min_confidence, use_cache), registry, files,
+                      duplicates if dedupe else None)
+    with atomic_output(output_file) as f:
+        count = (write_ndjson if ndjson else write_json_array)(questions, f)
+    registry.save()
+
+    return {'files': files, 'written': count, 'duplicates': duplicates, 'new_ids': registry.added}
@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Near-duplicate detection with MinHash and LSH
+
+Question texts are compared by the Jaccard similarity of their character
+9-gram shingles. Texts are normalised first: lower case, only letters and
+digits, and the letter pairs fi/fl/ff removed, because the text extracted from
+the exam PDF loses those ligatures ("con gure", " les") while the TXT dump
+keeps them.
+
+Every text gets a MinHash signature of NUM_PERM values by one permutation
+hashing: the permuted 32-bit shingle hashes are split into NUM_PERM bins by
+value and each bin keeps its smallest hash (empty bins borrow from the next
+non-empty one), so a signature costs one pass over the shingles. The share of
+equal signature positions estimates the Jaccard similarity. An LSH index
+splits the signatures into bands and only compares texts that agree on all
+values of at least one band, so finding the matches of n texts takes roughly
+linear time instead of n² comparisons.
+
+With 20 bands of 6 rows (duplicates), pairs above ~0.8 similarity are almost
+always candidates and pairs below ~0.4 rarely are; joins use 40 bands of 3
+rows, which find pairs down to ~0.5. Candidates are then checked against the
+threshold with the full signature. Different questions of the real dump stay
+below ~0.3; the TXT copy of a PDF question can be much shorter, so joins
+accept 0.5.
+
+Used for:
+  - join_by_content: match PDF questions to TXT answer blocks by question
+    text instead of trusting that both dumps number the questions the same
+  - iter_unique: drop questions that repeat an earlier one (within a dump or
+    when merging dumps)
+
+NumPy is optional; without it the signatures are computed in pure Python
+with the same hash functions, so both give the same results.
+
+    python3 near_duplicates.py questions.json --threshold 0.9
+"""
+
+import argparse
+import json
+import random
+import re
+from collections import defaultdict
+from itertools import islice
+from operator import eq
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+NUM_PERM = 120
+# Signature values per LSH band: 6 (20 bands) for duplicates, 3 (40 bands) to find weaker matches
+ROWS = 6
+JOIN_ROWS = 3
+SHINGLE_SIZE = 9
+NORMALIZE = re.compile(r'ffi|ffl|ff|fi|fl|[^a-z0-9]')
+MASK = 0xFFFFFFFF
+MASK64 = (1 << 64) - 1
+# Shingle hash: polynomial over the characters mod 2**64, folded to 32 bits
+SHINGLE_BASE = 0x100000001B3
+_rng = random.Random(20240101)
+# One permutation of the 32-bit shingle hashes, h(x) = (a * x + b) mod 2**32 with odd a;
+# its range is split into NUM_PERM bins and each bin keeps its smallest value
+PERMUTATION = (_rng.randrange(1 << 32) | 1, _rng.randrange(1 << 32))
+BIN_WIDTH = -(-(1 << 32) // NUM_PERM)
+# Multipliers that combine the ROWS values of a band into one 64-bit bucket key
+BAND_MULTIPLIERS = [_rng.randrange(1 << 64) | 1 for _ in range(ROWS)]
+# Characters hashed per NumPy chunk
+CHUNK_CHARS = 1 << 17
+
+JOIN_THRESHOLD = 0.5
+DUPLICATE_THRESHOLD = 0.9
+DEFAULT_BATCH_SIZE = 20000
+
+def normalize(text):
+    return NORMALIZE.sub('', text.lower())
+
+def _polynomial(chars):
+    value = 0
+    for char in chars:
+        value = (value * SHINGLE_BASE + char) & MASK64
+    return value
+
+def _fold(value):
+    return (value ^ (value >> 32)) & MASK
+
+def shingles(text):
+    """Sorted hashes of the 9-character shingles of the normalised text (of all of it if shorter)"""
+    chars = normalize(text).encode('ascii')
+    if not chars:
+        return []
+    size = min(SHINGLE_SIZE, len(chars))
+    value = _polynomial(chars[:size])
+    hashes = {_fold(value)}
+    # Rolling hash: drop the first character, append the next one
+    leading = pow(SHINGLE_BASE, size - 1, 1 << 64)
+    for old, new in zip(chars, chars[size:]):
+        value = ((value - old * leading) * SHINGLE_BASE + new) & MASK64
+        hashes.add(_fold(value))
+    return sorted(hashes)
+
+def question_text(q):
+    """Question and option texts, the content two copies of a question share"""
+    return ' '.join([q.get('question') or '', *(q.get('options') or {}).values()])
+
+def signatures(texts):
+    """MinHash signature of every text; None for texts without any letter or digit"""
+    if np is not None:
+        return _signatures_numpy([normalize(text).encode('ascii') for text in texts])
+    return [_signature_python(hashes) if hashes else None for hashes in map(shingles, texts)]
+
+def _densify(minimums):
+    """Fill empty bins (BIN_WIDTH) from the next non-empty bin, BIN_WIDTH higher per bin skipped"""
+    filled = list(minimums)
+    for i, value in enumerate(minimums):
+        distance = 1
+        while value == BIN_WIDTH:
+            value = minimums[(i + distance) % NUM_PERM]
+            if value != BIN_WIDTH:
+                value += distance * BIN_WIDTH
+                break
+            distance += 1
+        filled[i] = value
+    return tuple(filled)
+
+def _signature_python(hashes):
+    a, b = PERMUTATION
+    minimums = [BIN_WIDTH] * NUM_PERM
+    for h in hashes:
+        position, value = divmod((a * h + b) & MASK, BIN_WIDTH)
+        if value < minimums[position]:
+            minimums[position] = value
+    return _densify(minimums)
+
+def _signatures_numpy(normalized):
+    a, b = (np.uint64(value) for value in PERMUTATION)
+    base = np.uint64(SHINGLE_BASE)
+    result = [None] * len(normalized)
+
+    def flush(batch):
+        lengths = np.array([len(normalized[i]) for i in batch], dtype=np.int64)
+        chars = np.frombuffer(b''.join(normalized[i] for i in batch), dtype=np.uint8).astype(np.uint64)
+        # Hash of the shingle starting at every character (uint64 arithmetic wraps like & MASK64)
+        count = max(len(chars) - SHINGLE_SIZE + 1, 0)
+        values = np.zeros(count, dtype=np.uint64)
+        for offset in range(SHINGLE_SIZE):
+            values = values * base + chars[offset:offset + count]
+        owner = np.repeat(np.arange(len(batch), dtype=np.int64), lengths)[:count]
+        position = np.arange(count) - np.repeat(np.cumsum(lengths) - lengths, lengths)[:count]
+        inside = position <= lengths[owner] - SHINGLE_SIZE
+        owner, values = owner[inside], values[inside]
+        # Texts shorter than a shingle are one shingle
+        short = [index for index, i in enumerate(batch) if len(normalized[i]) < SHINGLE_SIZE]
+        if short:
+            owner = np.concatenate((owner, np.array(short, dtype=np.int64)))
+            values = np.concatenate((values, np.array([_polynomial(normalized[batch[index]])
+                                                       for index in short], dtype=np.uint64)))
+        folded = (values ^ (values >> np.uint64(32))) & np.uint64(MASK)
+        # One permutation, split into NUM_PERM bins; keep the minimum of each bin
+        permuted = (folded * a + b) & np.uint64(MASK)
+        minimums = np.full(len(batch) * NUM_PERM, BIN_WIDTH, dtype=np.int64)
+        np.minimum.at(minimums, owner * NUM_PERM + (permuted // np.uint64(BIN_WIDTH)).astype(np.int64),
+                      (permuted % np.uint64(BIN_WIDTH)).astype(np.int64))
+        minimums = minimums.reshape(len(batch), NUM_PERM)
+        # Next non-empty bin at or after every bin, going around the end of the row
+        doubled = np.concatenate((minimums, minimums), axis=1)
+        positions = np.where(doubled != BIN_WIDTH, np.arange(2 * NUM_PERM), 2 * NUM_PERM)
+        following = np.minimum.accumulate(positions[:, ::-1], axis=1)[:, ::-1][:, :NUM_PERM]
+        rows = np.arange(len(batch))[:, None]
+        dense = doubled[rows, following] + (following - np.arange(NUM_PERM)) * BIN_WIDTH
+        for index, signature in enumerate(dense):
+            result[batch[index]] = signature
+
+    batch, size = [], 0
+    for i, chars in enumerate(normalized):
+        if not chars:
+            continue
+        if batch and size + len(chars) > CHUNK_CHARS:
+            flush(batch)
+            batch, size = [], 0
+        batch.append(i)
+        size += len(chars)
+    if batch:
+        flush(batch)
+    return result
+
+def similarity(first, second):
+    """Estimated Jaccard similarity of two signatures"""
+    return sum(map(eq, first, second)) / NUM_PERM
+
+def _band_keys(signature, rows):
+    if isinstance(signature, tuple):
+        return [sum(value * m for value, m in zip(signature[start:start + rows], BAND_MULTIPLIERS)) & MASK64
+                for start in range(0, NUM_PERM, rows)]
+    # uint64 arithmetic wraps like & MASK64
+    return (signature.reshape(-1, rows).astype(np.uint64) * _BAND_MULTIPLIERS[:rows]).sum(axis=1).tolist()
+
+_BAND_MULTIPLIERS = np.array(BAND_MULTIPLIERS, dtype=np.uint64) if np is not None else None
+
+class MinHashIndex:
+    """LSH index over MinHash signatures; keys are returned by query()
+
+    Texts that agree on all rows of at least one band are compared; fewer rows
+    per band find less similar pairs but compare more candidates. With NumPy
+    the signatures are kept as rows of one matrix (grown by doubling), so the
+    candidates of a query are compared in one operation.
+    """
+
+    def __init__(self, rows=ROWS):
+        self.rows = rows
+        self.buckets = [defaultdict(list) for _ in range(NUM_PERM // rows)]
+        self.keys = []
+        self.signatures = []
+        self._matrix = None
+
+    def __len__(self):
+        return len(self.keys)
+
+    def add(self, key, signature):
+        if signature is None:
+            return
+        position = len(self.keys)
+        self.keys.append(key)
+        if isinstance(signature, tuple):
+            self.signatures.append(signature)
+        else:
+            if self._matrix is None or position == len(self._matrix):
+                grown = np.empty((max(1024, 2 * position), NUM_PERM), dtype=signature.dtype)
+                if position:
+                    grown[:position] = self._matrix
+                self._matrix = grown
+            self._matrix[position] = signature
+        for bucket, band_key in zip(self.buckets, _band_keys(signature, self.rows)):
+            bucket[band_key].append(position)
+
+    def query(self, signature, threshold):
+        """(similarity, key) of indexed texts at least threshold similar, most similar first"""
+        if signature is None:
+            return []
+        candidates = set()
+        for bucket, band_key in zip(self.buckets, _band_keys(signature, self.rows)):
+            candidates.update(bucket.get(band_key, ()))
+        if not candidates:
+            return []
+        candidates = sorted(candidates)
+        if isinstance(signature, tuple):
+            scores = [similarity(signature, self.signatures[position]) for position in candidates]
+        else:
+            scores = np.count_nonzero(self._matrix[candidates] == signature, axis=1) / NUM_PERM
+            scores = scores.tolist()
+        matches = [(score, position) for score, position in zip(scores, candidates) if score >= threshold]
+        matches.sort(key=lambda item: (-item[0], item[1]))
+        return [(score, self.keys[position]) for score, position in matches]
+
+def join_by_content(left, right, threshold=JOIN_THRESHOLD):
+    """Match (key, text) records of left to those of right one to one by text.
+
+    Returns {left key: (right key, similarity)} for the left records that have
+    a match of at least threshold. Texts that are equal after normalisation
+    are joined first; the rest go through the LSH index, best pairs first.
+    Between equally good matches one whose keys agree wins, so identical
+    questions keep their numbering.
+    """
+    joined = {}
+    taken = set()
+
+    exact = defaultdict(list)
+    for key, text in right:
+        normalized = normalize(text)
+        if normalized:
+            exact[normalized].append(key)
+    for key, text in left:
+        keys = [other for other in exact.get(normalize(text), ()) if other not in taken]
+        if keys:
+            other = key if key in keys else keys[0]
+            joined[key] = (other, 1.0)
+            taken.add(other)
+
+    left = [(key, text) for key, text in left if key not in joined]
+    right = [(key, text) for key, text in right if key not in taken]
+    index = MinHashIndex(JOIN_ROWS)
+    for (key, _), signature in zip(right, signatures([text for _, text in right])):
+        index.add(key, signature)
+
+    pairs = []
+    for position, ((key, _), signature) in enumerate(zip(left, signatures([text for _, text in left]))):
+        for score, other in index.query(signature, threshold):
+            pairs.append((-score, key != other, position, other))
+    pairs.sort(key=lambda pair: pair[:3])
+
+    for negative_score, _, position, other in pairs:
+        key = left[position][0]
+        if key in joined or other in taken:
+            continue
+        joined[key] = (other, -negative_score)
+        taken.add(other)
+    return joined
+
+def iter_unique(questions, threshold=DUPLICATE_THRESHOLD, duplicates=None, batch_size=DEFAULT_BATCH_SIZE):
+    """Yield questions that are not near-duplicates of an earlier one.
+
+    Signatures are computed in batches of batch_size questions; the index
+    keeps one signature per kept question. If a duplicates list is given,
+    (dropped id, kept id) pairs are appended to it.
+    """
+    index = MinHashIndex()
+    questions = iter(questions)
+    while True:
+        batch = list(islice(questions, batch_size))
+        if not batch:
+            return
+        for q, signature in zip(batch, signatures([question_text(q) for q in batch])):
+            matches = index.query(signature, threshold)
+            if matches:
+                if duplicates is not None:
+                    duplicates.append((q['id'], matches[0][1]))
+                continue
+            index.add(q['id'], signature)
+            yield q
+
+def duplicate_groups(questions, threshold=DUPLICATE_THRESHOLD):
+    """{kept id: [duplicate ids]} for a list of questions"""
+    duplicates = []
+    for _ in iter_unique(questions, threshold, duplicates):
+        pass
+    groups = defaultdict(list)
+    for dropped, kept in duplicates:
+        groups[kept].append(dropped)
+    return dict(groups)
+
+def main():
+    parser = argparse.ArgumentParser(description='List near-duplicate questions in a questions JSON file')
+    parser.add_argument('input_file', nargs='?', default='questions.json')
+    parser.add_argument('--threshold', type=float, default=DUPLICATE_THRESHOLD,
+                        help='Minimum estimated Jaccard similarity of question and option text')
+    args = parser.parse_args()
+
+    with open(args.input_file, 'r', encoding='utf-8') as f:
+        questions = json.load(f)
+    groups = duplicate_groups(questions, args.threshold)
+    for kept, dropped in sorted(groups.items()):
+        print(f"Question #{kept}: duplicated by {', '.join(f'#{qid}' for qid in dropped)}")
+    print(f"{sum(map(len, groups.values()))} near-duplicates of {len(groups)} questions "
+          f"in {len(questions)} questions")
+
+if __name__ == '__main__':
+    main()
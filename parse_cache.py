@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Persistent sidecar cache for parsed question blocks
+
+Each dump file gets a ``<dump>.parsecache.json`` file next to it that maps the
+content hash of every question block to its parsed record. Re-running a parser
+then only parses blocks that are new or were edited since the last run.
+"""
+
+import contextlib
+import hashlib
+import json
+import os
+
+CACHE_SUFFIX = '.parsecache.json'
+
+def sidecar_path(input_path):
+    """Return the cache file path that belongs to a dump file"""
+    return input_path + CACHE_SUFFIX
+
+def code_version(*source_files):
+    """Hash parser source files so any code change invalidates cached records"""
+    digest = hashlib.sha256()
+    for source_file in source_files:
+        with open(source_file, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+@contextlib.contextmanager
+def atomic_output(path, binary=False):
+    """Open a temporary file for writing that replaces path only on success.
+
+    Readers (nginx, the app server) see either the old file or the complete
+    new one; if the writer fails, the temporary file is removed. The file is
+    opened as utf-8 text, or for bytes with binary.
+    """
+    tmp_path = f"{path}.tmp.{os.getpid()}"
+    try:
+        with open(tmp_path, 'wb') if binary else open(tmp_path, 'w', encoding='utf-8') as f:
+            yield f
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def write_atomic(path, text):
+    """Write text to path without ever leaving a half-written file behind"""
+    with atomic_output(path) as f:
+        f.write(text)
+
+class ParseCache:
+    """Block-hash -> parsed record cache for one parser (namespace) of one dump.
+
+    Several parsers can share a sidecar file; each keeps its records under its
+    own namespace together with the code version that produced them.
+    """
+
+    def __init__(self, path, namespace, version):
+        self.path = path
+        self.namespace = namespace
+        self.version = version
+        self.hits = 0
+        self.misses = 0
+
+        self._namespaces = {}
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self._namespaces = json.load(f)
+            except (OSError, ValueError):
+                # A corrupt cache only costs a full re-parse
+                self._namespaces = {}
+
+        section = self._namespaces.get(namespace, {})
+        if section.get('version') == version:
+            self._entries = section.get('entries', {})
+        else:
+            self._entries = {}
+        # Only records seen in this run are written back, so stale blocks drop out
+        self._used = {}
+
+    @staticmethod
+    def block_key(block_text):
+        return hashlib.sha256(block_text.encode('utf-8')).hexdigest()
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def lookup(self, key):
+        """Cached record for a block key, or None"""
+        encoded = self._entries.get(key)
+        if encoded is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._used[key] = encoded
+        # Decode a fresh copy; callers are free to mutate the record
+        return json.loads(encoded)
+
+    def store(self, key, record):
+        self._used[key] = json.dumps(record, ensure_ascii=False)
+
+    def fetch(self, block_text, parse):
+        """Return the cached record for block_text, calling parse() on a miss"""
+        key = self.block_key(block_text)
+        record = self.lookup(key)
+        if record is None:
+            record = parse()
+            self.store(key, record)
+        return record
+
+    def save(self):
+        self._namespaces[self.namespace] = {
+            'version': self.version,
+            'entries': self._used,
+        }
+        write_atomic(self.path, json.dumps(self._namespaces, ensure_ascii=False))
+
+    def summary(self):
+        total = self.hits + self.misses
+        return f"cache {self.namespace}: {self.hits} hits, {self.misses} misses ({total} blocks)"
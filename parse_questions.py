@@ -4,29 +4,70 @@
 Parse questions from AWS SAA-03 Solution.txt and convert to JSON format
 """
 
+import argparse
 import re
 import json
+import sys
 
-def parse_questions(file_path):
+import answer_resolver
+from answer_resolver import DEFAULT_BATCH_SIZE, DEFAULT_MIN_CONFIDENCE, iter_resolved
+from ingest_profile import add_profile_argument, make_profiler
+from near_duplicates import DUPLICATE_THRESHOLD, iter_unique
+from parse_cache import ParseCache, atomic_output, code_version, sidecar_path
+
+QUESTION_START = re.compile(r'^(\d+)\]')
+
+def iter_questions(file_path, cache=None, batch_size=DEFAULT_BATCH_SIZE, min_confidence=DEFAULT_MIN_CONFIDENCE, workers=None):
+    """Yield parsed questions with their answer letters resolved.
+
+    The file is read line by line and answer letters are resolved in batches
+    of batch_size questions (see answer_resolver.py), so memory use does not
+    depend on the size of the dump. With a ParseCache, unchanged blocks are
+    served from the cache. With more than one worker, blocks are parsed in
+    worker processes at the block boundaries of the dump's offset index
+    (see dump_index.py); the output is the same.
+    """
+    if workers and workers > 1:
+        # dump_index imports this module, so it is imported here
+        from dump_index import iter_block_questions
+        yield from iter_resolved(iter_block_questions(file_path, workers, cache), batch_size, min_confidence)
+        return
     with open(file_path, 'r', encoding='utf-8') as f:
-        lines = f.readlines()
-    
-    questions = []
+        yield from iter_resolved(iter_questions_from_lines(f, cache), batch_size, min_confidence)
+
+def iter_questions_from_lines(lines, cache=None):
+    """Yield finished questions from an iterable of dump lines"""
+    for block in iter_blocks(lines):
+        if cache is None:
+            yield parse_block(block)
+        else:
+            yield cache.fetch(''.join(block), lambda: parse_block(block))
+
+def iter_blocks(lines):
+    """Group dump lines into question blocks, each starting at its N] line"""
+    block = None
+    for line in lines:
+        if QUESTION_START.match(line.strip()):
+            if block:
+                yield block
+            block = [line]
+        elif block is not None:
+            block.append(line)
+    if block:
+        yield block
+
+def parse_block(block_lines):
+    """Parse the lines of one question block into a finished question"""
     current_question = None
     current_block = []
     in_solution = False
     
-    i = 0
-    while i < len(lines):
-        line = lines[i].strip()
+    for line in block_lines:
+        line = line.strip()
         
         # Check if this is a new question (starts with number])
-        q_match = re.match(r'^(\d+)\]', line)
+        q_match = QUESTION_START.match(line)
         if q_match:
-            # Save previous question if exists
-            if current_question:
-                questions.append(current_question)
-            
             # Start new question
             q_num = int(q_match.group(1))
             question_text = line[len(q_match.group(0)):].strip()
@@ -47,7 +88,6 @@ def parse_questions(file_path):
                 if current_question['solution']:
                     # Already have solution, this is just separator
                     pass
-                i += 1
                 continue
             
             # Check for answer line
@@ -63,17 +103,16 @@ def parse_questions(file_path):
                     if (f' {letter}.' in answer_text or 
                         f'Option {letter}' in answer_text or 
                         f'answer {letter}' in answer_upper or
-                        answer_text.strip().startswith(letter + '.') or
-                        answer_text.strip().startswith(letter + ' ')):
+                        answer_text.strip().startswith(letter + '.')):
                         if letter in current_question['options']:
                             current_question['correct_answer'] = letter
                             break
                 
-                # If answer text starts with a letter, use it
+                # If answer text starts with a bare letter ("B)", "B:"), use it
                 if not current_question['correct_answer']:
-                    first_char = answer_text.strip()[0] if answer_text.strip() else ''
-                    if first_char in ['A', 'B', 'C', 'D', 'E', 'F'] and first_char in current_question['options']:
-                        current_question['correct_answer'] = first_char
+                    letter_match = re.match(r'([A-F])(?:[):]|$)', answer_text.strip())
+                    if letter_match and letter_match.group(1) in current_question['options']:
+                        current_question['correct_answer'] = letter_match.group(1)
             elif in_solution:
                 # Collect solution text
                 if current_question['solution']:
@@ -87,16 +126,6 @@ def parse_questions(file_path):
                     letter = option_match.group(1)
                     option_text = option_match.group(2).strip()
                     current_question['options'][letter] = option_text
-                    
-                    # Check if answer text matches this option
-                    if not current_question['correct_answer']:
-                        answer_lower = current_question['answer_text'].lower()
-                        option_lower = option_text.lower()
-                        # Check if answer contains option text or vice versa
-                        if (option_lower[:30] in answer_lower or 
-                            answer_lower[:30] in option_lower or
-                            any(word in answer_lower for word in option_text.split()[:3] if len(word) > 4)):
-                            current_question['correct_answer'] = letter
                 else:
                     # Continue question text
                     if not current_question['options']:
@@ -112,70 +141,191 @@ def parse_questions(file_path):
                         if any(keyword in line.lower() for keyword in solution_keywords):
                             in_solution = True
                             current_question['solution'] = line
-        
-        i += 1
     
-    # Add last question
-    if current_question:
-        questions.append(current_question)
+    return finalize_question(current_question)
+
+def finalize_question(q):
+    """Pick up an answer letter stated in the solution and clean up a finished question"""
+    if not q['correct_answer'] and q['solution']:
+        # Look for "Correct answer A", "Option A", etc. in solution
+        sol_match = re.search(r'(?:Correct answer|Option|answer)\s+([A-Z])', q['solution'], re.IGNORECASE)
+        if sol_match:
+            letter = sol_match.group(1)
+            if letter in q['options']:
+                q['correct_answer'] = letter
+    
+    # Clean up question text
+    if q['question']:
+        q['question'] = ' '.join(q['question'].split())
     
-    # Post-process: Try to find correct answer from solution text if not found
+    return q
+
+def parse_questions(file_path, cache=None, min_confidence=DEFAULT_MIN_CONFIDENCE):
+    return list(iter_questions(file_path, cache, min_confidence=min_confidence))
+
+def open_cache(input_file):
+    """Open the sidecar block cache used for TXT question parsing"""
+    return ParseCache(sidecar_path(input_file), 'txt-questions', code_version(__file__))
+
+def reject_reason(q):
+    """Why a question is not usable, or None if it is"""
+    if not q['options']:
+        return 'no options'
+    if not q['correct_answer']:
+        if q.get('answer_confidence') is not None:
+            return 'answer below min confidence'
+        return 'no answer letter'
+    return None
+
+def is_valid_question(q):
+    """Questions without options or a resolved answer are not usable"""
+    return reject_reason(q) is None
+
+def write_json_array(questions, f):
+    """Stream questions into f with the same layout as json.dump(..., indent=2)"""
+    count = 0
     for q in questions:
-        if not q['correct_answer'] and q['solution']:
-            # Look for "Correct answer A", "Option A", etc. in solution
-            sol_match = re.search(r'(?:Correct answer|Option|answer)\s+([A-Z])', q['solution'], re.IGNORECASE)
-            if sol_match:
-                letter = sol_match.group(1)
-                if letter in q['options']:
-                    q['correct_answer'] = letter
-        
-        # Clean up question text
-        if q['question']:
-            q['question'] = ' '.join(q['question'].split())
-        
-        # If still no correct answer, try matching answer text with options
-        if not q['correct_answer'] and q['answer_text'] and q['options']:
-            answer_words = set(q['answer_text'].lower().split())
-            best_match = None
-            best_score = 0
-            for letter, opt_text in q['options'].items():
-                opt_words = set(opt_text.lower().split())
-                common = len(answer_words & opt_words)
-                if common > best_score and common > 2:
-                    best_score = common
-                    best_match = letter
-            if best_match:
-                q['correct_answer'] = best_match
-    
-    return questions
+        f.write('[\n' if count == 0 else ',\n')
+        item = json.dumps(q, ensure_ascii=False, indent=2)
+        f.write('\n'.join('  ' + line for line in item.split('\n')))
+        count += 1
+    f.write('\n]' if count else '[]')
+    return count
+
+def write_ndjson(questions, f):
+    """Write one JSON question per line"""
+    count = 0
+    for q in questions:
+        f.write(json.dumps(q, ensure_ascii=False))
+        f.write('\n')
+        count += 1
+    return count
 
 def main():
-    input_file = 'AWS SAA-03 Solution.txt'
-    output_file = 'questions.json'
+    parser = argparse.ArgumentParser(description='Parse questions from a TXT dump into JSON')
+    parser.add_argument('inputs', nargs='*', default=['AWS SAA-03 Solution.txt'], metavar='input',
+                        help='Dump file; several files, directories or glob patterns are parsed in '
+                             'parallel and merged (see multi_dump.py)')
+    parser.add_argument('-o', '--output', default=None,
+                        help='Output file (default: questions.json, or questions.ndjson with --ndjson)')
+    parser.add_argument('--ndjson', action='store_true',
+                        help='Write one question per line instead of a JSON array')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Re-parse every block instead of using the sidecar block cache')
+    parser.add_argument('--min-confidence', type=float, default=DEFAULT_MIN_CONFIDENCE,
+                        help='Drop questions whose answer letter was matched with a lower confidence (0-1)')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                        help='Questions per answer-resolution batch')
+    parser.add_argument('--dedupe', action='store_true',
+                        help='Keep only the first of questions with nearly identical question and option text')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Processes for parsing several dumps (default: CPU count), or for parsing '
+                             'the blocks of one dump (default: 1)')
+    parser.add_argument('--id-registry', default=None,
+                        help='Global id registry used when merging dumps (default: <output>.ids.json)')
+    add_profile_argument(parser)
+    args = parser.parse_args()
+    profiler = make_profiler(args, __file__)
+    
+    output_file = args.output or ('questions.ndjson' if args.ndjson else 'questions.json')
+    
+    # multi_dump imports this module, so it is imported here
+    from multi_dump import is_multi
+    if is_multi(args.inputs):
+        main_multi(args, output_file, profiler)
+        return
+    
+    input_file = args.inputs[0]
+    
+    cache = None if args.no_cache else open_cache(input_file)
     
     print(f"Parsing questions from {input_file}...")
-    questions = parse_questions(input_file)
     
-    # Filter out questions without options or correct answer
-    valid_questions = [q for q in questions if q['options'] and q['correct_answer']]
+    # Questions are filtered and written one at a time as the parser yields them
+    stats = {'total': 0, 'sample': None, 'rejected': {}}
+    duplicates = []
     
-    print(f"Found {len(questions)} total questions")
-    print(f"Found {len(valid_questions)} valid questions with options and correct answer")
+    def valid_questions():
+        for q in iter_questions(input_file, cache, args.batch_size, args.min_confidence, args.workers):
+            stats['total'] += 1
+            reason = reject_reason(q)
+            if reason:
+                stats['rejected'][reason] = stats['rejected'].get(reason, 0) + 1
+                continue
+            if stats['sample'] is None:
+                stats['sample'] = q
+            yield q
     
-    # Save to JSON
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(valid_questions, f, ensure_ascii=False, indent=2)
+    def output_questions():
+        if args.dedupe:
+            return iter_unique(valid_questions(), DUPLICATE_THRESHOLD, duplicates)
+        return valid_questions()
     
-    print(f"Saved {len(valid_questions)} questions to {output_file}")
+    # Parsing, answer resolution and writing are interleaved; resolve_answers is also timed on its own
+    with profiler.instrument(sys.modules[__name__], answer_resolver,
+                             timed=[(answer_resolver, 'resolve_answers')]):
+        with profiler.stage('parse') as stage, atomic_output(output_file) as f:
+            if args.ndjson:
+                valid_count = write_ndjson(output_questions(), f)
+            else:
+                valid_count = write_json_array(output_questions(), f)
+            stage.add_items(stats['total'])
+    if duplicates:
+        stats['rejected']['duplicate'] = len(duplicates)
+    
+    if cache:
+        with profiler.stage('cache_save'):
+            cache.save()
+        print(cache.summary())
+        profiler.set_counter('cache', {'hits': cache.hits, 'misses': cache.misses})
+    
+    print(f"Found {stats['total']} total questions")
+    print(f"Found {valid_count} valid questions with options and correct answer")
+    for reason, count in sorted(stats['rejected'].items()):
+        print(f"  Rejected ({reason}): {count}")
+    print(f"Saved {valid_count} questions to {output_file}")
+    
+    profiler.set_counter('questions', stats['total'])
+    profiler.set_counter('valid', valid_count)
+    profiler.set_counter('rejected', stats['rejected'])
+    profiler.write(vars(args))
     
     # Print sample
-    if valid_questions:
+    sample = stats['sample']
+    if sample:
         print("\nSample question:")
-        sample = valid_questions[0]
         print(f"ID: {sample['id']}")
         print(f"Question: {sample['question'][:100]}...")
         print(f"Options: {list(sample['options'].keys())}")
-        print(f"Correct: {sample['correct_answer']}")
+        print(f"Correct: {sample['correct_answer']} (confidence {sample['answer_confidence']})")
+
+def main_multi(args, output_file, profiler):
+    """Parse several dumps in parallel and merge them with global ids"""
+    from multi_dump import ingest
+    
+    print(f"Merging dumps from {', '.join(args.inputs)}...")
+    with profiler.stage('ingest') as stage:
+        summary = ingest(args.inputs, output_file, args.ndjson, args.workers, args.min_confidence,
+                         not args.no_cache, args.id_registry, args.dedupe)
+        stage.add_items(sum(item['questions'] for item in summary['files']))
+    
+    rejected = {}
+    for item in summary['files']:
+        print(f"  {item['file']}: {item['questions']} questions, {item['valid']} valid")
+        for reason, count in item['rejected'].items():
+            rejected[reason] = rejected.get(reason, 0) + count
+    if summary['duplicates']:
+        rejected['duplicate'] = len(summary['duplicates'])
+    print(f"Merged {len(summary['files'])} files: {summary['written']} questions "
+          f"({summary['new_ids']} new global ids)")
+    for reason, count in sorted(rejected.items()):
+        print(f"  Rejected ({reason}): {count}")
+    print(f"Saved {summary['written']} questions to {output_file}")
+    
+    profiler.set_counter('files', len(summary['files']))
+    profiler.set_counter('valid', summary['written'])
+    profiler.set_counter('rejected', rejected)
+    profiler.write(vars(args))
 
 if __name__ == '__main__':
     main()
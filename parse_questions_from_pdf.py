@@ -4,9 +4,19 @@
 Parse questions from PDF and answers from TXT, then combine them
 """
 
+import argparse
+import hashlib
+import os
 import re
 import json
 import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import answer_resolver
+from answer_resolver import DEFAULT_MIN_CONFIDENCE, evidence_text, resolve_answers
+from ingest_profile import add_profile_argument, make_profiler
+from near_duplicates import DUPLICATE_THRESHOLD, JOIN_THRESHOLD, iter_unique, join_by_content
+from parse_cache import ParseCache, atomic_output, code_version, sidecar_path, write_atomic
 
 try:
     import pdfplumber
@@ -16,40 +26,204 @@ except ImportError:
         import PyPDF2
         PDF_LIB = 'PyPDF2'
     except ImportError:
+        # Metin tabanlı fonksiyonlar (TXT cevapları, birleştirme) PDF kütüphanesi olmadan da çalışır
+        PDF_LIB = None
+
+def require_pdf_lib():
+    """PDF kütüphanesi yoksa kullanıcıyı bilgilendirip çık"""
+    if PDF_LIB is None:
         print("PDF kütüphanesi bulunamadı. Lütfen şunlardan birini yükleyin:")
         print("  pip install pdfplumber")
         print("  veya")
         print("  pip install PyPDF2")
         sys.exit(1)
 
-def extract_text_from_pdf(pdf_path):
-    """PDF'den metni çıkar"""
-    text = ""
+PAGE_CACHE_DIR = '.pdf_text_cache'
+# PDF yolu -> boyut, mtime, hash ve sayfa sayısı; cache'li çalıştırmada PDF okunmaz
+PDF_INDEX_NAME = 'files.json'
+
+def file_sha256(path):
+    """Dosyanın içerik hash'i (sayfa cache anahtarı için)"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def count_pdf_pages(pdf_path):
+    """PDF'deki sayfa sayısını döndür"""
+    if PDF_LIB == 'pdfplumber':
+        with pdfplumber.open(pdf_path) as pdf:
+            return len(pdf.pages)
+    with open(pdf_path, 'rb') as file:
+        return len(PyPDF2.PdfReader(file).pages)
+
+def pdf_identity(pdf_path, cache_dir):
+    """PDF'in (hash, sayfa sayısı) ikilisi
+
+    Boyut ve mtime son çalıştırmadakiyle aynıysa cache_dir içindeki kayıttan
+    okunur; PDF ne hash'lenir ne de açılır.
+    """
+    index_path = os.path.join(cache_dir, PDF_INDEX_NAME)
+    try:
+        with open(index_path, 'r', encoding='utf-8') as f:
+            index = json.load(f)
+    except (FileNotFoundError, ValueError):
+        index = {}
+    stat = os.stat(pdf_path)
+    key = os.path.abspath(pdf_path)
+    entry = index.get(key)
+    if not entry or entry['size'] != stat.st_size or entry['mtime_ns'] != stat.st_mtime_ns:
+        entry = index[key] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns,
+                              'sha256': file_sha256(pdf_path), 'pages': count_pdf_pages(pdf_path)}
+        os.makedirs(cache_dir, exist_ok=True)
+        write_atomic(index_path, json.dumps(index, ensure_ascii=False, indent=1))
+    return entry['sha256'], entry['pages']
+
+def parse_page_ranges(spec, page_count):
+    """"1-10,15" gibi 1 tabanlı sayfa seçimini 0 tabanlı indekslere çevir"""
+    if not spec:
+        return list(range(page_count))
     
+    pages = set()
+    for part in spec.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        if '-' in part:
+            start, end = part.split('-', 1)
+            start = int(start) if start.strip() else 1
+            end = int(end) if end.strip() else page_count
+        else:
+            start = end = int(part)
+        if start < 1 or end < start:
+            raise ValueError(f"Geçersiz sayfa aralığı: {part}")
+        pages.update(range(start - 1, min(end, page_count)))
+    return sorted(pages)
+
+def extract_page_texts(pdf_path, page_indices):
+    """Verilen sayfaların metnini çıkar: [(indeks, metin veya None), ...]
+
+    Process pool worker'ı olarak da çalışır; her parça PDF'i bir kez açar.
+    """
+    results = []
     if PDF_LIB == 'pdfplumber':
         with pdfplumber.open(pdf_path) as pdf:
-            for page in pdf.pages:
-                page_text = page.extract_text()
-                if page_text:
-                    text += page_text + "\n"
+            for index in page_indices:
+                page = pdf.pages[index]
+                results.append((index, page.extract_text()))
+                # Sayfa nesnelerinin önbelleğini bırak, bellek sabit kalsın
+                page.close()
     else:  # PyPDF2
         with open(pdf_path, 'rb') as file:
             pdf_reader = PyPDF2.PdfReader(file)
-            for page in pdf_reader.pages:
-                text += page.extract_text() + "\n"
+            for index in page_indices:
+                results.append((index, pdf_reader.pages[index].extract_text()))
+    return results
+
+def _split_pages(page_indices, shard_count):
+    """Sayfaları ardışık parçalara böl"""
+    size = max(1, -(-len(page_indices) // shard_count))
+    return [page_indices[i:i + size] for i in range(0, len(page_indices), size)]
+
+def extract_text_from_pdf(pdf_path, pages=None, workers=None, cache_dir=PAGE_CACHE_DIR):
+    """PDF'den metni çıkar
+
+    pages: "1-10,15" biçiminde sayfa seçimi (None = tüm sayfalar)
+    workers: process sayısı (None = CPU sayısı, 1 = tek process)
+    cache_dir: sayfa metni cache dizini (None = cache kullanma); anahtar PDF
+    hash'i + kütüphane + sayfa numarasıdır, bu yüzden tekrar çalıştırmada
+    çıkarma tamamen atlanır. Hash ve sayfa sayısı da boyut ve mtime ile
+    saklanır (pdf_identity); değişmeyen PDF hiç açılmaz.
+    """
+    require_pdf_lib()
+    texts = {}
+    
+    page_dir = None
+    if cache_dir:
+        digest, page_count = pdf_identity(pdf_path, cache_dir)
+        page_indices = parse_page_ranges(pages, page_count)
+        page_dir = os.path.join(cache_dir, digest)
+        for index in page_indices:
+            cache_file = os.path.join(page_dir, f"{PDF_LIB}-{index + 1}.json")
+            if os.path.exists(cache_file):
+                with open(cache_file, 'r', encoding='utf-8') as f:
+                    texts[index] = json.load(f)
+    else:
+        page_indices = parse_page_ranges(pages, count_pdf_pages(pdf_path))
+    
+    missing = [index for index in page_indices if index not in texts]
+    if missing:
+        workers = workers or os.cpu_count() or 1
+        shards = _split_pages(missing, workers * 2)
+        if workers == 1 or len(shards) == 1:
+            results = [extract_page_texts(pdf_path, shard) for shard in shards]
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(extract_page_texts, [pdf_path] * len(shards), shards))
+        
+        if page_dir:
+            os.makedirs(page_dir, exist_ok=True)
+        for shard_result in results:
+            for index, page_text in shard_result:
+                texts[index] = page_text
+                if page_dir:
+                    cache_file = os.path.join(page_dir, f"{PDF_LIB}-{index + 1}.json")
+                    write_atomic(cache_file, json.dumps(page_text, ensure_ascii=False))
     
-    return text
+    # Sayfaları sırayla birleştir (tek seferde, += ile değil)
+    parts = []
+    for index in page_indices:
+        page_text = texts[index]
+        if PDF_LIB == 'pdfplumber':
+            if page_text:
+                parts.append(page_text + "\n")
+        else:  # PyPDF2
+            parts.append(page_text + "\n")
+    
+    print(f"PDF sayfaları: {len(page_indices)} seçili, {len(page_indices) - len(missing)} cache'den, "
+          f"{len(missing)} çıkarıldı")
+    return ''.join(parts)
+
+QUESTION_HEADER = re.compile(r'Question\s+#(\d+)', re.IGNORECASE)
+
+def iter_pdf_question_blocks(lines):
+    """Satırları "Question #N" başlığından başlayan soru bloklarına ayır"""
+    block = None
+    for line in lines:
+        if QUESTION_HEADER.search(line.strip()):
+            if block:
+                yield block
+            block = [line]
+        elif block is not None:
+            block.append(line)
+    if block:
+        yield block
 
-def parse_questions_from_pdf(pdf_text):
-    """PDF metninden soruları parse et"""
+def parse_questions_from_pdf(pdf_text, cache=None, rejects=None):
+    """PDF metninden soruları parse et; rejects verilirse atlanan bloklar sayılır"""
     questions = []
     
-    # Soru pattern'i: "Question #1", "Question #2", vb.
-    # Şık pattern'i: "A.", "B.", "C.", "D."
-    
     # Tüm metni satırlara böl
     lines = pdf_text.split('\n')
     
+    for block in iter_pdf_question_blocks(lines):
+        # Değişmeyen bloklar cache'den gelir
+        if cache is None:
+            question = parse_pdf_question_block(block)
+        else:
+            question = cache.fetch('\n'.join(block), lambda: parse_pdf_question_block(block))
+        if question:
+            questions.append(question)
+        elif rejects is not None:
+            rejects['fewer than 2 options'] = rejects.get('fewer than 2 options', 0) + 1
+    
+    return questions
+
+def parse_pdf_question_block(lines):
+    """Tek bir soru bloğunu parse et; 2'den az şık varsa None döner"""
+    # Soru pattern'i: "Question #1", "Question #2", vb.
+    # Şık pattern'i: "A.", "B.", "C.", "D."
     current_question = None
     current_option = None
     in_question = False
@@ -62,10 +236,6 @@ def parse_questions_from_pdf(pdf_text):
         # Soru başlangıcı: "Question #1" veya "Question #1 Topic"
         q_match = re.search(r'Question\s+#(\d+)', line, re.IGNORECASE)
         if q_match:
-            # Önceki soruyu kaydet
-            if current_question and len(current_question['options']) >= 2:
-                questions.append(current_question)
-            
             # Yeni soru başlat
             q_num = int(q_match.group(1))
             # Soru metni bu satırda veya sonraki satırlarda olabilir
@@ -123,21 +293,20 @@ def parse_questions_from_pdf(pdf_text):
         
         i += 1
     
-    # Son soruyu ekle
-    if current_question and len(current_question['options']) >= 2:
-        questions.append(current_question)
+    # En az 2 şık olmalı
+    if not current_question or len(current_question['options']) < 2:
+        return None
     
-    # Soru metinlerini temizle
-    for q in questions:
-        if q['question']:
-            q['question'] = ' '.join(q['question'].split())
-        # Şık metinlerini temizle
-        for letter in q['options']:
-            q['options'][letter] = ' '.join(q['options'][letter].split())
+    # Soru metnini temizle
+    if current_question['question']:
+        current_question['question'] = ' '.join(current_question['question'].split())
+    # Şık metinlerini temizle
+    for letter in current_question['options']:
+        current_question['options'][letter] = ' '.join(current_question['options'][letter].split())
     
-    return questions
+    return current_question
 
-def parse_answers_from_txt(txt_path):
+def parse_answers_from_txt(txt_path, cache=None):
     """TXT dosyasından cevapları parse et"""
     with open(txt_path, 'r', encoding='utf-8') as f:
         content = f.read()
@@ -152,125 +321,277 @@ def parse_answers_from_txt(txt_path):
         if not block:
             continue
         
-        # Soru numarası bul
-        q_match = re.match(r'^(\d+)\]', block)
-        if not q_match:
-            continue
-        
-        q_num = int(q_match.group(1))
-        
-        # Cevap satırını bul
-        ans_match = re.search(r'ans[-:]?\s*([^\n]+)', block, re.IGNORECASE)
-        if ans_match:
-            answer_text = ans_match.group(1).strip()
+        # Değişmeyen bloklar cache'den gelir
+        if cache is None:
+            answer = parse_answer_block(block)
         else:
-            # "ans-" ile başlayan satırı bul
-            lines = block.split('\n')
-            answer_text = ""
-            for line in lines:
-                if line.strip().startswith('ans-') or line.strip().startswith('ans '):
-                    answer_text = line[4:].strip()
-                    break
-        
-        # Çözüm metnini bul
-        solution_start = block.find('ans-') if 'ans-' in block.lower() else block.find('ans ')
-        if solution_start == -1:
-            solution_start = block.find(answer_text) if answer_text else len(block)
-        
-        solution_text = block[solution_start + len(answer_text):].strip()
-        # Separator'ları temizle
-        solution_text = re.sub(r'-+$', '', solution_text, flags=re.MULTILINE).strip()
-        
-        # Doğru cevap harfini bul
-        correct_answer = None
-        
-        # Cevap metninde harf ara
-        answer_upper = answer_text.upper()
-        for letter in ['A', 'B', 'C', 'D', 'E', 'F']:
-            if (f' {letter}.' in answer_text or 
-                f'Option {letter}' in answer_text or 
-                f'answer {letter}' in answer_upper or
-                answer_text.strip().startswith(letter + '.') or
-                answer_text.strip().startswith(letter + ' ')):
-                correct_answer = letter
-                break
-        
-        # Çözüm metninde de ara
-        if not correct_answer and solution_text:
-            sol_match = re.search(r'(?:Correct answer|Option|answer)\s+([A-Z])', solution_text, re.IGNORECASE)
-            if sol_match:
-                correct_answer = sol_match.group(1)
-        
-        answers[q_num] = {
-            'correct_answer': correct_answer,
-            'answer_text': answer_text,
-            'solution': solution_text
-        }
+            answer = cache.fetch(block, lambda: parse_answer_block(block))
+        if answer:
+            q_num = answer.pop('id')
+            answers[q_num] = answer
     
     return answers
 
-def combine_questions_and_answers(questions, answers):
-    """Soruları ve cevapları birleştir"""
-    combined = []
+def parse_answer_block(block):
+    """Tek bir TXT bloğundan cevap kaydını çıkar; soru numarası yoksa None"""
+    # Soru numarası bul
+    q_match = re.match(r'^(\d+)\]', block)
+    if not q_match:
+        return None
     
-    for q in questions:
-        q_id = q['id']
-        if q_id in answers:
-            q['correct_answer'] = answers[q_id]['correct_answer']
-            q['answer_text'] = answers[q_id]['answer_text']
-            q['solution'] = answers[q_id]['solution']
-        
-        # En az 2 şık ve doğru cevap olmalı
-        if len(q['options']) >= 2 and q['correct_answer']:
+    q_num = int(q_match.group(1))
+    
+    # Soru metni: şık veya cevap satırına kadar; soru cümlesinden sonraki boş satır da bitirir
+    stem_lines = []
+    for line in block[q_match.end():].split('\n'):
+        line = line.strip()
+        if not line:
+            if stem_lines and (stem_lines[-1].endswith('?') or re.match(r'(Which|What|How)\b', stem_lines[-1])):
+                break
+        elif re.match(r'[A-F][.)]|ans[-:\s]', line, re.IGNORECASE):
+            break
+        else:
+            stem_lines.append(line)
+    question_text = ' '.join(' '.join(stem_lines).split())
+    
+    # Cevap satırını bul
+    ans_match = re.search(r'^\s*ans[-:\s]\s*([^\n]+)', block, re.IGNORECASE | re.MULTILINE)
+    if ans_match:
+        answer_text = ans_match.group(1).strip()
+    else:
+        # "ans-" ile başlayan satırı bul
+        lines = block.split('\n')
+        answer_text = ""
+        for line in lines:
+            if line.strip().startswith('ans-') or line.strip().startswith('ans '):
+                answer_text = line[4:].strip()
+                break
+
+    # "ans-" satırı yoksa TXT sadece doğru şıkkı listeler: ilk şık satırı cevaptır
+    if not answer_text:
+        option_match = re.search(r'^\s*([A-F]\.\s*\S[^\n]*)', block, re.MULTILINE)
+        if option_match:
+            answer_text = option_match.group(1).strip()
+
+    # Çözüm metnini bul
+    solution_start = block.find('ans-') if 'ans-' in block.lower() else block.find('ans ')
+    if solution_start == -1:
+        solution_start = block.find(answer_text) if answer_text else len(block)
+    
+    solution_text = block[solution_start + len(answer_text):].strip()
+    # Separator'ları temizle
+    solution_text = re.sub(r'-+$', '', solution_text, flags=re.MULTILINE).strip()
+    
+    # Doğru cevap harfini bul
+    correct_answer = None
+    
+    # Cevap metninde harf ara
+    answer_upper = answer_text.upper()
+    for letter in ['A', 'B', 'C', 'D', 'E', 'F']:
+        if (f' {letter}.' in answer_text or 
+            f'Option {letter}' in answer_text or 
+            f'answer {letter}' in answer_upper or
+            answer_text.strip().startswith(letter + '.')):
+            correct_answer = letter
+            break
+    
+    # Çözüm metninde de ara
+    if not correct_answer and solution_text:
+        sol_match = re.search(r'(?:Correct answer|Option|answer)\s+([A-Z])', solution_text, re.IGNORECASE)
+        if sol_match:
+            correct_answer = sol_match.group(1)
+    
+    return {
+        'id': q_num,
+        'question': question_text,
+        'correct_answer': correct_answer,
+        'answer_text': answer_text,
+        'solution': solution_text
+    }
+
+def join_answers(questions, answers, threshold=JOIN_THRESHOLD, joins=None):
+    """Her PDF sorusu için TXT cevap numarasını bul: {soru sırası: cevap numarası}
+
+    PDF ve TXT soruları aynı numaralandırmayabilir; cevaplar soru metinlerinin
+    benzerliğine göre (MinHash/LSH, bkz. near_duplicates.py) eşleştirilir.
+    Soru metni olmayan cevap blokları yalnızca numarayla eşleşir. joins
+    sözlüğü verilirse eşleşme türleri sayılır.
+    """
+    joins = {} if joins is None else joins
+    joined = join_by_content([(index, q['question']) for index, q in enumerate(questions)],
+                             [(q_num, answer.get('question', '')) for q_num, answer in answers.items()],
+                             threshold)
+    result = {}
+    used = set()
+    for index, (q_num, _) in joined.items():
+        kind = 'same number' if q_num == questions[index]['id'] else 'different number'
+        joins[kind] = joins.get(kind, 0) + 1
+        result[index] = q_num
+        used.add(q_num)
+    for index, q in enumerate(questions):
+        answer = answers.get(q['id'])
+        if index not in result and answer and not answer.get('question') and q['id'] not in used:
+            joins['number only'] = joins.get('number only', 0) + 1
+            result[index] = q['id']
+            used.add(q['id'])
+    return result
+
+def combine_questions_and_answers(questions, answers, min_confidence=DEFAULT_MIN_CONFIDENCE, rejects=None,
+                                  join_threshold=JOIN_THRESHOLD, joins=None, dedupe=False):
+    """Soruları ve cevapları birleştir; rejects sözlüğü verilirse elenme nedenleri sayılır
+
+    Cevaplar soru metnine göre eşleştirilir (join_answers); dedupe ile
+    birbirinin neredeyse aynısı olan sorulardan yalnızca ilki tutulur.
+    """
+    rejects = {} if rejects is None else rejects
+    matched = []
+    
+    answer_numbers = join_answers(questions, answers, join_threshold, joins)
+    for index, q in enumerate(questions):
+        if index not in answer_numbers:
+            rejects['no matching answer'] = rejects.get('no matching answer', 0) + 1
+            continue
+        answer = answers[answer_numbers[index]]
+        # TXT'deki harf PDF şıklarında yoksa yok say, metinden bulunsun
+        letter = answer['correct_answer']
+        q['correct_answer'] = letter if letter in q['options'] else None
+        q['answer_text'] = answer['answer_text']
+        q['solution'] = answer['solution']
+        # Cevap metni de açıklaması da olmayanlar tahmin edilmez
+        if q['correct_answer'] or evidence_text(q):
+            matched.append(q)
+        else:
+            rejects['no answer text'] = rejects.get('no answer text', 0) + 1
+    
+    # Harfi belirtilmemiş cevaplar PDF şıklarıyla toplu olarak eşleştirilir
+    resolve_answers(matched, min_confidence)
+    
+    # En az 2 şık ve doğru cevap olmalı
+    combined = []
+    for q in matched:
+        if len(q['options']) < 2:
+            reason = 'fewer than 2 options'
+        elif not q['correct_answer']:
+            reason = 'answer below min confidence'
+        else:
             combined.append(q)
+            continue
+        rejects[reason] = rejects.get(reason, 0) + 1
+    
+    if dedupe:
+        duplicates = []
+        combined = list(iter_unique(combined, DUPLICATE_THRESHOLD, duplicates))
+        if duplicates:
+            rejects['duplicate'] = rejects.get('duplicate', 0) + len(duplicates)
     
     return combined
 
 def main():
-    pdf_path = 'AWS Certified Solutions Architect Associate SAA-C03.pdf'
-    txt_path = 'AWS SAA-03 Solution.txt'
-    output_file = 'questions.json'
+    parser = argparse.ArgumentParser(description='PDF sorularını ve TXT cevaplarını birleştir')
+    parser.add_argument('--pdf', default='AWS Certified Solutions Architect Associate SAA-C03.pdf')
+    parser.add_argument('--txt', default='AWS SAA-03 Solution.txt')
+    parser.add_argument('-o', '--output', default='questions.json')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Blok ve sayfa cache\'lerini kullanmadan her şeyi yeniden işle')
+    parser.add_argument('--pages', default=None,
+                        help='İşlenecek PDF sayfaları, örn. "1-50,60" (varsayılan: tümü)')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='PDF metin çıkarma process sayısı (varsayılan: CPU sayısı)')
+    parser.add_argument('--min-confidence', type=float, default=DEFAULT_MIN_CONFIDENCE,
+                        help='Cevap harfi metinden bu güvenin altında eşleşen soruları atla (0-1)')
+    parser.add_argument('--join-threshold', type=float, default=JOIN_THRESHOLD,
+                        help='PDF sorusu ile TXT cevap bloğunun soru metinleri arasında gereken en az benzerlik (0-1)')
+    parser.add_argument('--dedupe', action='store_true',
+                        help='Birbirinin neredeyse aynısı olan sorulardan yalnızca ilkini tut')
+    add_profile_argument(parser)
+    args = parser.parse_args()
+    profiler = make_profiler(args, __file__)
     
-    print(f"PDF'den sorular parse ediliyor: {pdf_path}")
-    try:
-        pdf_text = extract_text_from_pdf(pdf_path)
-        print(f"PDF metni çıkarıldı ({len(pdf_text)} karakter)")
+    require_pdf_lib()
+    
+    pdf_path = args.pdf
+    txt_path = args.txt
+    output_file = args.output
+    
+    version = code_version(__file__)
+    question_cache = None if args.no_cache else ParseCache(sidecar_path(pdf_path), 'pdf-questions', version)
+    answer_cache = None if args.no_cache else ParseCache(sidecar_path(txt_path), 'txt-answers', version)
+    
+    rejects = {}
+    module = sys.modules[__name__]
+    with profiler.instrument(module, answer_resolver,
+                             timed=[(module, 'resolve_answers'), (module, 'join_by_content')]):
+        print(f"PDF'den sorular parse ediliyor: {pdf_path}")
+        try:
+            with profiler.stage('extract_text'):
+                pdf_text = extract_text_from_pdf(pdf_path, pages=args.pages, workers=args.workers,
+                                                 cache_dir=None if args.no_cache else PAGE_CACHE_DIR)
+            print(f"PDF metni çıkarıldı ({len(pdf_text)} karakter)")
+            
+            with profiler.stage('parse_pdf_questions') as stage:
+                questions = parse_questions_from_pdf(pdf_text, question_cache, rejects)
+                stage.add_items(len(questions))
+            print(f"PDF'den {len(questions)} soru bulundu")
+            if question_cache:
+                question_cache.save()
+                print(question_cache.summary())
+            
+            # İlk birkaç soruyu göster
+            if questions:
+                print(f"\nİlk 3 soru örneği:")
+                for q in questions[:3]:
+                    print(f"  Soru #{q['id']}: {len(q['options'])} şık - {list(q['options'].keys())}")
+        except Exception as e:
+            print(f"PDF parse hatası: {e}")
+            import traceback
+            traceback.print_exc()
+            return
         
-        questions = parse_questions_from_pdf(pdf_text)
-        print(f"PDF'den {len(questions)} soru bulundu")
+        print(f"\nTXT'den cevaplar parse ediliyor: {txt_path}")
+        try:
+            with profiler.stage('parse_answers') as stage:
+                answers = parse_answers_from_txt(txt_path, answer_cache)
+                stage.add_items(len(answers))
+            print(f"TXT'den {len(answers)} cevap bulundu")
+            if answer_cache:
+                answer_cache.save()
+                print(answer_cache.summary())
+        except Exception as e:
+            print(f"TXT parse hatası: {e}")
+            import traceback
+            traceback.print_exc()
+            return
         
-        # İlk birkaç soruyu göster
-        if questions:
-            print(f"\nİlk 3 soru örneği:")
-            for q in questions[:3]:
-                print(f"  Soru #{q['id']}: {len(q['options'])} şık - {list(q['options'].keys())}")
-    except Exception as e:
-        print(f"PDF parse hatası: {e}")
-        import traceback
-        traceback.print_exc()
-        return
-    
-    print(f"\nTXT'den cevaplar parse ediliyor: {txt_path}")
-    try:
-        answers = parse_answers_from_txt(txt_path)
-        print(f"TXT'den {len(answers)} cevap bulundu")
-    except Exception as e:
-        print(f"TXT parse hatası: {e}")
-        import traceback
-        traceback.print_exc()
-        return
-    
-    print(f"\nSorular ve cevaplar birleştiriliyor...")
-    combined = combine_questions_and_answers(questions, answers)
+        print(f"\nSorular ve cevaplar birleştiriliyor...")
+        joins = {}
+        with profiler.stage('combine') as stage:
+            combined = combine_questions_and_answers(questions, answers, args.min_confidence, rejects,
+                                                     args.join_threshold, joins, args.dedupe)
+            stage.add_items(len(questions))
     
+    print(f"Cevap eşleşmeleri: {joins.get('same number', 0)} aynı numara, "
+          f"{joins.get('different number', 0)} farklı numara (metinle), "
+          f"{joins.get('number only', 0)} sadece numarayla")
     print(f"\nToplam {len(combined)} geçerli soru oluşturuldu")
+    for reason, count in sorted(rejects.items()):
+        print(f"  Elenen ({reason}): {count}")
     
     # JSON'a kaydet
-    with open(output_file, 'w', encoding='utf-8') as f:
+    with profiler.stage('write'), atomic_output(output_file) as f:
         json.dump(combined, f, ensure_ascii=False, indent=2)
     
     print(f"Sonuçlar {output_file} dosyasına kaydedildi")
     
+    profiler.set_counter('pdf_questions', len(questions))
+    profiler.set_counter('txt_answers', len(answers))
+    profiler.set_counter('valid', len(combined))
+    profiler.set_counter('rejected', rejects)
+    profiler.set_counter('joins', joins)
+    for name, cache in (('question_cache', question_cache), ('answer_cache', answer_cache)):
+        if cache:
+            profiler.set_counter(name, {'hits': cache.hits, 'misses': cache.misses})
+    profiler.write(vars(args))
+    
     # Örnek göster
     if combined:
         sample = combined[0]
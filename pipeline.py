@@ -0,0 +1,383 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Build questions.json and the shards with one command
+
+The ingest scripts are declared as stages with their input files, output
+files and source code. A stage is skipped when the hashes of its inputs, its
+code version and its parameters match the last successful run and its outputs
+are still the files that run produced. Stages whose inputs are ready run at the
+same time in separate processes, e.g. PDF question extraction and TXT answer
+parsing.
+
+    TXT source:  parse_txt ------------------------------> analyze --> exams
+    TXT dumps:   merge_txt ------------------------------> analyze --> exams
+    PDF source:  pdf_questions --+
+                                 +--> combine -----------> analyze --> exams
+                 txt_answers ----+
+                                                           analyze --> binary (--binary)
+                                                           analyze --> versions
+
+Intermediate files go to build/; questions.json and questions/ are written
+atomically (temporary file + rename), so a failed or interrupted run leaves
+the previous bank in place for nginx and the app server.
+"""
+
+import argparse
+import ast
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from parse_cache import atomic_output, code_version, write_atomic
+from answer_resolver import DEFAULT_MIN_CONFIDENCE
+from multi_dump import REGISTRY_SUFFIX, expand_inputs, is_multi
+from near_duplicates import JOIN_THRESHOLD
+from question_shards import DEFAULT_SHARD_SIZE, MANIFEST_NAME, SHARD_DIR
+from bank_versions import DEFAULT_VERSIONS_DIR, HISTORY_NAME
+from mock_exam import EXAMS_NAME
+from search_index import SEARCH_INDEX_NAME
+
+BUILD_DIR = 'build'
+STATE_FILE = 'pipeline_state.json'
+DEFAULT_TXT = 'AWS SAA-03 Solution.txt'
+DEFAULT_PDF = 'AWS Certified Solutions Architect Associate SAA-C03.pdf'
+
+def imported_sources(*source_files):
+    """source_files and every local module they import, directly or not, sorted.
+
+    Imports inside functions count too; a module is local if its .py file is
+    next to the file importing it.
+    """
+    found = set()
+    pending = list(source_files)
+    while pending:
+        path = pending.pop()
+        if path in found:
+            continue
+        found.add(path)
+        with open(path, 'r', encoding='utf-8') as f:
+            tree = ast.parse(f.read(), path)
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                names = [alias.name for alias in node.names]
+            elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+                names = [node.module]
+            else:
+                continue
+            for name in names:
+                module = os.path.join(os.path.dirname(path), name.split('.')[0] + '.py')
+                if os.path.exists(module):
+                    pending.append(module)
+    return sorted(found)
+
+class Stage:
+    """One step of the build: fn(inputs, outputs, params) reads inputs and writes outputs
+
+    code names the scripts fn runs; the local modules they import are added
+    (see imported_sources), so editing any of them re-runs the stage.
+    options are passed to fn with the params but do not change the outputs
+    (e.g. worker counts), so they are not part of the fingerprint.
+    """
+
+    def __init__(self, name, fn, inputs, outputs, code, params=None, options=None):
+        self.name = name
+        self.fn = fn
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.code = imported_sources(*code)
+        self.params = params or {}
+        self.options = options or {}
+
+    def fingerprint(self, hashes):
+        """Hash of everything that determines the outputs"""
+        digest = hashlib.sha256()
+        digest.update(self.name.encode('utf-8'))
+        digest.update(code_version(*self.code).encode('utf-8'))
+        digest.update(json.dumps(self.params, sort_keys=True).encode('utf-8'))
+        for path in self.inputs:
+            digest.update(f"{path}\0{hashes.get(path)}\0".encode('utf-8'))
+        return digest.hexdigest()
+
+# --- stage functions (module level so they can run in worker processes) ---
+
+def run_parse_txt(inputs, outputs, params):
+    from near_duplicates import iter_unique
+    from parse_questions import is_valid_question, iter_questions, open_cache, write_json_array
+    cache = open_cache(inputs[0])
+    questions = (q for q in iter_questions(inputs[0], cache, min_confidence=params['min_confidence'],
+                                           workers=params['workers'])
+                 if is_valid_question(q))
+    if params['dedupe']:
+        questions = iter_unique(questions)
+    with atomic_output(outputs[0]) as f:
+        count = write_json_array(questions, f)
+    cache.save()
+    return f"{count} questions"
+
+def run_merge_txt(inputs, outputs, params):
+    from multi_dump import ingest
+    summary = ingest(inputs, outputs[0], workers=params['workers'], min_confidence=params['min_confidence'],
+                     registry_path=params['id_registry'], dedupe=params['dedupe'])
+    return f"{summary['written']} questions from {len(inputs)} dumps"
+
+def run_pdf_questions(inputs, outputs, params):
+    from parse_questions_from_pdf import PAGE_CACHE_DIR, extract_text_from_pdf, parse_questions_from_pdf
+    text = extract_text_from_pdf(inputs[0], workers=params['workers'], cache_dir=PAGE_CACHE_DIR)
+    questions = parse_questions_from_pdf(text)
+    write_atomic(outputs[0], json.dumps(questions, ensure_ascii=False))
+    return f"{len(questions)} questions"
+
+def run_txt_answers(inputs, outputs, params):
+    from parse_questions_from_pdf import parse_answers_from_txt
+    answers = parse_answers_from_txt(inputs[0])
+    write_atomic(outputs[0], json.dumps(answers, ensure_ascii=False))
+    return f"{len(answers)} answers"
+
+def run_combine(inputs, outputs, params):
+    from parse_questions_from_pdf import combine_questions_and_answers
+    questions = load_json(inputs[0])
+    answers = {int(qid): answer for qid, answer in load_json(inputs[1]).items()}
+    combined = combine_questions_and_answers(questions, answers, params['min_confidence'],
+                                             join_threshold=params['join_threshold'], dedupe=params['dedupe'])
+    write_atomic(outputs[0], json.dumps(combined, ensure_ascii=False, indent=2))
+    return f"{len(combined)} questions"
+
+def run_analyze(inputs, outputs, params):
+    from analyze_domains import analyze_questions
+    analyze_questions(shard_dir=os.path.dirname(outputs[1]), shard_size=params['shard_size'],
+                      input_file=inputs[0], output_file=outputs[0])
+    return f"{len(load_json(outputs[0]))} questions tagged"
+
+def run_binary(inputs, outputs, params):
+    from binary_bank import write_bank
+    size = write_bank(load_json(inputs[0]), outputs[0])
+    return f"{size / 1024:.0f} KiB"
+
+def run_exams(inputs, outputs, params):
+    from mock_exam import write_pool
+    pool = write_pool(load_json(inputs[0]), outputs[0], seed=params['seed'])
+    return f"{len(pool['exams'])} mock exams of {pool['size']} questions"
+
+def run_versions(inputs, outputs, params):
+    from bank_versions import record_version
+    entry = record_version(load_json(inputs[0]), os.path.dirname(outputs[0]))
+    return f"bank version {entry['version']}"
+
+# --- graph ---
+
+def load_json(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def detect_source(pdf_path):
+    from parse_questions_from_pdf import PDF_LIB
+    return 'pdf' if PDF_LIB and os.path.exists(pdf_path) else 'txt'
+
+def build_stages(args):
+    """Declare the stages for the chosen source"""
+    build = args.build_dir
+    parsed = os.path.join(build, 'parsed.json')
+    stages = []
+    if args.source == 'pdf':
+        pdf_questions = os.path.join(build, 'pdf_questions.json')
+        txt_answers = os.path.join(build, 'txt_answers.json')
+        stages += [
+            Stage('pdf_questions', run_pdf_questions, [args.pdf], [pdf_questions],
+                  ['parse_questions_from_pdf.py'], options={'workers': args.pdf_workers}),
+            Stage('txt_answers', run_txt_answers, [args.txt], [txt_answers], ['parse_questions_from_pdf.py']),
+            Stage('combine', run_combine, [pdf_questions, txt_answers], [parsed], ['parse_questions_from_pdf.py'],
+                  {'min_confidence': args.min_confidence, 'join_threshold': args.join_threshold,
+                   'dedupe': args.dedupe}),
+        ]
+    elif is_multi([args.txt]):
+        # A directory or glob pattern: every dump is an input, so adding or editing one re-runs the merge
+        stages.append(Stage('merge_txt', run_merge_txt, expand_inputs([args.txt]), [parsed],
+                            ['multi_dump.py'],
+                            {'min_confidence': args.min_confidence, 'dedupe': args.dedupe,
+                             'id_registry': args.output + REGISTRY_SUFFIX},
+                            {'workers': args.dump_workers}))
+    else:
+        stages.append(Stage('parse_txt', run_parse_txt, [args.txt], [parsed],
+                            ['parse_questions.py'],
+                            {'min_confidence': args.min_confidence, 'dedupe': args.dedupe},
+                            {'workers': args.dump_workers}))
+    stages.append(Stage('analyze', run_analyze, [parsed],
+                        [args.output, os.path.join(args.shard_dir, MANIFEST_NAME),
+                         os.path.join(args.shard_dir, SEARCH_INDEX_NAME)],
+                        ['analyze_domains.py'],
+                        {'shard_size': args.shard_size}))
+    if args.binary:
+        stages.append(Stage('binary', run_binary, [args.output], [os.path.splitext(args.output)[0] + '.bin'],
+                            ['binary_bank.py']))
+    stages.append(Stage('exams', run_exams, [args.output], [os.path.join(args.shard_dir, EXAMS_NAME)],
+                        ['mock_exam.py'], {'seed': args.exam_seed}))
+    # Versions of the bank for delta updates of cached clients (app_server.py /api/bank/delta)
+    stages.append(Stage('versions', run_versions, [args.output], [os.path.join(args.versions_dir, HISTORY_NAME)],
+                        ['bank_versions.py']))
+    return stages
+
+class FileHashes:
+    """sha256 of files, reusing the stored hash while size and mtime are unchanged"""
+
+    def __init__(self, known=None):
+        self.known = known or {}
+
+    def get(self, path):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        entry = self.known.get(path)
+        if entry and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+            return entry['sha256']
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        self.known[path] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns,
+                            'sha256': digest.hexdigest()}
+        return digest.hexdigest()
+
+class Pipeline:
+    """Run a stage graph, skipping up-to-date stages and running ready ones in parallel"""
+
+    def __init__(self, stages, state_path, jobs=None, force=False):
+        self.stages = {stage.name: stage for stage in stages}
+        self.state_path = state_path
+        self.jobs = jobs or os.cpu_count() or 1
+        self.force = force
+        state = load_json(state_path) if os.path.exists(state_path) else {}
+        self.stage_state = state.get('stages', {})
+        self.hashes = FileHashes(state.get('files', {}))
+
+        self.producers = {path: stage.name for stage in stages for path in stage.outputs}
+        self.deps = {stage.name: {self.producers[path] for path in stage.inputs if path in self.producers}
+                     for stage in stages}
+
+    def up_to_date(self, stage):
+        if self.force:
+            return False
+        saved = self.stage_state.get(stage.name)
+        if not saved or saved['fingerprint'] != stage.fingerprint(self.hashes):
+            return False
+        return all(self.hashes.get(path) == saved['outputs'].get(path) for path in stage.outputs)
+
+    def missing_inputs(self, stage, dry_run=False):
+        # In a dry run, outputs of upstream stages that would run do not exist yet
+        return [path for path in stage.inputs
+                if not os.path.exists(path) and not (dry_run and path in self.producers)]
+
+    def record(self, stage):
+        self.stage_state[stage.name] = {
+            'fingerprint': stage.fingerprint(self.hashes),
+            'outputs': {path: self.hashes.get(path) for path in stage.outputs},
+        }
+        self.save()
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.state_path) or '.', exist_ok=True)
+        write_atomic(self.state_path, json.dumps({'stages': self.stage_state, 'files': self.hashes.known},
+                                                 indent=2))
+
+    def run(self, dry_run=False):
+        """Run every stage; returns {name: 'skipped' | 'ran' | 'failed' | 'blocked'}"""
+        status = {}
+        pending = dict(self.stages)
+        running = {}
+        pool = None if dry_run else ProcessPoolExecutor(max_workers=self.jobs)
+        try:
+            while pending or running:
+                progressed = False
+                for name, stage in list(pending.items()):
+                    if any(status.get(dep) in ('failed', 'blocked') for dep in self.deps[name]):
+                        status[name] = 'blocked'
+                        print(f"[{name}] blocked by a failed stage")
+                        del pending[name]
+                        progressed = True
+                    elif all(status.get(dep) in ('skipped', 'ran') for dep in self.deps[name]):
+                        del pending[name]
+                        progressed = True
+                        missing = self.missing_inputs(stage, dry_run)
+                        if missing:
+                            status[name] = 'failed'
+                            print(f"[{name}] missing input: {', '.join(missing)}")
+                        elif self.up_to_date(stage):
+                            status[name] = 'skipped'
+                            print(f"[{name}] up to date, skipped")
+                        elif dry_run:
+                            # Later stages would see new inputs, so they count as out of date too
+                            status[name] = 'ran'
+                            print(f"[{name}] would run")
+                        else:
+                            for path in stage.outputs:
+                                os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+                            print(f"[{name}] running")
+                            future = pool.submit(stage.fn, stage.inputs, stage.outputs,
+                                                 {**stage.params, **stage.options})
+                            running[future] = (stage, time.perf_counter())
+                if not running:
+                    if pending and not progressed:
+                        raise RuntimeError(f"Stage graph has a cycle: {', '.join(pending)}")
+                    continue
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    stage, started = running.pop(future)
+                    elapsed = time.perf_counter() - started
+                    try:
+                        summary = future.result()
+                    except Exception as e:
+                        status[stage.name] = 'failed'
+                        print(f"[{stage.name}] failed after {elapsed:.2f}s: {type(e).__name__}: {e}")
+                        continue
+                    status[stage.name] = 'ran'
+                    self.record(stage)
+                    print(f"[{stage.name}] done in {elapsed:.2f}s ({summary})")
+        finally:
+            if pool:
+                pool.shutdown()
+        return status
+
+def main():
+    parser = argparse.ArgumentParser(description='Build questions.json and the shards, skipping unchanged stages')
+    parser.add_argument('--source', choices=['auto', 'txt', 'pdf'], default='auto',
+                        help='Question source (auto: PDF + TXT answers when the PDF and a PDF library exist)')
+    parser.add_argument('--txt', default=DEFAULT_TXT,
+                        help='TXT dump; a directory or glob pattern merges several dumps (TXT source only)')
+    parser.add_argument('--pdf', default=DEFAULT_PDF)
+    parser.add_argument('-o', '--output', default='questions.json')
+    parser.add_argument('--shard-dir', default=SHARD_DIR)
+    parser.add_argument('--shard-size', type=int, default=DEFAULT_SHARD_SIZE)
+    parser.add_argument('--min-confidence', type=float, default=DEFAULT_MIN_CONFIDENCE,
+                        help='Minimum confidence of text-matched answer letters')
+    parser.add_argument('--join-threshold', type=float, default=JOIN_THRESHOLD,
+                        help='Minimum question text similarity when joining PDF questions to TXT answers')
+    parser.add_argument('--dedupe', action='store_true', help='Drop near-duplicate questions')
+    parser.add_argument('--binary', action='store_true',
+                        help='Also write the bank in the compact binary format (questions.bin, see binary_bank.py)')
+    parser.add_argument('--exam-seed', type=int, default=0, help='Seed of the precomputed mock exam pool')
+    parser.add_argument('--versions-dir', default=DEFAULT_VERSIONS_DIR,
+                        help='Bank version history served as deltas by app_server.py')
+    parser.add_argument('--pdf-workers', type=int, default=None, help='Processes for PDF text extraction')
+    parser.add_argument('--dump-workers', type=int, default=None,
+                        help='Processes for parsing several TXT dumps, or the blocks of one TXT dump')
+    parser.add_argument('--build-dir', default=BUILD_DIR, help='Intermediate files and pipeline state')
+    parser.add_argument('-j', '--jobs', type=int, default=None, help='Stages run at the same time')
+    parser.add_argument('--force', action='store_true', help='Run every stage even if it is up to date')
+    parser.add_argument('--dry-run', action='store_true', help='Only show which stages would run')
+    args = parser.parse_args()
+
+    if args.source == 'auto':
+        args.source = detect_source(args.pdf)
+    print(f"Source: {args.source}")
+
+    pipeline = Pipeline(build_stages(args), os.path.join(args.build_dir, STATE_FILE), args.jobs, args.force)
+    status = pipeline.run(args.dry_run)
+    if any(result in ('failed', 'blocked') for result in status.values()):
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Split the question bank into fixed-size, domain-grouped shards plus a manifest
+
+The front end loads only the small manifest at start-up and fetches shard files
+on demand, so the first question no longer waits for the whole bank.
+"""
+
+import json
+import os
+import re
+
+from parse_cache import write_atomic
+
+SHARD_DIR = 'questions'
+MANIFEST_NAME = 'manifest.json'
+DEFAULT_SHARD_SIZE = 50
+MANIFEST_VERSION = 1
+# <domain>-NNN.json; other files in the shard directory (e.g. the search index) are left alone
+SHARD_FILE = re.compile(r'^[a-z0-9_]+-\d{3,}\.json$')
+
+def group_by_domain(questions):
+    """Return {domain_short: [questions sorted by id]} in first-seen domain order"""
+    groups = {}
+    for q in questions:
+        groups.setdefault(q.get('domain_short') or 'Other', []).append(q)
+    for domain_questions in groups.values():
+        domain_questions.sort(key=lambda q: q['id'])
+    return groups
+
+def build_shards(questions, shard_size=DEFAULT_SHARD_SIZE):
+    """Return (manifest, {file name: [questions]}) for a question list.
+
+    Questions with fewer than two options are dropped here, exactly like the
+    front end used to do after downloading the full bank.
+    """
+    usable = [q for q in questions if len(q.get('options', {})) >= 2]
+
+    shards = {}
+    shard_entries = []
+    index = []
+    for domain_short, domain_questions in group_by_domain(usable).items():
+        for start in range(0, len(domain_questions), shard_size):
+            chunk = domain_questions[start:start + shard_size]
+            file_name = f"{domain_short.lower()}-{start // shard_size:03d}.json"
+            shard_number = len(shard_entries)
+            shards[file_name] = chunk
+            shard_entries.append({
+                'file': file_name,
+                'domain_short': domain_short,
+                'domain': chunk[0].get('domain', ''),
+                'count': len(chunk),
+            })
+            index.extend([q['id'], shard_number] for q in chunk)
+
+    # Keep the manifest in bank order so the UI numbering does not change
+    order = {q['id']: position for position, q in enumerate(usable)}
+    index.sort(key=lambda entry: order[entry[0]])
+
+    manifest = {
+        'version': MANIFEST_VERSION,
+        'total': len(index),
+        'shard_size': shard_size,
+        'shards': shard_entries,
+        # [question id, shard number] pairs; the domain comes from the shard
+        'questions': index,
+    }
+    return manifest, shards
+
+def write_shards(questions, shard_dir=SHARD_DIR, shard_size=DEFAULT_SHARD_SIZE):
+    """Write shard files and the manifest, removing shards left from older builds"""
+    manifest, shards = build_shards(questions, shard_size)
+    os.makedirs(shard_dir, exist_ok=True)
+
+    for file_name, chunk in shards.items():
+        write_atomic(os.path.join(shard_dir, file_name),
+                     json.dumps(chunk, ensure_ascii=False, separators=(',', ':')))
+
+    # The manifest goes last so clients never see it point at missing shards
+    write_atomic(os.path.join(shard_dir, MANIFEST_NAME),
+                 json.dumps(manifest, ensure_ascii=False, separators=(',', ':')))
+
+    for file_name in os.listdir(shard_dir):
+        if SHARD_FILE.match(file_name) and file_name not in shards:
+            os.remove(os.path.join(shard_dir, file_name))
+
+    return manifest
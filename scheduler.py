@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Server-side spaced repetition scheduler (see SPACED_REPETITION.md)
+
+Implements the same priority formula and top-slice sampling as
+getNextQuestion() in app.js, without recomputing and re-sorting every question
+on every request:
+
+    priority = wrong * 20 - correct * 3 + min(hours since last seen, 5) + bonus
+    bonus    = 30 if wrong > 0 and correct == 0
+
+Only questions seen during the last 5 hours have a time-dependent priority.
+Every other question has a fixed priority and lives in an indexable skip list
+(the ranking JavaScript would produce, ties broken by bank order), so an
+answer update is an O(log n) remove and insert. Recently seen questions all
+gain time weight at the same rate, so their order among themselves does not
+change over time either: they live in a second skip list, keyed by
+lastSeen - (priority without time weight) * HOUR_MS. Drawing rank r binary
+searches the recent list for the questions ranked above r in the merged
+order, O(log^2 n) per draw.
+"""
+
+import bisect
+import json
+import random
+import time
+from collections import deque
+
+WRONG_WEIGHT = 20
+CORRECT_WEIGHT = -3
+TIME_WEIGHT_CAP = 5
+NEVER_CORRECT_BONUS = 30
+HOUR_MS = 1000 * 60 * 60
+RECENT_WINDOW_MS = TIME_WEIGHT_CAP * HOUR_MS
+
+TOP_FRACTION = 0.3
+TOP_MIN = 15
+HIGH_FRACTION = 0.3
+HIGH_MIN = 5
+HIGH_PROBABILITY = 0.7
+
+def now_ms():
+    return int(time.time() * 1000)
+
+def priority(stats, now):
+    """Priority of one question, in the same evaluation order as app.js"""
+    wrong_weight = stats['wrong'] * WRONG_WEIGHT
+    correct_weight = stats['correct'] * CORRECT_WEIGHT
+    time_weight = min((now - stats['lastSeen']) / HOUR_MS, TIME_WEIGHT_CAP)
+    bonus = NEVER_CORRECT_BONUS if stats['wrong'] > 0 and stats['correct'] == 0 else 0
+    return wrong_weight + correct_weight + time_weight + bonus
+
+def base_priority(stats):
+    """Priority without the time weight"""
+    bonus = NEVER_CORRECT_BONUS if stats['wrong'] > 0 and stats['correct'] == 0 else 0
+    return stats['wrong'] * WRONG_WEIGHT + stats['correct'] * CORRECT_WEIGHT + bonus
+
+def slice_sizes(count):
+    """Return (top slice, high-priority slice) sizes used by getNextQuestion"""
+    top = min(max(TOP_MIN, int(count * TOP_FRACTION)), count)
+    high = min(max(HIGH_MIN, int(top * HIGH_FRACTION)), top)
+    return top, high
+
+class _Last:
+    """Key of the skip list's end node, greater than every key"""
+
+    def __lt__(self, other):
+        return False
+
+class _Node:
+    __slots__ = ('key', 'next', 'width')
+
+    def __init__(self, key, levels):
+        self.key = key
+        self.next = [None] * levels
+        # width[level]: how many positions next[level] is ahead of this node
+        self.width = [1] * levels
+
+class IndexedSkipList:
+    """Sorted distinct keys with O(log n) insert, remove, rank (bisect_left) and select ([index])"""
+
+    MAX_LEVELS = 24
+
+    def __init__(self, keys=(), seed=0):
+        # Its own generator, so node levels do not consume the scheduler's draws
+        self._rng = random.Random(seed)
+        self._end = _Node(_Last(), 0)
+        self._head = _Node(None, self.MAX_LEVELS)
+        self._head.next = [self._end] * self.MAX_LEVELS
+        self._size = 0
+        for key in keys:
+            self.insert(key)
+
+    def __len__(self):
+        return self._size
+
+    def __iter__(self):
+        node = self._head.next[0]
+        while node is not self._end:
+            yield node.key
+            node = node.next[0]
+
+    def _level(self):
+        level = 1
+        while level < self.MAX_LEVELS and self._rng.random() < 0.5:
+            level += 1
+        return level
+
+    def _path(self, key):
+        """Last node before key on every level, and the positions skipped on each"""
+        path = [None] * self.MAX_LEVELS
+        steps = [0] * self.MAX_LEVELS
+        node = self._head
+        for level in reversed(range(self.MAX_LEVELS)):
+            while node.next[level].key < key:
+                steps[level] += node.width[level]
+                node = node.next[level]
+            path[level] = node
+        return path, steps
+
+    def insert(self, key):
+        path, steps = self._path(key)
+        levels = self._level()
+        node = _Node(key, levels)
+        skipped = 0
+        for level in range(levels):
+            before = path[level]
+            node.next[level] = before.next[level]
+            before.next[level] = node
+            node.width[level] = before.width[level] - skipped
+            before.width[level] = skipped + 1
+            skipped += steps[level]
+        for level in range(levels, self.MAX_LEVELS):
+            path[level].width[level] += 1
+        self._size += 1
+
+    def remove(self, key):
+        path, _ = self._path(key)
+        node = path[0].next[0]
+        if node is self._end or node.key != key:
+            raise KeyError(key)
+        for level in range(len(node.next)):
+            before = path[level]
+            before.width[level] += node.width[level] - 1
+            before.next[level] = node.next[level]
+        for level in range(len(node.next), self.MAX_LEVELS):
+            path[level].width[level] -= 1
+        self._size -= 1
+
+    def bisect_left(self, key):
+        """Number of keys smaller than key"""
+        rank = 0
+        node = self._head
+        for level in reversed(range(self.MAX_LEVELS)):
+            while node.next[level].key < key:
+                rank += node.width[level]
+                node = node.next[level]
+        return rank
+
+    def __getitem__(self, index):
+        if not 0 <= index < self._size:
+            raise IndexError(index)
+        node = self._head
+        index += 1
+        for level in reversed(range(self.MAX_LEVELS)):
+            while node.width[level] <= index:
+                index -= node.width[level]
+                node = node.next[level]
+        return node.key
+
+class Scheduler:
+    """Spaced repetition state for one learner over one question bank"""
+
+    def __init__(self, question_ids, stats=None, rng=None, clock=now_ms):
+        self.rng = rng or random.Random()
+        self.clock = clock
+        self.position = {qid: index for index, qid in enumerate(question_ids)}
+        self._next_position = len(question_ids)
+        self.stats = {}
+        stats = stats or {}
+        for qid in question_ids:
+            saved = stats.get(qid) or stats.get(str(qid)) or {}
+            self.stats[qid] = {key: saved.get(key, 0) for key in ('correct', 'wrong', 'lastSeen')}
+
+        # (-priority, bank position, id) keys of questions whose time weight is capped
+        self._settled = IndexedSkipList()
+        self._settled_key = {}
+        # Time-independent keys of questions seen inside the time window (see _recent_key)
+        self._recent = IndexedSkipList()
+        self._recent_key = {}
+        # (lastSeen, id) of recently seen questions, oldest first; may hold stale entries
+        self._seen = deque()
+
+        now = self.clock()
+        recent = []
+        for qid in question_ids:
+            last_seen = self.stats[qid]['lastSeen']
+            if now - last_seen < RECENT_WINDOW_MS:
+                recent.append((last_seen, qid))
+            else:
+                self._insert_settled(qid, now)
+        for last_seen, qid in sorted(recent):
+            self._seen.append((last_seen, qid))
+            self._insert_recent(qid)
+
+    def __len__(self):
+        return len(self.position)
+
+    def _key(self, qid, now):
+        return (-priority(self.stats[qid], now), self.position[qid], qid)
+
+    def _remove_settled(self, qid):
+        key = self._settled_key.pop(qid, None)
+        if key is not None:
+            self._settled.remove(key)
+
+    def _insert_settled(self, qid, now):
+        key = self._key(qid, now)
+        self._settled.insert(key)
+        self._settled_key[qid] = key
+
+    def _remove_recent(self, qid):
+        key = self._recent_key.pop(qid, None)
+        if key is not None:
+            self._recent.remove(key)
+
+    def _insert_recent(self, qid):
+        # priority at now = base + (now - lastSeen) / HOUR_MS; ordering by lastSeen - base * HOUR_MS
+        # is the same for every now, in exact integer arithmetic
+        stats = self.stats[qid]
+        key = (stats['lastSeen'] - base_priority(stats) * HOUR_MS, self.position[qid], qid)
+        self._recent.insert(key)
+        self._recent_key[qid] = key
+
+    def _expire(self, now):
+        """Move questions whose time weight has reached the cap into the settled list"""
+        while self._seen and now - self._seen[0][0] >= RECENT_WINDOW_MS:
+            last_seen, qid = self._seen.popleft()
+            # Skip stale entries of questions that were seen again later
+            if qid in self._recent_key and self.stats[qid]['lastSeen'] == last_seen:
+                self._remove_recent(qid)
+                self._insert_settled(qid, now)
+
+    def _merged_rank(self, index, now):
+        """Rank of the index-th recent question among all questions at time now"""
+        return index + self._settled.bisect_left(self._key(self._recent[index][2], now))
+
+    def question_at_rank(self, rank, now=None):
+        """Return the id ranked `rank` (0 = highest priority) at time now"""
+        now = self.clock() if now is None else now
+        self._expire(now)
+        # Merged ranks grow with the index: find the first recent question ranked at or below rank
+        low, high = 0, len(self._recent)
+        while low < high:
+            middle = (low + high) // 2
+            if self._merged_rank(middle, now) < rank:
+                low = middle + 1
+            else:
+                high = middle
+        if low < len(self._recent) and self._merged_rank(low, now) == rank:
+            return self._recent[low][2]
+        return self._settled[rank - low][2]
+
+    def ranking(self, now=None):
+        """Full priority order; only meant for debugging and verification"""
+        now = self.clock() if now is None else now
+        return [self.question_at_rank(rank, now) for rank in range(len(self))]
+
+    def next_question(self):
+        """Draw the next question like getNextQuestion() and mark it as seen"""
+        if not self.position:
+            return None
+        now = self.clock()
+        top, high = slice_sizes(len(self))
+        if self.rng.random() < HIGH_PROBABILITY and high > 0:
+            rank = self.rng.randrange(high)
+        else:
+            rank = self.rng.randrange(top)
+        qid = self.question_at_rank(rank, now)
+        self.mark_seen(qid, now)
+        return qid
+
+    def add_question(self, qid, stats=None, now=None):
+        """Add a question that was not in the bank, after all others in bank order"""
+        if qid in self.position:
+            return
+        now = self.clock() if now is None else now
+        self.position[qid] = self._next_position
+        self._next_position += 1
+        stats = stats or {}
+        self.stats[qid] = {key: stats.get(key, 0) for key in ('correct', 'wrong', 'lastSeen')}
+        last_seen = self.stats[qid]['lastSeen']
+        if now - last_seen < RECENT_WINDOW_MS:
+            # Rare (a question removed and added back): keep _seen oldest first
+            bisect.insort(self._seen, (last_seen, qid))
+            self._insert_recent(qid)
+        else:
+            self._insert_settled(qid, now)
+
+    def remove_question(self, qid):
+        """Drop a question that left the bank"""
+        if qid not in self.position:
+            return
+        self._remove_settled(qid)
+        self._remove_recent(qid)
+        del self.stats[qid]
+        del self.position[qid]
+
+    def mark_seen(self, qid, now=None):
+        now = self.clock() if now is None else now
+        self._remove_settled(qid)
+        self._remove_recent(qid)
+        self.stats[qid]['lastSeen'] = now
+        self._seen.append((now, qid))
+        self._insert_recent(qid)
+
+    def record_answer(self, qid, correct, now=None):
+        """Count an answer; only the answered question is re-keyed"""
+        now = self.clock() if now is None else now
+        stats = self.stats[qid]
+        in_settled = qid in self._settled_key
+        in_recent = qid in self._recent_key
+        self._remove_settled(qid)
+        self._remove_recent(qid)
+        stats['correct' if correct else 'wrong'] += 1
+        if in_settled:
+            self._insert_settled(qid, now)
+        if in_recent:
+            self._insert_recent(qid)
+        return stats
+
+def load_question_ids(bank_file='questions.json'):
+    """Ids of usable questions (at least two options), in bank order"""
+    with open(bank_file, 'r', encoding='utf-8') as f:
+        questions = json.load(f)
+    return [q['id'] for q in questions if len(q.get('options', {})) >= 2]
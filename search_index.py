@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Full-text search index over the question bank
+
+analyze_domains.py writes questions/search.json next to the shard manifest.
+The front end downloads it the first time the search box is used and answers
+queries without touching the shards; only the questions on the result list are
+loaded. The file looks like:
+
+    {
+      "version": 1,
+      "fields": ["question", "options", "solution"],
+      "ids": [question id of document 0, 1, ...],
+      "terms": ["access", "acceleration", ...],
+      "postings": [[posting of term 0], ...],
+      "prefixes": {"a": [first term, end], "ac": [first term, end], ...}
+    }
+
+Documents are the usable questions in bank order (the order of the manifest).
+A posting is a list of integers (doc gap << 3 | field mask): the gap to the
+previous document of the term, and bit 0/1/2 set when the term occurs in the
+question/options/solution. Gaps keep the numbers small, so the JSON stays
+compact and gzips well. Terms are sorted, and "prefixes" gives the range of
+terms starting with every one- and two-letter prefix, so type-ahead only
+searches that slice.
+
+Queries match questions containing every query word; the last word is treated
+as a prefix while it is being typed. Results are ranked by the sum of idf x
+field weight (question > options > solution). app.js implements the same
+tokenizer and ranking, so both sides return the same results.
+
+    python3 search_index.py "transfer acceleration"
+    python3 search_index.py --build -i questions.json --index questions/search.json
+"""
+
+import argparse
+import bisect
+import heapq
+import json
+import math
+import re
+import time
+import unicodedata
+from collections import OrderedDict
+from itertools import accumulate
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from parse_cache import write_atomic
+
+SEARCH_INDEX_NAME = 'search.json'
+INDEX_VERSION = 1
+FIELDS = ('question', 'options', 'solution')
+FIELD_WEIGHTS = (3.0, 2.0, 1.0)
+# Weight of a field mask: the sum of the weights of the fields it contains
+MASK_WEIGHTS = [sum(w for bit, w in enumerate(FIELD_WEIGHTS) if mask >> bit & 1) for mask in range(8)]
+MASK_BITS = 3
+PREFIX_LENGTH = 2
+MAX_EXPANSIONS = 20
+DEFAULT_LIMIT = 20
+CACHE_TERMS = 256
+
+TOKEN = re.compile(r'[a-z0-9]+')
+STOPWORDS = frozenset('''
+a an and are as at be by can for from has have how in into is it its of on or that the their
+them this to was which will with what when where who
+'''.split())
+
+def tokenize(text):
+    """Lowercase words and numbers of text; ligatures and accents are folded by NFKC"""
+    return [token for token in TOKEN.findall(unicodedata.normalize('NFKC', text).lower())
+            if token not in STOPWORDS and (len(token) > 1 or token.isdigit())]
+
+def field_texts(q):
+    return (q.get('question', ''), ' '.join(q.get('options', {}).values()), q.get('solution', ''))
+
+def build_index(questions):
+    """Search index (see module docstring) for the usable questions of a bank"""
+    # Same selection and order as the shard manifest
+    usable = [q for q in questions if len(q.get('options', {})) >= 2]
+
+    postings = {}
+    for doc, q in enumerate(usable):
+        masks = {}
+        for bit, text in enumerate(field_texts(q)):
+            for token in tokenize(text):
+                masks[token] = masks.get(token, 0) | 1 << bit
+        for token, mask in masks.items():
+            entry = postings.get(token)
+            if entry is None:
+                postings[token] = [doc, [doc << MASK_BITS | mask]]
+            else:
+                entry[1].append((doc - entry[0]) << MASK_BITS | mask)
+                entry[0] = doc
+
+    terms = sorted(postings)
+    prefixes = {}
+    for number, term in enumerate(terms):
+        for length in range(1, min(PREFIX_LENGTH, len(term)) + 1):
+            prefix = term[:length]
+            if prefix in prefixes:
+                prefixes[prefix][1] = number + 1
+            else:
+                prefixes[prefix] = [number, number + 1]
+
+    return {
+        'version': INDEX_VERSION,
+        'fields': list(FIELDS),
+        'ids': [q['id'] for q in usable],
+        'terms': terms,
+        'postings': [postings[term][1] for term in terms],
+        'prefixes': prefixes,
+    }
+
+def write_index(questions, path):
+    """Build the index for questions and write it atomically; returns the index"""
+    index = build_index(questions)
+    write_atomic(path, json.dumps(index, ensure_ascii=False, separators=(',', ':')))
+    return index
+
+def decode_posting(posting):
+    """(doc numbers, field masks) of a delta-encoded posting"""
+    docs = list(accumulate(value >> MASK_BITS for value in posting))
+    masks = [value & 7 for value in posting]
+    return docs, masks
+
+class SearchIndex:
+    """Query API over a loaded index"""
+
+    def __init__(self, index):
+        if index.get('version') != INDEX_VERSION:
+            raise ValueError(f"Unsupported search index version: {index.get('version')}")
+        self.ids = index['ids']
+        self.terms = index['terms']
+        self.postings = index['postings']
+        self.prefixes = index['prefixes']
+        self.term_numbers = {term: number for number, term in enumerate(self.terms)}
+        # Decoded postings of recently used terms: term number -> {doc: score}
+        self._scores = OrderedDict()
+        if np is not None:
+            self._decode_all()
+
+    def _decode_all(self):
+        """Decode every posting once into flat doc/mask arrays (term number -> slice via offsets)"""
+        lengths = np.array([len(posting) for posting in self.postings], dtype=np.int64)
+        self._offsets = np.concatenate(([0], np.cumsum(lengths)))
+        values = np.fromiter((value for posting in self.postings for value in posting),
+                             dtype=np.int64, count=int(self._offsets[-1]))
+        # A running sum over all gaps, minus the sum before each posting, restarts the doc numbers
+        running = np.cumsum(values >> MASK_BITS)
+        before = np.concatenate(([0], running))[self._offsets[:-1]]
+        self._docs = (running - np.repeat(before, lengths)).astype(np.int32)
+        self._masks = (values & 7).astype(np.int8)
+        self._mask_weights = np.array(MASK_WEIGHTS)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def idf(self, number):
+        return math.log(1 + len(self.ids) / len(self.postings[number]))
+
+    def term_range(self, prefix):
+        """[start, end) of the terms starting with prefix"""
+        entry = self.prefixes.get(prefix[:PREFIX_LENGTH])
+        if entry is None:
+            return 0, 0
+        start, end = entry
+        if len(prefix) <= PREFIX_LENGTH:
+            return start, end
+        first = bisect.bisect_left(self.terms, prefix, start, end)
+        last = bisect.bisect_left(self.terms, prefix + '\uffff', first, end)
+        return first, last
+
+    def expand(self, prefix, limit=MAX_EXPANSIONS):
+        """Numbers of the most frequent terms starting with prefix"""
+        start, end = self.term_range(prefix)
+        return heapq.nlargest(limit, range(start, end), key=lambda number: len(self.postings[number]))
+
+    def complete(self, prefix, limit=10):
+        """Type-ahead: the most frequent terms starting with the (normalised) prefix"""
+        tokens = TOKEN.findall(unicodedata.normalize('NFKC', prefix).lower())
+        if not tokens:
+            return []
+        return [self.terms[number] for number in self.expand(tokens[-1], limit)]
+
+    def term_scores(self, number):
+        """{doc: idf x field weight} for one term, cached for the most recently used terms"""
+        scores = self._scores.get(number)
+        if scores is not None:
+            self._scores.move_to_end(number)
+            return scores
+        idf = self.idf(number)
+        weights = [idf * weight for weight in MASK_WEIGHTS]
+        docs, masks = decode_posting(self.postings[number])
+        scores = dict(zip(docs, [weights[mask] for mask in masks]))
+        self._scores[number] = scores
+        if len(self._scores) > CACHE_TERMS:
+            self._scores.popitem(last=False)
+        return scores
+
+    def slot_scores(self, numbers):
+        """Scores for one query word: the best of its alternative terms"""
+        if len(numbers) == 1:
+            return self.term_scores(numbers[0])
+        merged = {}
+        for number in numbers:
+            for doc, score in self.term_scores(number).items():
+                if score > merged.get(doc, 0.0):
+                    merged[doc] = score
+        return merged
+
+    def search(self, query, limit=DEFAULT_LIMIT, prefix=None):
+        """[(question id, score)] of the best matches for query, best first.
+
+        Every word has to match. Unless the query ends with a space (or prefix
+        is False), the last word also matches longer terms, so results appear
+        while it is being typed.
+        """
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        if prefix is None:
+            prefix = not query[-1:].isspace()
+
+        slots = []
+        for position, token in enumerate(tokens):
+            number = self.term_numbers.get(token)
+            numbers = [] if number is None else [number]
+            if prefix and position == len(tokens) - 1:
+                numbers += [other for other in self.expand(token) if other != number]
+            if not numbers:
+                return []
+            slots.append(numbers)
+
+        # Start from the rarest word; scores are added in this order on both paths
+        slots.sort(key=lambda numbers: sum(len(self.postings[number]) for number in numbers))
+        best = self._rank_numpy(slots, limit) if np is not None else self._rank_python(slots, limit)
+        return [(self.ids[doc], round(score, 4)) for doc, score in best]
+
+    def _rank_python(self, slots, limit):
+        # Look the candidates of the rarest word up in the others
+        candidates = self.slot_scores(slots[0])
+        for numbers in slots[1:]:
+            scores = self.slot_scores(numbers)
+            candidates = {doc: score + scores[doc] for doc, score in candidates.items() if doc in scores}
+            if not candidates:
+                return []
+        return heapq.nsmallest(limit, candidates.items(), key=lambda item: (-item[1], item[0]))
+
+    def _rank_numpy(self, slots, limit):
+        # Dense score vectors over all documents: a few vector operations per word
+        total = np.zeros(len(self.ids))
+        matched = np.ones(len(self.ids), dtype=bool)
+        for numbers in slots:
+            scores = np.zeros(len(self.ids))
+            for number in numbers:
+                start, end = self._offsets[number], self._offsets[number + 1]
+                docs = self._docs[start:end]
+                weights = self._mask_weights[self._masks[start:end]] * self.idf(number)
+                scores[docs] = np.maximum(scores[docs], weights)
+            total += scores
+            matched &= scores > 0
+        docs = np.flatnonzero(matched)
+        scores = total[docs]
+        if len(docs) > limit:
+            # Everything above the limit-th best score, then ties in doc order
+            kth = np.partition(scores, len(docs) - limit)[len(docs) - limit]
+            keep = np.flatnonzero(scores > kth)
+            ties = np.flatnonzero(scores == kth)[:limit - len(keep)]
+            selected = np.concatenate((keep, ties))
+            docs, scores = docs[selected], scores[selected]
+        order = np.lexsort((docs, -scores))
+        return [(int(docs[i]), float(scores[i])) for i in order]
+
+def main():
+    parser = argparse.ArgumentParser(description='Build or query the question search index')
+    parser.add_argument('query', nargs='*', help='Search words')
+    parser.add_argument('--build', action='store_true', help='Build the index from the question bank first')
+    parser.add_argument('-i', '--input', default='questions.json', help='Question bank for --build')
+    parser.add_argument('--index', default=f"questions/{SEARCH_INDEX_NAME}", help='Search index file')
+    parser.add_argument('-n', '--limit', type=int, default=10, help='Number of results')
+    parser.add_argument('--complete', action='store_true', help='Show type-ahead completions of the last word')
+    args = parser.parse_args()
+
+    if args.build:
+        with open(args.input, 'r', encoding='utf-8') as f:
+            questions = json.load(f)
+        started = time.perf_counter()
+        index = write_index(questions, args.index)
+        print(f"Indexed {len(index['ids'])} questions, {len(index['terms'])} terms "
+              f"in {time.perf_counter() - started:.2f}s -> {args.index}")
+    if not args.query:
+        return
+
+    index = SearchIndex.load(args.index)
+    query = ' '.join(args.query)
+    started = time.perf_counter()
+    if args.complete:
+        results = index.complete(query, args.limit)
+    else:
+        results = index.search(query, args.limit)
+    elapsed = (time.perf_counter() - started) * 1000
+    print(f"{len(results)} results in {elapsed:.2f} ms")
+    for result in results:
+        print(f"  {result}" if args.complete else f"  #{result[0]}  {result[1]}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Simulate synthetic learners to tune the spaced repetition weights
+
+Thousands of learners study the real question bank at the same time. Their
+stats, priorities and memory are (learners x questions) NumPy arrays, so one
+simulation step draws the next question for every learner with a handful of
+array operations. A grid of weight configurations is swept in a process pool.
+
+Learner model (deliberately simple):
+  - knowledge of a question starts at sigmoid(skill - difficulty - weakness of
+    its domain); every learner has random per-domain weaknesses
+  - a seen question is recalled with probability knowledge * exp(-t / stability)
+  - every answer shows the solution: knowledge moves towards 1 and stability
+    grows (more after a correct answer)
+  - learners answer in sessions with a long break in between, so the time
+    weight of the scheduler matters
+
+Reported per configuration:
+  - time to mastery: answers until MASTERY_SHARE of the bank is recalled with
+    probability >= MASTERY_RECALL
+  - weak-domain coverage: share of the learner's weakest domain seen within the
+    first COVERAGE_HORIZON answers, and its mastery at the end
+"""
+
+import argparse
+import itertools
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import numpy as np
+except ImportError:
+    print("NumPy is required for the simulator. Install it with:")
+    print("  pip install numpy")
+    sys.exit(1)
+
+import scheduler
+
+DEFAULT_CONFIG = {
+    'wrong_weight': scheduler.WRONG_WEIGHT,
+    'correct_weight': scheduler.CORRECT_WEIGHT,
+    'time_cap': scheduler.TIME_WEIGHT_CAP,
+    'bonus': scheduler.NEVER_CORRECT_BONUS,
+    'top_fraction': scheduler.TOP_FRACTION,
+    'top_min': scheduler.TOP_MIN,
+    'high_fraction': scheduler.HIGH_FRACTION,
+    'high_min': scheduler.HIGH_MIN,
+    'high_probability': scheduler.HIGH_PROBABILITY,
+}
+
+ANSWER_HOURS = 2 / 60
+SESSION_LENGTH = 30
+BREAK_HOURS = 20
+INITIAL_STABILITY = 24.0
+LEARN_RATE = 0.35
+STABILITY_GAIN_CORRECT = 2.0
+STABILITY_GAIN_WRONG = 1.3
+MASTERY_RECALL = 0.9
+MASTERY_SHARE = 0.9
+MASTERY_CHECK_EVERY = 10
+COVERAGE_HORIZON = 200
+NEVER_SEEN = -1e9
+
+def load_bank_domains(bank_file):
+    """Domain index of every usable question, plus the domain names"""
+    with open(bank_file, 'r', encoding='utf-8') as f:
+        questions = json.load(f)
+    questions = [q for q in questions if len(q.get('options', {})) >= 2]
+    names = sorted({q.get('domain_short') or 'Other' for q in questions})
+    index = {name: i for i, name in enumerate(names)}
+    return np.array([index[q.get('domain_short') or 'Other'] for q in questions]), names
+
+def slice_sizes(config, count):
+    top = min(max(config['top_min'], int(count * config['top_fraction'])), count)
+    high = min(max(config['high_min'], int(top * config['high_fraction'])), top)
+    return top, high
+
+def recall_probability(knowledge, stability, last_seen, now):
+    seen = last_seen > NEVER_SEEN
+    decay = np.exp(-np.where(seen, now - last_seen, 0.0) / stability)
+    return knowledge * decay
+
+def simulate(config, domains, learners=1000, steps=1500, seed=0):
+    """Run one configuration; the same seed gives every config the same learners"""
+    rng = np.random.default_rng(seed)
+    n_questions = len(domains)
+    n_domains = int(domains.max()) + 1
+    rows = np.arange(learners)
+
+    skill = rng.normal(0.0, 1.0, (learners, 1))
+    difficulty = rng.normal(0.0, 1.0, (1, n_questions))
+    weakness = rng.normal(0.0, 0.75, (learners, n_domains))
+    weak_domain = weakness.argmax(axis=1)
+    knowledge = 1.0 / (1.0 + np.exp(-(skill - difficulty - weakness[:, domains])))
+    stability = np.full((learners, n_questions), INITIAL_STABILITY)
+
+    correct = np.zeros((learners, n_questions))
+    wrong = np.zeros((learners, n_questions))
+    last_seen = np.full((learners, n_questions), NEVER_SEEN)
+    # Stable tie-break by bank position, like Array.prototype.sort in app.js
+    tie_break = np.arange(n_questions) * 1e-9
+
+    top, high = slice_sizes(config, n_questions)
+    in_weak_domain = domains[None, :] == weak_domain[:, None]
+    weak_sizes = in_weak_domain.sum(axis=1)
+    mastered_at = np.full(learners, -1)
+    weak_coverage = None
+
+    now = 0.0
+    for step in range(steps):
+        time_weight = np.minimum(now - last_seen, config['time_cap'])
+        priority = (config['wrong_weight'] * wrong + config['correct_weight'] * correct
+                    + time_weight + config['bonus'] * ((wrong > 0) & (correct == 0)))
+        key = tie_break - priority
+
+        # Only the top slice needs ordering
+        candidates = np.argpartition(key, top - 1, axis=1)[:, :top]
+        order = np.argsort(np.take_along_axis(key, candidates, axis=1), axis=1, kind='stable')
+        ranked = np.take_along_axis(candidates, order, axis=1)
+        use_high = rng.random(learners) < config['high_probability']
+        rank = np.where(use_high, rng.integers(0, high, learners), rng.integers(0, top, learners))
+        chosen = ranked[rows, rank]
+
+        p_correct = recall_probability(knowledge[rows, chosen], stability[rows, chosen],
+                                       last_seen[rows, chosen], now)
+        answered_correctly = rng.random(learners) < p_correct
+        correct[rows, chosen] += answered_correctly
+        wrong[rows, chosen] += ~answered_correctly
+        knowledge[rows, chosen] += LEARN_RATE * (1.0 - knowledge[rows, chosen])
+        stability[rows, chosen] *= np.where(answered_correctly, STABILITY_GAIN_CORRECT, STABILITY_GAIN_WRONG)
+        last_seen[rows, chosen] = now
+
+        now += ANSWER_HOURS
+        if (step + 1) % SESSION_LENGTH == 0:
+            now += BREAK_HOURS
+
+        if step + 1 == COVERAGE_HORIZON:
+            seen_weak = ((last_seen > NEVER_SEEN) & in_weak_domain).sum(axis=1)
+            weak_coverage = seen_weak / np.maximum(weak_sizes, 1)
+
+        if (step + 1) % MASTERY_CHECK_EVERY == 0:
+            recalled = recall_probability(knowledge, stability, last_seen, now) >= MASTERY_RECALL
+            newly = (mastered_at < 0) & (recalled.mean(axis=1) >= MASTERY_SHARE)
+            mastered_at[newly] = step + 1
+
+    if weak_coverage is None:
+        seen_weak = ((last_seen > NEVER_SEEN) & in_weak_domain).sum(axis=1)
+        weak_coverage = seen_weak / np.maximum(weak_sizes, 1)
+    recalled = recall_probability(knowledge, stability, last_seen, now) >= MASTERY_RECALL
+    weak_mastery = (recalled & in_weak_domain).sum(axis=1) / np.maximum(weak_sizes, 1)
+
+    done = mastered_at[mastered_at > 0]
+    return {
+        'config': config,
+        'learners': learners,
+        'steps': steps,
+        'mastered_share': float(len(done) / learners),
+        'median_steps_to_mastery': float(np.median(done)) if len(done) else None,
+        'p90_steps_to_mastery': float(np.percentile(done, 90)) if len(done) else None,
+        'weak_domain_coverage': float(weak_coverage.mean()),
+        'weak_domain_mastery': float(weak_mastery.mean()),
+    }
+
+def _run(args):
+    config, domains, learners, steps, seed = args
+    return simulate(config, domains, learners, steps, seed)
+
+def parse_values(text, kind):
+    return [kind(value) for value in text.split(',') if value.strip()]
+
+def build_grid(args):
+    """Cartesian product of every comma-separated parameter list"""
+    axes = {}
+    for name, default in DEFAULT_CONFIG.items():
+        raw = getattr(args, name)
+        kind = int if isinstance(default, int) and not isinstance(default, bool) else float
+        axes[name] = parse_values(raw, kind) if raw else [default]
+    names = list(axes)
+    return [dict(zip(names, values)) for values in itertools.product(*axes.values())]
+
+def sort_key(result):
+    """Most learners mastered first, then fastest, then best weak-domain coverage"""
+    median = result['median_steps_to_mastery']
+    return (-result['mastered_share'], median if median is not None else float('inf'),
+            -result['weak_domain_coverage'])
+
+def main():
+    parser = argparse.ArgumentParser(description='Tune spaced repetition weights on synthetic learners')
+    parser.add_argument('--bank', default='questions.json')
+    parser.add_argument('--learners', type=int, default=1000)
+    parser.add_argument('--steps', type=int, default=1500, help='Answers per learner')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=None, help='Processes (default: CPU count)')
+    parser.add_argument('--output', default=None, help='Write all results to this JSON file')
+    for name in DEFAULT_CONFIG:
+        parser.add_argument('--' + name.replace('_', '-'), dest=name, default=None,
+                            help=f'Comma-separated values to sweep, e.g. --{name.replace("_", "-")}=a,b '
+                                 f'(default: {DEFAULT_CONFIG[name]})')
+    args = parser.parse_args()
+
+    domains, domain_names = load_bank_domains(args.bank)
+    grid = build_grid(args)
+    print(f"{len(domains)} questions in {len(domain_names)} domains, "
+          f"{args.learners} learners x {args.steps} answers, {len(grid)} configurations")
+
+    jobs = [(config, domains, args.learners, args.steps, args.seed) for config in grid]
+    workers = args.workers or os.cpu_count() or 1
+    if workers == 1 or len(jobs) == 1:
+        results = [_run(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as pool:
+            results = list(pool.map(_run, jobs))
+
+    results.sort(key=sort_key)
+    print(f"\n{'wrong':>6} {'corr':>5} {'cap':>4} {'bonus':>6} {'top%':>5} {'high%':>6} "
+          f"{'mastered':>9} {'median':>7} {'p90':>6} {'weak cov':>9} {'weak mst':>9}")
+    for r in results:
+        c = r['config']
+        median = r['median_steps_to_mastery']
+        p90 = r['p90_steps_to_mastery']
+        median = f"{median:.0f}" if median is not None else '-'
+        p90 = f"{p90:.0f}" if p90 is not None else '-'
+        print(f"{c['wrong_weight']:>6} {c['correct_weight']:>5} {c['time_cap']:>4} {c['bonus']:>6} "
+              f"{c['top_fraction']:>5.0%} {c['high_probability']:>6.0%} "
+              f"{r['mastered_share']:>9.1%} {median:>7} {p90:>6} "
+              f"{r['weak_domain_coverage']:>9.1%} {r['weak_domain_mastery']:>9.1%}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"\nResults saved to {args.output}")
+
+if __name__ == '__main__':
+    main()
@@ -8,8 +8,8 @@ echo "📋 Kontroller yapılıyor..."
 # questions.json dosyasının varlığını kontrol et
 if [ ! -f "questions.json" ]; then
     echo "❌ questions.json dosyası bulunamadı!"
-    echo "📝 Parse scripti çalıştırılıyor..."
-    python3 parse_questions.py
+    echo "📝 Build pipeline'ı çalıştırılıyor..."
+    python3 pipeline.py
     if [ ! -f "questions.json" ]; then
         echo "❌ Hata: questions.json oluşturulamadı!"
         exit 1
@@ -38,6 +38,6 @@ if lsof -ti:$PORT > /dev/null 2>&1; then
     echo "📍 Uygulama şu adreste çalışacak: http://localhost:$PORT"
 fi
 
-# Python 3 ile HTTP sunucusu başlat
-python3 -m http.server $PORT
+# Python 3 ile uygulama sunucusunu başlat (statik dosyalar + zamanlayıcı API'si)
+python3 app_server.py --port $PORT
 
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Build the static site for the nginx image: fingerprinted, precompressed assets
+
+    python3 static_build.py                # -> dist/html/ and dist/nginx.conf
+
+Every asset except index.html gets the first characters of its content hash in
+its name (app.3f9c0d21ab.js, questions/cost-000.8e1f2a7c55.json, ...), and
+the references to it are rewritten: shard names in the manifest, the manifest,
+search index, exam pool and questions.json paths in app.js, app.js and style.css in
+index.html. Hashes are taken after rewriting, so a changed shard also renames
+the manifest and app.js. A name therefore always stands for the same bytes and
+nginx can let browsers cache these files for a year (immutable), while
+index.html is revalidated on every load and picks up a rebuild at once.
+
+Text files get .gz siblings (and .br siblings when the brotli package is
+installed) for gzip_static/brotli_static, so nginx serves compressed bytes
+without compressing them per request. The matching nginx config is written
+next to the site. The stock nginx:alpine image has no brotli module; pass
+--nginx-brotli only for an image built with ngx_brotli.
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import shutil
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+from question_shards import MANIFEST_NAME, SHARD_DIR
+from mock_exam import EXAMS_NAME
+from search_index import SEARCH_INDEX_NAME
+
+HASH_LENGTH = 10
+COMPRESS_SUFFIXES = ('.html', '.css', '.js', '.json')
+# Smaller files are not worth a compressed copy
+MIN_COMPRESS_SIZE = 256
+DEFAULT_OUTPUT = 'dist'
+
+SECURITY_HEADERS = [
+    'add_header X-Frame-Options "SAMEORIGIN" always;',
+    'add_header X-Content-Type-Options "nosniff" always;',
+    'add_header X-XSS-Protection "1; mode=block" always;',
+]
+
+NGINX_TEMPLATE = """\
+# Generated by static_build.py; edit the template there instead of this file.
+server {{
+    listen 80;
+    server_name localhost;
+    root /usr/share/nginx/html;
+    index index.html;
+
+    # Serve the precompressed siblings written by static_build.py;
+    # anything without one is still compressed on the fly
+    gzip_static on;
+{brotli}    gzip on;
+    gzip_vary on;
+    gzip_min_length 1024;
+    gzip_types text/plain text/css text/xml text/javascript application/javascript application/json;
+
+    # Security headers
+{security}
+
+    # Fingerprinted assets: a new build gives changed files new names, so they never go stale.
+    # add_header in a location replaces the server-level headers, hence the repetition.
+    location ~* "\\.[0-9a-f]{{{hash_length}}}\\.(css|js|json)$" {{
+        add_header Cache-Control "public, max-age=31536000, immutable";
+{security_location}
+        try_files $uri =404;
+    }}
+
+    # index.html (and anything unhashed) is revalidated on every load
+    location / {{
+        add_header Cache-Control "no-cache";
+{security_location}
+        try_files $uri $uri/ /index.html;
+    }}
+
+    # Health check endpoint
+    location /health {{
+        access_log off;
+        return 200 "healthy\\n";
+        add_header Content-Type text/plain;
+    }}
+}}
+"""
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()[:HASH_LENGTH]
+
+def hashed_name(path, data):
+    """name.ext -> name.<hash>.ext"""
+    root, ext = os.path.splitext(path)
+    return f"{root}.{content_hash(data)}{ext}"
+
+def read_bytes(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+def replace_reference(text, old, new, source):
+    """Replace a quoted reference to old in text; a missing reference is an error"""
+    count = 0
+    for quote in ("'", '"'):
+        count += text.count(f"{quote}{old}{quote}")
+        text = text.replace(f"{quote}{old}{quote}", f"{quote}{new}{quote}")
+    if not count:
+        raise ValueError(f"{source} does not reference {old!r}; update static_build.py")
+    return text
+
+class SiteBuilder:
+    """Collects the files of the site and the original -> fingerprinted name map"""
+
+    def __init__(self):
+        self.files = {}
+        self.names = {}
+
+    def add(self, path, data, fingerprint=True):
+        """Add a file under its (fingerprinted) site path and return that path"""
+        name = hashed_name(path, data) if fingerprint else path
+        self.files[name] = data
+        self.names[path] = name
+        return name
+
+    def write(self, output_dir, use_brotli=True):
+        """Write all files and their compressed siblings; returns {'gz': n, 'br': n}"""
+        compressed = {'gz': 0, 'br': 0}
+        for name, data in self.files.items():
+            path = os.path.join(output_dir, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as f:
+                f.write(data)
+            if not name.endswith(COMPRESS_SUFFIXES) or len(data) < MIN_COMPRESS_SIZE:
+                continue
+            siblings = {'gz': gzip.compress(data, 9, mtime=0)}
+            if use_brotli and brotli is not None:
+                siblings['br'] = brotli.compress(data, mode=brotli.MODE_TEXT)
+            for suffix, packed in siblings.items():
+                # nginx would gladly serve a "compressed" copy that is larger
+                if len(packed) < len(data):
+                    with open(f"{path}.{suffix}", 'wb') as f:
+                        f.write(packed)
+                    compressed[suffix] += 1
+        return compressed
+
+def build_site(source_dir='.', output_dir=DEFAULT_OUTPUT, use_brotli=True, nginx_brotli=False):
+    """Build output_dir/html and output_dir/nginx.conf; returns a summary dict"""
+    site = SiteBuilder()
+    source = lambda *parts: os.path.join(source_dir, *parts)
+    app_js = read_bytes(source('app.js')).decode('utf-8')
+
+    manifest_path = source(SHARD_DIR, MANIFEST_NAME)
+    if os.path.exists(manifest_path):
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        for shard in manifest['shards']:
+            data = read_bytes(source(SHARD_DIR, shard['file']))
+            shard['file'] = os.path.basename(site.add(f"{SHARD_DIR}/{shard['file']}", data))
+        data = json.dumps(manifest, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        name = site.add(f"{SHARD_DIR}/{MANIFEST_NAME}", data)
+        app_js = replace_reference(app_js, f"{SHARD_DIR}/{MANIFEST_NAME}", name, 'app.js')
+
+    for file_name in (SEARCH_INDEX_NAME, EXAMS_NAME):
+        path = source(SHARD_DIR, file_name)
+        if os.path.exists(path):
+            name = site.add(f"{SHARD_DIR}/{file_name}", read_bytes(path))
+            app_js = replace_reference(app_js, f"{SHARD_DIR}/{file_name}", name, 'app.js')
+
+    # Single-file fallback of app.js when there is no manifest
+    if os.path.exists(source('questions.json')):
+        name = site.add('questions.json', read_bytes(source('questions.json')))
+        app_js = replace_reference(app_js, 'questions.json', name, 'app.js')
+
+    style_name = site.add('style.css', read_bytes(source('style.css')))
+    app_name = site.add('app.js', app_js.encode('utf-8'))
+
+    index_html = read_bytes(source('index.html')).decode('utf-8')
+    index_html = replace_reference(index_html, 'style.css', style_name, 'index.html')
+    index_html = replace_reference(index_html, 'app.js', app_name, 'index.html')
+    site.add('index.html', index_html.encode('utf-8'), fingerprint=False)
+
+    # Build next to the old output and swap, so a failed build keeps the previous one
+    tmp_dir = f"{output_dir}.tmp.{os.getpid()}"
+    try:
+        compressed = site.write(os.path.join(tmp_dir, 'html'), use_brotli)
+        with open(os.path.join(tmp_dir, 'nginx.conf'), 'w', encoding='utf-8') as f:
+            f.write(nginx_config(nginx_brotli))
+        with open(os.path.join(tmp_dir, 'assets.json'), 'w', encoding='utf-8') as f:
+            json.dump(site.names, f, indent=2, sort_keys=True)
+        if os.path.exists(output_dir):
+            shutil.rmtree(output_dir)
+        os.replace(tmp_dir, output_dir)
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+    return {'files': len(site.files), 'bytes': sum(len(data) for data in site.files.values()), **compressed}
+
+def nginx_config(nginx_brotli=False):
+    """nginx server block for the built site"""
+    brotli_lines = ''
+    if nginx_brotli:
+        brotli_lines = '    brotli_static on;\n'
+    return NGINX_TEMPLATE.format(
+        brotli=brotli_lines,
+        security='\n'.join(f"    {line}" for line in SECURITY_HEADERS),
+        security_location='\n'.join(f"        {line}" for line in SECURITY_HEADERS),
+        hash_length=HASH_LENGTH,
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description='Build fingerprinted, precompressed static files and nginx config')
+    parser.add_argument('--source', default='.', help='Directory with index.html, app.js, style.css and the bank')
+    parser.add_argument('-o', '--output', default=DEFAULT_OUTPUT,
+                        help='Output directory (html/ for the site, nginx.conf, assets.json)')
+    parser.add_argument('--no-brotli', action='store_true', help='Do not write .br files')
+    parser.add_argument('--nginx-brotli', action='store_true',
+                        help='Enable brotli_static in nginx.conf (needs nginx built with ngx_brotli)')
+    args = parser.parse_args()
+
+    if brotli is None and not args.no_brotli:
+        print("brotli package not installed; writing .gz files only (pip install brotli)")
+    summary = build_site(args.source, args.output, not args.no_brotli, args.nginx_brotli)
+    print(f"Built {summary['files']} files ({summary['bytes'] / 1024:.0f} KiB) in {args.output}/html: "
+          f"{summary['gz']} .gz, {summary['br']} .br")
+    print(f"nginx config: {os.path.join(args.output, 'nginx.conf')}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Learner stats storage: batched deltas applied to SQLite in WAL mode
+
+Clients send deltas such as {"id": 12, "correct": 1, "wrong": 0, "lastSeen": ts}
+instead of re-serializing their whole stats map after every answer. Deltas are
+buffered in memory (write-behind) and flushed for all learners in one
+transaction, so many learners can share one deployment without each answer
+taking the database write lock.
+"""
+
+import sqlite3
+import threading
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS question_stats (
+    learner TEXT NOT NULL,
+    question_id INTEGER NOT NULL,
+    correct INTEGER NOT NULL DEFAULT 0,
+    wrong INTEGER NOT NULL DEFAULT 0,
+    last_seen INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (learner, question_id)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS session_stats (
+    learner TEXT PRIMARY KEY,
+    correct INTEGER NOT NULL DEFAULT 0,
+    wrong INTEGER NOT NULL DEFAULT 0,
+    total INTEGER NOT NULL DEFAULT 0
+) WITHOUT ROWID;
+"""
+
+UPSERT_QUESTION = """
+INSERT INTO question_stats (learner, question_id, correct, wrong, last_seen)
+VALUES (?, ?, ?, ?, ?)
+ON CONFLICT (learner, question_id) DO UPDATE SET
+    correct = correct + excluded.correct,
+    wrong = wrong + excluded.wrong,
+    last_seen = MAX(last_seen, excluded.last_seen)
+"""
+
+UPSERT_SESSION = """
+INSERT INTO session_stats (learner, correct, wrong, total)
+VALUES (?, ?, ?, ?)
+ON CONFLICT (learner) DO UPDATE SET
+    correct = correct + excluded.correct,
+    wrong = wrong + excluded.wrong,
+    total = total + excluded.total
+"""
+
+RESET_SESSION = "DELETE FROM session_stats WHERE learner = ?"
+
+def empty_batch():
+    return {'reset_session': False, 'session': [0, 0, 0], 'questions': {}}
+
+def normalize_delta(delta):
+    """Validate a client delta; raises KeyError/TypeError/ValueError if malformed"""
+    normalized = {
+        'id': int(delta['id']),
+        'correct': int(delta.get('correct', 0)),
+        'wrong': int(delta.get('wrong', 0)),
+        'lastSeen': int(delta.get('lastSeen', 0)),
+    }
+    if normalized['correct'] < 0 or normalized['wrong'] < 0:
+        raise ValueError('answer counts only grow')
+    return normalized
+
+def merge_delta(batch, delta):
+    """Fold one normalized question delta into a batch"""
+    entry = batch['questions'].setdefault(delta['id'], [0, 0, 0])
+    entry[0] += delta['correct']
+    entry[1] += delta['wrong']
+    entry[2] = max(entry[2], delta['lastSeen'])
+
+def merge_session(batch, session, reset=False):
+    """Fold a session delta {correct, wrong, total} into a batch"""
+    if reset:
+        batch['reset_session'] = True
+        batch['session'] = [0, 0, 0]
+    if session:
+        for index, key in enumerate(('correct', 'wrong', 'total')):
+            batch['session'][index] += int(session.get(key, 0))
+
+class StatsDatabase:
+    """SQLite-backed learner stats; one connection per thread"""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        with self.connection() as conn:
+            conn.executescript(SCHEMA)
+
+    def connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('PRAGMA busy_timeout=30000')
+            self._local.conn = conn
+        return conn
+
+    def apply_batches(self, batches):
+        """Apply {learner: batch} in a single write transaction"""
+        if not batches:
+            return
+        conn = self.connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            for learner, batch in batches.items():
+                if batch['reset_session']:
+                    conn.execute(RESET_SESSION, (learner,))
+                if batch['reset_session'] or any(batch['session']):
+                    conn.execute(UPSERT_SESSION, (learner, *batch['session']))
+                conn.executemany(UPSERT_QUESTION, [
+                    (learner, qid, correct, wrong, last_seen)
+                    for qid, (correct, wrong, last_seen) in batch['questions'].items()
+                ])
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+
+    def snapshot(self, learner):
+        """Compact stats of one learner: {'questions': {id: [c, w, seen]}, 'session': [c, w, t]}"""
+        conn = self.connection()
+        rows = conn.execute(
+            'SELECT question_id, correct, wrong, last_seen FROM question_stats WHERE learner = ?',
+            (learner,))
+        questions = {qid: [correct, wrong, last_seen] for qid, correct, wrong, last_seen in rows}
+        session = conn.execute(
+            'SELECT correct, wrong, total FROM session_stats WHERE learner = ?', (learner,)).fetchone()
+        return {'questions': questions, 'session': list(session) if session else [0, 0, 0]}
+
+class WriteBehindStats:
+    """Buffers deltas in memory and flushes them to a StatsDatabase periodically"""
+
+    def __init__(self, database, flush_interval=2.0):
+        self.database = database
+        self.flush_interval = flush_interval
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def add(self, learner, deltas=(), session=None, reset_session=False):
+        with self._lock:
+            batch = self._pending.setdefault(learner, empty_batch())
+            merge_session(batch, session, reset_session)
+            for delta in deltas:
+                merge_delta(batch, delta)
+
+    def flush(self):
+        """Write everything buffered so far in one transaction"""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+            try:
+                self.database.apply_batches(pending)
+            except Exception:
+                # Put the batch back so the next flush retries it
+                with self._lock:
+                    for learner, batch in pending.items():
+                        current = self._pending.get(learner)
+                        if current is None:
+                            self._pending[learner] = batch
+                        else:
+                            self._pending[learner] = _combine(batch, current)
+                raise
+
+    def snapshot(self, learner):
+        """Database snapshot with this learner's unflushed deltas applied"""
+        with self._flush_lock:
+            snapshot = self.database.snapshot(learner)
+            with self._lock:
+                batch = self._pending.get(learner)
+                if batch:
+                    snapshot = _apply_batch(snapshot, batch)
+        return snapshot
+
+    def start(self):
+        """Flush every flush_interval seconds in a background thread"""
+        def run():
+            while not self._stopped.wait(self.flush_interval):
+                try:
+                    self.flush()
+                except sqlite3.Error as e:
+                    print(f"Stats flush failed, will retry: {e}")
+        self._thread = threading.Thread(target=run, name='stats-flush', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread:
+            self._thread.join()
+        self.flush()
+
+def _apply_batch(snapshot, batch):
+    questions = {qid: list(values) for qid, values in snapshot['questions'].items()}
+    for qid, (correct, wrong, last_seen) in batch['questions'].items():
+        entry = questions.setdefault(qid, [0, 0, 0])
+        entry[0] += correct
+        entry[1] += wrong
+        entry[2] = max(entry[2], last_seen)
+    session = [0, 0, 0] if batch['reset_session'] else list(snapshot['session'])
+    session = [a + b for a, b in zip(session, batch['session'])]
+    return {'questions': questions, 'session': session}
+
+def _combine(older, newer):
+    """Batch equivalent to applying older and then newer"""
+    combined = empty_batch()
+    combined['reset_session'] = older['reset_session'] or newer['reset_session']
+    if newer['reset_session']:
+        combined['session'] = list(newer['session'])
+    else:
+        combined['session'] = [a + b for a, b in zip(older['session'], newer['session'])]
+    for batch in (older, newer):
+        for qid, (correct, wrong, last_seen) in batch['questions'].items():
+            merge_delta(combined, {'id': qid, 'correct': correct, 'wrong': wrong, 'lastSeen': last_seen})
+    return combined
+
+def stats_from_snapshot(snapshot):
+    """Expand a compact snapshot into the {id: {correct, wrong, lastSeen}} used by Scheduler"""
+    return {
+        qid: {'correct': correct, 'wrong': wrong, 'lastSeen': last_seen}
+        for qid, (correct, wrong, last_seen) in snapshot['questions'].items()
+    }
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Generate synthetic question dumps for benchmarks
+
+Produces text-only inputs in the same layout as the real sources, so the whole
+pipeline can be exercised offline and at any size:
+
+  - TXT dump, like AWS SAA-03 Solution.txt:
+        N] question text...
+        A. option
+        ...
+        ans- answer text
+
+        explanation...
+        -------------------------------------------------------
+  - PDF text, like the output of extract_text_from_pdf:
+        Question #N Topic 1
+        question text...
+        A. option
+"""
+
+import argparse
+import random
+
+from analyze_domains import DOMAINS
+
+SUBJECTS = [
+    'A company', 'A startup', 'A financial services company', 'A media company',
+    'A healthcare provider', 'A gaming company', 'An ecommerce company', 'A research team',
+]
+WORKLOADS = [
+    'runs a web application on Amazon EC2 instances behind an Application Load Balancer',
+    'stores user-uploaded files in an Amazon S3 bucket',
+    'uses an Amazon RDS for MySQL database for its order processing system',
+    'collects clickstream data from millions of mobile devices',
+    'hosts a containerized microservices application on Amazon ECS',
+    'processes nightly batch jobs that read data from an on-premises NFS share',
+    'serves static content to users around the world',
+    'runs a DynamoDB table that stores session data',
+]
+REQUIREMENTS = [
+    'The solution must minimize operational overhead.',
+    'The company needs the MOST cost-effective solution.',
+    'The data must be encrypted at rest and in transit.',
+    'The application must remain available if an Availability Zone fails.',
+    'Read latency must be reduced for users in other Regions.',
+    'The company must be able to audit every API call.',
+]
+QUESTIONS = [
+    'Which solution meets these requirements?',
+    'What should a solutions architect do to meet these requirements?',
+    'Which combination of steps should the solutions architect take?',
+]
+ACTIONS = [
+    'Configure', 'Use', 'Deploy', 'Enable', 'Create', 'Migrate the workload to', 'Replace the database with',
+]
+SERVICES = [
+    'Amazon S3 Transfer Acceleration', 'an Amazon CloudFront distribution', 'Amazon ElastiCache for Redis',
+    'DynamoDB Accelerator (DAX)', 'an Auto Scaling group across multiple Availability Zones',
+    'AWS Key Management Service (AWS KMS) customer managed keys', 'Amazon Aurora Global Database',
+    'S3 Lifecycle rules that move objects to S3 Glacier Deep Archive', 'AWS CloudTrail with log file validation',
+    'a gateway VPC endpoint for Amazon S3', 'Amazon SQS to decouple the tiers', 'Spot Instances for the batch jobs',
+    'an RDS read replica', 'AWS Systems Manager Parameter Store', 'AWS Shield Advanced and AWS WAF',
+]
+EXPLANATIONS = [
+    'This option is correct because it {reason}.',
+    'Correct answer {letter}: it {reason}.',
+    'The other options add operational overhead or do not {reason}.',
+    'Keywords: {keyword}, {keyword2}.',
+]
+REASONS = [
+    'reduces latency for global users', 'removes the need to manage servers', 'provides high availability',
+    'is the most cost-effective storage class for archives', 'encrypts data with keys the company controls',
+    'keeps traffic on the AWS private network', 'scales automatically with demand',
+]
+LETTERS = 'ABCDEF'
+
+def _keywords():
+    return [kw for info in DOMAINS.values() for kw in info['keywords']]
+
+def generate_question(qid, rng, keywords=None):
+    """One synthetic question record in the questions.json shape (without domain)"""
+    keywords = keywords or _keywords()
+    question = ' '.join([
+        f"{rng.choice(SUBJECTS)} {rng.choice(WORKLOADS)}.",
+        f"The company wants to improve {rng.choice(keywords)} and {rng.choice(keywords)}.",
+        rng.choice(REQUIREMENTS),
+        rng.choice(QUESTIONS),
+    ])
+    option_count = rng.choice((4, 4, 4, 5))
+    options = {}
+    for letter in LETTERS[:option_count]:
+        options[letter] = f"{rng.choice(ACTIONS)} {rng.choice(SERVICES)}. {rng.choice(ACTIONS)} {rng.choice(SERVICES)}."
+    correct = rng.choice(LETTERS[:option_count])
+    explanation = '\n'.join(
+        rng.choice(EXPLANATIONS).format(reason=rng.choice(REASONS), letter=correct,
+                                        keyword=rng.choice(keywords), keyword2=rng.choice(keywords))
+        for _ in range(rng.randint(2, 5))
+    )
+    return {
+        'id': qid,
+        'question': question,
+        'options': options,
+        'correct_answer': correct,
+        'answer_text': options[correct],
+        'solution': explanation,
+    }
+
+def iter_questions(count, seed=0, start_id=1):
+    rng = random.Random(seed)
+    keywords = _keywords()
+    for qid in range(start_id, start_id + count):
+        yield generate_question(qid, rng, keywords)
+
+def format_txt_block(q, rng):
+    """Format a question as a TXT dump block (question, options, ans-, explanation, separator)"""
+    lines = [f"{q['id']}] {q['question']}", '']
+    lines.extend(f"{letter}. {text}" for letter, text in q['options'].items())
+    lines.append('')
+    lines.append(f"ans- {q['answer_text']}")
+    lines.append('')
+    lines.append(q['solution'])
+    lines.append('-' * rng.randint(40, 75))
+    lines.append('')
+    return '\n'.join(lines) + '\n'
+
+def format_pdf_block(q):
+    """Format a question like the text extracted from the exam PDF"""
+    lines = [f"Question #{q['id']} Topic 1", q['question']]
+    lines.extend(f"{letter}. {text}" for letter, text in q['options'].items())
+    lines.append('')
+    return '\n'.join(lines) + '\n'
+
+def write_txt_dump(path, count, seed=0):
+    """Write a TXT dump with count questions; returns the number written"""
+    rng = random.Random(seed + 1)
+    with open(path, 'w', encoding='utf-8') as f:
+        for q in iter_questions(count, seed):
+            f.write(format_txt_block(q, rng))
+    return count
+
+def write_pdf_text(path, count, seed=0, id_offset=0):
+    """Write the PDF-extracted text for the same questions as write_txt_dump.
+
+    With id_offset the PDF numbers its questions differently from the TXT dump.
+    """
+    with open(path, 'w', encoding='utf-8') as f:
+        for q in iter_questions(count, seed):
+            f.write(format_pdf_block(dict(q, id=q['id'] + id_offset)))
+    return count
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a synthetic question dump')
+    parser.add_argument('count', type=int, help='Number of questions')
+    parser.add_argument('-o', '--output', default='synthetic_dump.txt')
+    parser.add_argument('--pdf-text', default=None, help='Also write matching PDF-extracted text here')
+    parser.add_argument('--pdf-id-offset', type=int, default=0,
+                        help='Number the PDF questions this much higher than the TXT ones')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    write_txt_dump(args.output, args.count, args.seed)
+    print(f"Wrote {args.count} questions to {args.output}")
+    if args.pdf_text:
+        write_pdf_text(args.pdf_text, args.count, args.seed, args.pdf_id_offset)
+        print(f"Wrote matching PDF text to {args.pdf_text}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Keyword counts of analyze_domains.KeywordMatcher against one search per keyword"""
+
+import json
+import os
+import random
+import re
+
+import pytest
+
+from analyze_domains import DOMAINS, DomainClassifier, get_keyword_matcher, question_text
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+def reference_scores(text):
+    """The per-keyword counting of the original detect_domain"""
+    return {name: sum(len(re.findall(r'\b' + re.escape(keyword.lower()) + r'\b', text))
+                      for keyword in info['keywords'])
+            for name, info in DOMAINS.items()}
+
+def reference_hits(classifier, text):
+    counts = {}
+    for k, keyword in enumerate(classifier.keywords):
+        count = len(re.findall(r'\b' + re.escape(keyword) + r'\b', text))
+        if count:
+            counts[k] = count
+    return counts
+
+@pytest.mark.parametrize('text', [
+    'active-active-active',
+    'an active-active-active-active setup behind the edge edge location',
+    'aurora aurora-aurora restore restored restore-restore',
+    'multi-az vpc endpoint with vpc peering and cost-effective storage',
+])
+def test_matcher_counts_like_one_search_per_keyword(text):
+    assert get_keyword_matcher().score(text) == reference_scores(text)
+    classifier = DomainClassifier(DOMAINS)
+    assert classifier.hit_counts(text) == reference_hits(classifier, text)
+
+def test_random_keyword_sequences():
+    keywords = sorted({keyword.lower() for info in DOMAINS.values() for keyword in info['keywords']})
+    rng = random.Random(0)
+    classifier = DomainClassifier(DOMAINS)
+    for _ in range(300):
+        text = rng.choice([' ', '-', '']).join(rng.choice(keywords) for _ in range(rng.randint(1, 8)))
+        assert get_keyword_matcher().score(text) == reference_scores(text), text
+        assert classifier.hit_counts(text) == reference_hits(classifier, text), text
+
+def test_question_bank():
+    path = os.path.join(HERE, 'questions.json')
+    if not os.path.exists(path):
+        pytest.skip('no questions.json')
+    with open(path, 'r', encoding='utf-8') as f:
+        questions = json.load(f)
+    for q in questions:
+        text = question_text(q).lower()
+        assert get_keyword_matcher().score(text) == reference_scores(text)
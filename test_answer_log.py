@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Segment numbering and rollups of answer_log.AnswerLog"""
+
+import os
+
+import answer_log
+from answer_log import ARCHIVE_DIR, AnswerLog, AnswerRollup, list_segments, rollup
+
+def answers(qid, count, ts=1700000000000):
+    return [{'id': qid, 'answer': 'B', 'correct': False, 'ts': ts + i} for i in range(count)]
+
+def append(directory, qid, count):
+    log = AnswerLog(str(directory))
+    log.append('learner', answers(qid, count))
+    log.close()
+    return log.number
+
+def test_numbering_continues_after_full_rollup(tmp_path):
+    numbers = []
+    for round_number in range(3):
+        numbers.append(append(tmp_path, 7, round_number + 1))
+        assert rollup(str(tmp_path), include_active=True) == [numbers[-1]]
+
+    assert numbers == [1, 2, 3]
+    assert list_segments(str(tmp_path)) == []
+    assert sorted(os.listdir(tmp_path / ARCHIVE_DIR)) == [
+        'segment-000001.log.gz', 'segment-000002.log.gz', 'segment-000003.log.gz']
+    table = AnswerRollup.open(str(tmp_path))
+    assert table.meta['events'] == 6
+    assert table.meta['segments'] == 3
+    assert table.question(7)['attempts'] == 6
+
+def test_numbering_continues_after_deleting_rollup(tmp_path):
+    append(tmp_path, 1, 2)
+    rollup(str(tmp_path), include_active=True, delete=True)
+    assert not os.path.exists(tmp_path / ARCHIVE_DIR)
+    # Only rollup.bin remembers segment 1
+    assert append(tmp_path, 1, 3) == 2
+    assert rollup(str(tmp_path), include_active=True, delete=True) == [2]
+    assert AnswerRollup.open(str(tmp_path)).meta['events'] == 5
+
+def test_empty_segment_is_reused(tmp_path):
+    log = AnswerLog(str(tmp_path))
+    log.close()
+    assert AnswerLog(str(tmp_path)).number == log.number == 1
+
+def test_writer_skips_sealed_segments(tmp_path):
+    first = append(tmp_path, 3, 1)
+    second = append(tmp_path, 3, 1)
+    assert (first, second) == (1, 2)
+    # Without include_active the newest segment belongs to a running writer
+    assert rollup(str(tmp_path)) == [1]
+    assert rollup(str(tmp_path), include_active=True) == [2]
+    assert AnswerRollup.open(str(tmp_path)).meta['events'] == 2
+
+def test_python_fallback_matches_numpy(tmp_path, monkeypatch):
+    append(tmp_path, 5, 4)
+    path = list_segments(str(tmp_path))[0][1]
+    expected = answer_log.segment_aggregates(answer_log.read_segment(path), 1000.0)
+    monkeypatch.setattr(answer_log, 'np', None)
+    assert answer_log.segment_aggregates(answer_log.read_segment(path), 1000.0) == expected
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Text-matched answer letters of answer_resolver.resolve_answers"""
+
+import pytest
+
+import answer_resolver
+from answer_resolver import DEFAULT_MIN_CONFIDENCE, resolve_answers
+
+def question(answer_text, **options):
+    return {'answer_text': answer_text, 'options': options, 'correct_answer': None}
+
+def batch():
+    return [
+        question('Use Amazon S3 Glacier Deep Archive',
+                 A='Use Amazon EBS snapshots', B='Use Amazon S3 Glacier Deep Archive'),
+        # Both options repeat the answer text word for word
+        question('Use an Application Load Balancer',
+                 A='Use an Application Load Balancer', B='Use an Application Load Balancer'),
+        question('Enable AWS Shield', A='Enable Amazon Inspector', B='Enable Amazon Macie'),
+    ]
+
+@pytest.fixture(params=['numpy', 'python'])
+def scorer(request, monkeypatch):
+    if request.param == 'numpy' and answer_resolver.np is None:
+        pytest.skip('numpy is not installed')
+    if request.param == 'python':
+        monkeypatch.setattr(answer_resolver, 'np', None)
+
+def test_clear_match_is_assigned(scorer):
+    q = resolve_answers(batch())[0]
+    assert q['correct_answer'] == 'B'
+    assert q['answer_confidence'] > DEFAULT_MIN_CONFIDENCE
+
+def test_tie_is_left_unresolved_at_any_threshold(scorer):
+    q = resolve_answers(batch(), min_confidence=0.0)[1]
+    assert q['correct_answer'] is None
+    assert q['answer_confidence'] == 0.5
+
+def test_unmatched_options_are_left_unresolved(scorer):
+    assert resolve_answers(batch(), min_confidence=0.0)[2]['correct_answer'] is None
+
+def test_default_threshold_is_above_uniform():
+    assert all(DEFAULT_MIN_CONFIDENCE > 1 / k for k in range(2, 7))
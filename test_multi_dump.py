@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Input discovery and global ids of multi_dump.ingest"""
+
+import json
+
+from multi_dump import NOT_QUESTION_LIST, expand_inputs, ingest, parse_dump
+
+def question(qid, text):
+    return {'id': qid, 'question': f"Which service {text}?", 'correct_answer': 'A', 'answer_confidence': 1.0,
+            'options': {'A': f"Amazon {text} service", 'B': 'AWS Lambda functions'}}
+
+def write(path, data):
+    path.write_text(json.dumps(data), encoding='utf-8')
+    return str(path)
+
+def test_directory_skips_json_that_is_not_a_question_list(tmp_path):
+    bank = write(tmp_path / 'bank.json', [question(1, 'stores objects')])
+    write(tmp_path / 'search.json', {'version': 1, 'terms': {}})
+    write(tmp_path / 'ids.json', [1, 2, 3])
+    assert expand_inputs([str(tmp_path)]) == [bank]
+    assert expand_inputs([str(tmp_path / '*.json')]) == [bank]
+
+def test_named_json_that_is_not_a_question_list_is_rejected(tmp_path):
+    assert parse_dump(write(tmp_path / 'exams.json', {'exams': [[1, 2]]})) == ([], {NOT_QUESTION_LIST: 1}, 0)
+    assert parse_dump(write(tmp_path / 'ids.json', [1, 2])) == ([], {NOT_QUESTION_LIST: 1}, 0)
+
+def test_dedupe_assigns_ids_to_kept_questions_only(tmp_path):
+    texts = ['stores objects in buckets', 'runs relational databases', 'caches content at the edge']
+    write(tmp_path / 'a.json', [question(i + 1, text) for i, text in enumerate(texts)])
+    write(tmp_path / 'b.json', [question(i + 1, text) for i, text in enumerate(reversed(texts))])
+    output = str(tmp_path / 'out' / 'questions.json')
+    (tmp_path / 'out').mkdir()
+
+    summary = ingest([str(tmp_path / '*.json')], output, workers=1, dedupe=True)
+    with open(output, 'r', encoding='utf-8') as f:
+        written = json.load(f)
+    assert summary['written'] == len(written) == 3
+    assert summary['new_ids'] == 3
+    assert [q['id'] for q in written] == [1, 2, 3]
+    assert len(summary['duplicates']) == 3
+    assert all(dropped['file'].endswith('b.json') and kept['file'].endswith('a.json')
+               for dropped, kept in summary['duplicates'])
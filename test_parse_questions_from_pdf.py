@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Page text cache of parse_questions_from_pdf.extract_text_from_pdf, on small generated PDFs"""
+
+import os
+
+import pytest
+
+import parse_questions_from_pdf as pdf_parser
+
+pytestmark = pytest.mark.skipif(pdf_parser.PDF_LIB is None, reason='no PDF library installed')
+
+def write_pdf(path, page_texts):
+    """Write a minimal PDF with one line of Helvetica text per page"""
+    count = len(page_texts)
+    kids = ' '.join(f"{3 + 2 * i} 0 R" for i in range(count))
+    objects = ['<< /Type /Catalog /Pages 2 0 R >>',
+               f"<< /Type /Pages /Kids [{kids}] /Count {count} >>"]
+    font = 3 + 2 * count
+    for i, text in enumerate(page_texts):
+        stream = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET"
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                       f"/Resources << /Font << /F1 {font} 0 R >> >> /Contents {4 + 2 * i} 0 R >>")
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+    objects.append('<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>')
+
+    data = b'%PDF-1.4\n'
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(data))
+        data += f"{number} 0 obj\n{body}\nendobj\n".encode('latin-1')
+    xref = len(data)
+    data += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode('latin-1')
+    data += ''.join(f"{offset:010d} 00000 n \n" for offset in offsets).encode('latin-1')
+    data += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode('latin-1')
+    with open(path, 'wb') as f:
+        f.write(data)
+
+@pytest.fixture
+def extracted(monkeypatch):
+    """Pages handed to extract_page_texts, per call"""
+    calls = []
+    extract = pdf_parser.extract_page_texts
+
+    def counting(pdf_path, page_indices):
+        calls.append(list(page_indices))
+        return extract(pdf_path, page_indices)
+
+    monkeypatch.setattr(pdf_parser, 'extract_page_texts', counting)
+    return calls
+
+def test_cache_hit_skips_extraction_hashing_and_page_count(tmp_path, monkeypatch, extracted):
+    pdf_path = tmp_path / 'bank.pdf'
+    cache_dir = tmp_path / 'cache'
+    write_pdf(pdf_path, ['Question #1', 'Question #2', 'Question #3'])
+
+    first = pdf_parser.extract_text_from_pdf(str(pdf_path), workers=1, cache_dir=str(cache_dir))
+    assert [line for line in first.splitlines() if line] == ['Question #1', 'Question #2', 'Question #3']
+    assert sorted(index for call in extracted for index in call) == [0, 1, 2]
+
+    def unexpected(*args):
+        raise AssertionError('the PDF was read on a cache hit')
+
+    monkeypatch.setattr(pdf_parser, 'file_sha256', unexpected)
+    monkeypatch.setattr(pdf_parser, 'count_pdf_pages', unexpected)
+    extracted.clear()
+    assert pdf_parser.extract_text_from_pdf(str(pdf_path), workers=1, cache_dir=str(cache_dir)) == first
+    assert extracted == []
+
+    # A page selection is served from the same cache
+    second = pdf_parser.extract_text_from_pdf(str(pdf_path), pages='2', workers=1, cache_dir=str(cache_dir))
+    assert second.strip() == 'Question #2'
+    assert extracted == []
+
+def test_changed_pdf_is_extracted_again(tmp_path, extracted):
+    pdf_path = tmp_path / 'bank.pdf'
+    cache_dir = tmp_path / 'cache'
+    write_pdf(pdf_path, ['Question #1', 'Question #2'])
+    pdf_parser.extract_text_from_pdf(str(pdf_path), workers=1, cache_dir=str(cache_dir))
+
+    write_pdf(pdf_path, ['Question #1', 'Question #2', 'Question #30'])
+    stat = os.stat(pdf_path)
+    os.utime(pdf_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000000000))
+    extracted.clear()
+    text = pdf_parser.extract_text_from_pdf(str(pdf_path), workers=1, cache_dir=str(cache_dir))
+    assert 'Question #30' in text
+    assert sorted(index for call in extracted for index in call) == [0, 1, 2]
+
+def test_without_cache_dir_nothing_is_written(tmp_path, monkeypatch):
+    pdf_path = tmp_path / 'bank.pdf'
+    write_pdf(pdf_path, ['Question #1'])
+    monkeypatch.chdir(tmp_path)
+    assert pdf_parser.extract_text_from_pdf(str(pdf_path), workers=1, cache_dir=None).strip() == 'Question #1'
+    assert sorted(os.listdir(tmp_path)) == ['bank.pdf']